@@ -1,8 +1,15 @@
-from typing import List, Optional
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
 from utils.prompts import Prompt
+from utils.llm_model import BaseModel, ModelContext
+from utils.token_budget import get_token_counter
+from utils.memory import content_key, shared_search_memory
 from utils.setting import Setting
 import asyncio
-from utils.locks import agent_lock
+from agents.scheduler import scheduler
+from utils.public_cache import current_writer
+
+if TYPE_CHECKING:
+    from server.session import Session
 
 class Agent:
     """
@@ -11,17 +18,29 @@ class Agent:
     此類別定義了代理的基本結構和行為，包括設定模型、提示、啟動和執行步驟。
     """
 
-    def __init__(self):
+    def __init__(self, session: Optional["Session"] = None):
         """
         初始化代理
 
         設定模型名稱、提示和歷史記錄。
+
+        Args:
+            session (Session, optional): 所屬對話 Session，提供快取池與 logger。
         """
+        self.session = session  # 所屬對話 Session
         self.prompt: Optional[Prompt] = None  # 提示物件
         self.history: List[dict] = []  # 歷史記錄（快取池）
         self.running: bool = False  # 運行狀態
         self.sleep_time: int = 0  # 睡眠時間
+        self.token_budget: int = 0  # 提示中快取池內容的 token 上限，0 表示不限制
         self.sequence: int = 0  # 序列號
+        self.conversation_id: Optional[str] = session.conversation_id if session else None  # 所屬對話 ID
+        self.seen_version: int = 0  # 上一次 step 開始時看到的快取池版本
+        self.idle_timeout: float = 0  # 目前的閒置等待秒數，無變更時逐步拉長
+        self._idle_waiter: Optional[asyncio.Future] = None  # 等待快取池變更的任務，停止時取消
+        self.model_context = ModelContext()  # 追加模式下模型回傳的 context
+        self._context_appended: Optional[int] = None  # 上次送出提示時快取池的累計新增數
+        self._context_variables: Optional[Dict[str, Any]] = None  # 上次送出完整提示時 cache_pool 以外的變數
 
     def set_prompt(self, template: str):
         """
@@ -37,16 +56,24 @@ class Agent:
         設定睡眠時間
         """
         self.sleep_time = sleep_time
+        self.idle_timeout = sleep_time
+
+    @property
+    def writer_id(self) -> str:
+        """代理寫入快取池時使用的識別碼"""
+        return f"{self.__class__.__name__}:{id(self)}"
 
     def stop(self):
         """
         停止代理
 
-        設置停止標誌，讓代理在下一次循環時退出。
+        設置停止標誌，讓代理在下一次循環時退出；正在等待變更的代理會立即被喚醒。
         """
         self.running = False
+        if self._idle_waiter is not None:
+            self._idle_waiter.cancel()
 
-    async def start(self, prompt: str = None, sleep_time: int = None):
+    async def start(self, prompt: str = None, sleep_time: int = None, token_budget: int = None):
         """
         啟動代理
 
@@ -57,6 +84,8 @@ class Agent:
             self.set_prompt(prompt)
         if sleep_time:
             self.set_sleep_time(sleep_time)
+        if token_budget is not None:
+            self.token_budget = token_budget
         pass
 
     async def step(self):
@@ -67,18 +96,150 @@ class Agent:
         """
         pass
 
+    def get_window(self, model: BaseModel) -> str:
+        """依代理的 token 預算與模型的分詞器取出快取池視窗"""
+        counter = get_token_counter(model._model_name)
+        return self.session.cache_pool.get(budget=self.token_budget, counter=counter)
+
+    def get_check_list(self, model: BaseModel) -> List[Dict[str, str]]:
+        """檢查清單，設定了 token 預算時依 check_list 截斷規則縮短"""
+        check_list = self.session.cache_pool.get_check_list()
+        if self.token_budget <= 0:
+            return check_list
+        return get_token_counter(model._model_name).fit_check_list(check_list)
+
+    async def recall(self, model: BaseModel, section_template: str) -> None:
+        """
+        以最近的快取池元素檢索長期記憶，設定提示的 memory 變數
+
+        檢索這個 Session 的記憶與共用的搜尋記憶，已經在快取池視窗中的內容不重複放入。
+        未開啟長期記憶或沒有檢索結果時 memory 為空字串，提示中不會出現記憶段落。
+
+        Args:
+            model (BaseModel): 這次使用的模型，決定截斷時的分詞方式。
+            section_template (str): 有結果時的段落模板，{memories} 會換成檢索到的記憶。
+        """
+        memories = []
+        stores = [memory for memory in (self.session.memory, shared_search_memory) if memory is not None]
+        if stores:
+            cache_pool = self.session.cache_pool
+            query = cache_pool.get(Setting.MEMORY_QUERY_SIZE)
+            exclude = {content_key(content) for content in cache_pool.get_contents()}
+            results = []
+            for store in stores:
+                results.extend(await store.search(query, Setting.MEMORY_TOP_K, exclude=exclude))
+            results.sort(key=lambda result: result[1], reverse=True)
+            memories = list(dict.fromkeys(text for text, _ in results))[:Setting.MEMORY_TOP_K]
+            counter = get_token_counter(model._model_name)
+            limit = counter.rules.get("我得知") if self.token_budget > 0 else None
+            if limit is not None:
+                memories = [counter.truncate(memory, limit) for memory in memories]
+        section = section_template.format(memories="\n".join(f"- {memory}" for memory in memories)) if memories else ""
+        self.prompt.set_variable("memory", section)
+
+    def build_prompt(self, model: BaseModel) -> Tuple[str, Optional[ModelContext]]:
+        """
+        以最新的快取池內容組合這次要送出的提示
+
+        開啟 PROMPT_APPEND_ONLY 且後端支援 context 時，同一個 context 內只送出新增的快取池元素與提示結尾，
+        代理自己上一次的回應已經在 context 中，不會再送一次；
+        cache_pool 之前的變數改變、context 超過 PROMPT_CONTEXT_LIMIT 或新增的元素已被淘汰時，重新送出完整提示。
+        cache_pool 之後的變數（例如 memory）屬於提示結尾，每次都會重新送出，改變時不需要重送完整提示。
+
+        Args:
+            model (BaseModel): 這次使用的模型。
+
+        Returns:
+            Tuple[str, Optional[ModelContext]]: (提示, context)，未使用追加模式時 context 為 None。
+        """
+        cache_pool = self.session.cache_pool
+        self.prompt.set_variable("cache_pool", self.get_window(model))
+        tail = self.prompt.tail_after("cache_pool")
+        if not (Setting.PROMPT_APPEND_ONLY and model.supports_context and tail is not None):
+            return self.prompt.format(), None
+
+        tail_names = self.prompt.names_after("cache_pool")
+        variables = {
+            name: value for name, value in self.prompt.variables.items() if name != "cache_pool" and name not in tail_names
+        }
+        counter = get_token_counter(model._model_name) if self.token_budget > 0 else None
+        delta = (
+            cache_pool.get_since(self._context_appended, counter, exclude_responder=self.writer_id)
+            if self._context_appended is not None else None
+        )
+        if (self.model_context.tokens is None or delta is None or variables != self._context_variables
+                or len(self.model_context) > Setting.PROMPT_CONTEXT_LIMIT):
+            self.model_context.reset()
+            self._context_variables = variables
+            prompt_text = self.prompt.format()
+        else:
+            prompt_text = f"\n{delta}{tail}" if delta else tail
+        self._context_appended = cache_pool.appended
+        return prompt_text, self.model_context
+
+    async def wait_for_next_step(self):
+        """
+        等待下一次 step
+
+        sleep_time 是兩次 step 之間的最短間隔，只有使用者輸入或目標改變等緊急變更會提早喚醒；
+        間隔結束時有其他寫入者造成的變更就立即執行，沒有變更時才繼續等待變更，
+        等待時間從 sleep_time 開始倍增，最多到 MAX_IDLE_INTERVAL。
+        """
+        cache_pool = self.session.cache_pool if self.session else None
+        if cache_pool is None or not Setting.CHANGE_DRIVEN_WAKEUP:
+            await asyncio.sleep(self.sleep_time)
+            return
+
+        urgent = await self._wait_for_change(cache_pool, self.sleep_time, urgent_only=True)
+        if urgent is None:
+            return
+        if urgent or cache_pool.changed_since(self.seen_version, exclude=self.writer_id):
+            self.idle_timeout = self.sleep_time
+            if urgent:
+                await asyncio.sleep(Setting.WAKE_DEBOUNCE)  # 合併短時間內連續的變更
+            return
+
+        changed = await self._wait_for_change(cache_pool, self.idle_timeout)
+        if changed:
+            self.idle_timeout = self.sleep_time
+            await asyncio.sleep(Setting.WAKE_DEBOUNCE)
+        elif changed is not None:
+            self.idle_timeout = min(max(self.idle_timeout, 1) * 2, Setting.MAX_IDLE_INTERVAL)
+
+    async def _wait_for_change(self, cache_pool, timeout: float, urgent_only: bool = False) -> Optional[bool]:
+        """
+        等待其他寫入者造成的變更，stop() 會取消等待
+
+        Returns:
+            Optional[bool]: 有變更時為 True，逾時為 False，代理已停止時為 None。
+        """
+        self._idle_waiter = asyncio.ensure_future(cache_pool.wait_for_change(
+            self.seen_version, exclude=self.writer_id, timeout=timeout, urgent_only=urgent_only
+        ))
+        try:
+            return await self._idle_waiter
+        except asyncio.CancelledError:
+            if self.running:
+                raise
+            return None
+        finally:
+            self._idle_waiter = None
+
     async def _step(self):
         """執行工具代理步驟"""
+        current_writer.set(self.writer_id)
         try:
             while self.running:
-                with agent_lock:
-                    try:
+                if self.session:
+                    self.seen_version = self.session.cache_pool.version
+                try:
+                    async with scheduler.step_slot():
                         await self.step()
-                    except Exception as e:
-                        print(f"{self.__class__.__name__} 錯誤: {e}")
+                except Exception as e:
+                    print(f"{self.__class__.__name__} 錯誤: {e}")
                 if not self.running:
                     break
-                await asyncio.sleep(self.sleep_time)
+                await self.wait_for_next_step()
         except Exception as e:
             print(f"{self.__class__.__name__} 錯誤: {e}")
         finally:
@@ -0,0 +1,101 @@
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, Deque, Dict, List, Optional, Set
+from utils.setting import Setting
+
+if TYPE_CHECKING:
+    from agents.base_agent import Agent
+
+
+class AgentScheduler:
+    """
+    代理排程器
+
+    以 asyncio 任務並行執行各對話的代理，取代原本全域的 threading.Lock。
+    不同對話、不同代理之間不互相阻塞；需要一致性的快取池寫入由 CachePool 自己的 asyncio 鎖保護。
+    """
+
+    def __init__(self, max_concurrent_steps: int = 0):
+        """
+        初始化排程器
+
+        Args:
+            max_concurrent_steps (int, optional): 全域同時執行的 step 上限，0 表示不限制。
+        """
+        self._tasks: Dict[str, Set[asyncio.Task]] = {}  # 對話 ID -> 代理任務
+        self._agents: Dict[str, List["Agent"]] = {}  # 對話 ID -> 代理實例
+        self._semaphore: Optional[asyncio.Semaphore] = (
+            asyncio.Semaphore(max_concurrent_steps) if max_concurrent_steps > 0 else None
+        )
+        self.completed_steps: int = 0  # 已完成的 step 數，供基準測試使用
+        self.step_durations: Deque[float] = deque(maxlen=10000)  # 最近的 step 耗時（秒，含等待名額）
+
+    def spawn(self, conversation_id: str, agent: "Agent", coro) -> asyncio.Task:
+        """
+        在背景啟動代理的執行協程
+
+        Args:
+            conversation_id (str): 對話 ID。
+            agent (Agent): 代理實例。
+            coro: 代理的啟動協程，例如 agent.start()。
+
+        Returns:
+            asyncio.Task: 代理任務。
+        """
+        agent.conversation_id = conversation_id
+        task = asyncio.create_task(coro, name=f"{conversation_id}:{agent.__class__.__name__}")
+        tasks = self._tasks.setdefault(conversation_id, set())
+        tasks.add(task)
+        self._agents.setdefault(conversation_id, []).append(agent)
+        task.add_done_callback(tasks.discard)
+        return task
+
+    @asynccontextmanager
+    async def step_slot(self):
+        """取得一個 step 執行名額；等待時只會讓出事件迴圈，不會阻塞執行緒"""
+        started = time.perf_counter()
+        if self._semaphore is None:
+            yield
+        else:
+            async with self._semaphore:
+                yield
+        self.completed_steps += 1
+        self.step_durations.append(time.perf_counter() - started)
+
+    def is_running(self, conversation_id: str) -> bool:
+        """檢查對話是否仍有代理在執行"""
+        return bool(self._tasks.get(conversation_id))
+
+    def get_agents(self, conversation_id: str) -> List["Agent"]:
+        """獲取對話的代理實例"""
+        return list(self._agents.get(conversation_id, []))
+
+    async def stop(self, conversation_id: str, timeout: float = 5) -> None:
+        """
+        停止對話的所有代理
+
+        先設定停止標誌讓代理自然結束，逾時仍未結束的任務會被取消。
+
+        Args:
+            conversation_id (str): 對話 ID。
+            timeout (float, optional): 等待代理結束的秒數，預設為 5。
+        """
+        for agent in self._agents.pop(conversation_id, []):
+            agent.stop()
+        tasks = self._tasks.pop(conversation_id, set())
+        if not tasks:
+            return
+        _, pending = await asyncio.wait(tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    async def stop_all(self) -> None:
+        """停止所有對話的代理"""
+        await asyncio.gather(*(self.stop(conversation_id) for conversation_id in list(self._tasks)))
+
+
+scheduler = AgentScheduler(Setting.MAX_CONCURRENT_STEPS)
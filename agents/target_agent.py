@@ -1,9 +1,8 @@
+from typing import Any, Dict, List
 from agents.base_agent import Agent
-from utils.public_cache import CachePool
 from utils.llm_model import target_model as model
-from utils.templates import target_prompt_template
-from utils.tools import choose_tool, target_tool
-from utils.logger import Logger
+from utils.templates import native_target_prompt_template, target_prompt_template
+from utils.tools import choose_tool, target_parser, target_tool
 from utils.setting import Setting
 
 class TargetAgent(Agent):
@@ -11,7 +10,8 @@ class TargetAgent(Agent):
 
     async def start(self, init_target):
         """啟動工具代理"""
-        await super().start(target_prompt_template, Setting.TARGET_INTERVAL)
+        template = native_target_prompt_template if Setting.NATIVE_TOOL_CALLING else target_prompt_template
+        await super().start(template, Setting.TARGET_INTERVAL, Setting.TARGET_TOKEN_BUDGET)
         if init_target is None:
             init_target = "我肚子餓了，想吃飯，要吃什麼"
         self.prompt.set_variable("current_target", init_target)
@@ -19,22 +19,44 @@ class TargetAgent(Agent):
 
     async def step(self):
         """執行工具代理步驟"""
-        self.prompt.set_variable("cache_pool", CachePool.get())
-        self.prompt.set_variable("check_list", CachePool.get_check_list())
-        think_prompt_text = self.prompt.format()
-        response = model.generate(think_prompt_text)
-        tool_info = choose_tool(response)
+        self.prompt.set_variable("check_list", self.get_check_list(model))
+        if Setting.NATIVE_TOOL_CALLING:
+            self.prompt.set_variable("cache_pool", self.get_window(model))
+            think_prompt_text = self.prompt.format()
+            response, tool_call = await model.generate_tool_call(think_prompt_text, list(target_parser.schemas.values()))
+            tool_info = target_parser.parse_call(tool_call) if tool_call else choose_tool(response, target_parser)
+        else:
+            think_prompt_text, context = self.build_prompt(model)
+            if context is not None:
+                response = await model.generate_in_context(think_prompt_text, context)
+            else:
+                response = await model.generate_async(think_prompt_text)
+            tool_info = choose_tool(response, target_parser)
 
-        await Logger.log("tool", self.sequence, think_prompt_text) 
-        await Logger.log("tool", self.sequence, response) 
+        await self.session.logger.log("tool", self.sequence, think_prompt_text) 
+        await self.session.logger.log("tool", self.sequence, response) 
 
         if tool_info:
             tool = target_tool[tool_info["tool_name"]]["func"]
-            tool_output = await tool(**tool_info['args'])
+            tool_output = await tool(session=self.session, **tool_info['args'])
             if tool_output:
-                await CachePool.add({"check_list": tool_output})
+                if isinstance(tool_output, list):
+                    tool_output = self._normalize_check_list(tool_output)
+                    self.session.cache_pool.set_check_list(tool_output)  # 緊急變更，會提早喚醒其他代理
+                await self.session.cache_pool.add({"check_list": tool_output})
                 self.prompt.set_variable("check_list", tool_output)
 
+    @staticmethod
+    def _normalize_check_list(check_list: List[Any]) -> List[Dict[str, str]]:
+        """把模型給的清單項目整理成 {"item": 描述, "status": 狀態}，純文字項目視為 pending"""
+        items = []
+        for item in check_list:
+            if isinstance(item, dict):
+                items.append({"item": str(item.get("item", "")), "status": str(item.get("status", "pending"))})
+            else:
+                items.append({"item": str(item), "status": "pending"})
+        return items
+
     def _format_tool_list(self) -> str:
         """格式化工具清單為字串"""
         tool_list_str = ""
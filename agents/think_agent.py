@@ -1,7 +1,6 @@
 from agents.base_agent import Agent
-from utils.public_cache import CachePool
-from utils.llm_model import think_model as model
-from utils.templates import think_prompt_template, personlitity_prompt_template
+from utils.llm_model import ModelContext, think_model as model
+from utils.templates import think_prompt_template, personlitity_prompt_template, think_memory_template
 from utils.setting import Setting
 import asyncio
 
@@ -10,7 +9,7 @@ class ThinkAgent(Agent):
 
     async def start(self):
         """啟動思考代理"""
-        await super().start(think_prompt_template, Setting.THINK_INTERVAL)
+        await super().start(think_prompt_template, Setting.THINK_INTERVAL, Setting.THINK_TOKEN_BUDGET)
         # self.set_prompt(personlitity_prompt_template)
         await asyncio.sleep(2)
         await self._step()
@@ -18,8 +17,32 @@ class ThinkAgent(Agent):
     async def step(self):
         """執行思考代理步驟"""
         print("think....")
-        self.prompt.set_variable("cache_pool", CachePool.get())
-        prompt_text = self.prompt.format()
+        await self.recall(model, think_memory_template)
+        prompt_text, context = self.build_prompt(model)
         
-        response = model.generate(prompt_text, image_url=CachePool.get_image_url())
-        await CachePool.add({"我": response})
\ No newline at end of file
+        image_url = self.session.cache_pool.get_image_url()
+        stream_id = None
+        if Setting.STREAM_THINK:
+            self.sequence += 1
+            stream_id = f"think-{self.sequence}"
+            response = await self._generate_streaming(stream_id, prompt_text, image_url, context)
+        elif context is not None:
+            response = await model.generate_in_context(prompt_text, context, image_url=image_url)
+        else:
+            response = await model.generate_async(prompt_text, image_url=image_url)
+        await self.session.cache_pool.add({"我": response}, stream_id, responder=self.writer_id)
+
+    async def _generate_streaming(self, stream_id: str, prompt_text: str, image_url: str = None, context: ModelContext = None) -> str:
+        """串流生成回應，並即時把片段推送給連線的客戶端"""
+        chunks = []
+        if context is not None:
+            stream = model.generate_stream_in_context(prompt_text, context, image_url=image_url)
+        else:
+            stream = model.generate_stream(prompt_text, image_url=image_url)
+        try:
+            async for delta in stream:
+                chunks.append(delta)
+                self.session.publish_token(stream_id, delta)
+        finally:
+            self.session.publish_token(stream_id, "", done=True)
+        return "".join(chunks)
\ No newline at end of file
@@ -1,10 +1,9 @@
 from agents.base_agent import Agent
-from utils.public_cache import CachePool
 from utils.llm_model import tool_model as model
-from utils.templates import decision_prompt_template
-from utils.tools import choose_tool, tools
-from utils.logger import Logger
+from utils.templates import decision_memory_template, decision_prompt_template, native_decision_prompt_template
+from utils.tools import choose_tool, tool_parser, tools, SEARCH_FAILED
 from utils.setting import Setting
+from utils.memory import shared_search_memory
 import asyncio
 
 class ToolAgent(Agent):
@@ -12,7 +11,8 @@ class ToolAgent(Agent):
 
     async def start(self, init_target):
         """啟動工具代理"""
-        await super().start(decision_prompt_template, Setting.TOOL_INTERVAL)
+        template = native_decision_prompt_template if Setting.NATIVE_TOOL_CALLING else decision_prompt_template
+        await super().start(template, Setting.TOOL_INTERVAL, Setting.TOOL_TOKEN_BUDGET)
 
         if init_target is None:
             init_target = "我肚子餓了，想吃飯，要吃什麼"
@@ -25,21 +25,36 @@ class ToolAgent(Agent):
 
     async def step(self):
         """執行工具代理步驟"""
-        self.prompt.set_variable("cache_pool", CachePool.get())
-        self.prompt.set_variable("check_list", CachePool.get_check_list())
-        think_prompt_text = self.prompt.format()
-        response = model.generate(think_prompt_text)
-        tool_info = choose_tool(response)
-
-        await Logger.log("tool", self.sequence, think_prompt_text) 
-        await Logger.log("tool", self.sequence, response) 
+        self.prompt.set_variable("check_list", self.get_check_list(model))
+        await self.recall(model, decision_memory_template)
+        if Setting.NATIVE_TOOL_CALLING:
+            self.prompt.set_variable("cache_pool", self.get_window(model))
+            think_prompt_text = self.prompt.format()
+            response, tool_call = await model.generate_tool_call(think_prompt_text, list(tool_parser.schemas.values()))
+            tool_info = tool_parser.parse_call(tool_call) if tool_call else choose_tool(response)
+        else:
+            think_prompt_text, context = self.build_prompt(model)
+            if context is not None:
+                response = await model.generate_in_context(think_prompt_text, context)
+            else:
+                response = await model.generate_async(think_prompt_text)
+            tool_info = choose_tool(response)
+
+        await self.session.logger.log("tool", self.sequence, think_prompt_text) 
+        await self.session.logger.log("tool", self.sequence, response) 
         
         self.sequence += 1  # 序列號遞增
         if tool_info:
             tool = tools[tool_info["tool_name"]]["func"]
-            tool_output = await tool(**tool_info['args'])
+            tool_output = await tool(session=self.session, **tool_info['args'])
             if tool_output:
-                await CachePool.add({"我得知": tool_output})
+                await self.session.cache_pool.add({"我得知": tool_output})
+                if isinstance(tool_output, str) and tool_output.startswith(SEARCH_FAILED):
+                    return
+                if self.session.memory is not None:
+                    self.session.run_background(self.session.memory.add(tool_output))
+                if shared_search_memory is not None and tools[tool_info["tool_name"]].get("shareable"):
+                    self.session.run_background(shared_search_memory.add(tool_output))
 
 
     def _format_tool_list(self) -> str:
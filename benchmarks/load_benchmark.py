@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+端對端負載基準測試
+
+以 mock 模型與本機搜尋替身啟動只包含 CLI 路由的應用，由 N 個 WebSocket 客戶端各自啟動一組對話，
+量測 step 吞吐量、p50/p99 step 耗時、事件迴圈延遲與每個對話的記憶體用量，不會呼叫任何付費 API。
+
+用法:
+    python -m benchmarks.load_benchmark --clients 20 --duration 30
+    python -m benchmarks.load_benchmark --clients 50 --latency-mean 1.0 --script my_responses.jsonl
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import statistics
+from typing import Dict, List, Optional
+
+# 必須在匯入任何專案模組之前設定，Setting 在匯入時讀取環境變數
+BENCHMARK_ENV = {
+    "THINK_MODEL_TYPE": "mock",
+    "TOOL_MODEL_TYPE": "mock",
+    "TARGET_MODEL_TYPE": "mock",
+    "SUMMARY_MODEL_TYPE": "mock",
+    "THINK_MODEL_NAME": "mock-think",
+    "TOOL_MODEL_NAME": "mock-tool",
+    "TARGET_MODEL_NAME": "mock-target",
+    "SUMMARY_MODEL_NAME": "mock-summary",
+    "MOCK_WEB": "true",
+    "SERP_API_KEY": "mock",
+    "SNAPSHOT_ENABLED": "false",
+    "SEARCH_CACHE_DB": "",
+    "COMPLETION_CACHE_DB": "",
+    "MEMORY_PATH": "",
+    "THINK_INTERVAL": "1",
+    "TOOL_INTERVAL": "1",
+    "TARGET_INTERVAL": "2",
+    "WAKE_DEBOUNCE": "0.1",
+}
+
+
+def percentile(values: List[float], q: float) -> float:
+    """最近秩法的百分位數，沒有資料時回傳 0"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q / 100 * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+def current_rss() -> int:
+    """目前的常駐記憶體（位元組），無法取得時回傳 0"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return usage if sys.platform == "darwin" else usage * 1024  # Linux 以 KB 為單位，且只有峰值
+    except ImportError:
+        return 0
+
+
+class LoopLagMonitor:
+    """定期睡眠並記錄實際醒來比預期晚了多久"""
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.lags: List[float] = []
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.lags.append(max(0.0, loop.time() - expected))
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+
+async def run_client(url: str, index: int, duration: float, events: Dict[str, int], started: asyncio.Event) -> None:
+    """啟動一組對話並接收推送，直到測試結束"""
+    import websockets
+
+    async with websockets.connect(url, max_size=None) as websocket:
+        await websocket.send(json.dumps({"type": "start_conversation", "content": {"initial_task": f"幫我決定晚餐 {index}"}}))
+        await started.wait()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + duration
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                message = json.loads(await asyncio.wait_for(websocket.recv(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+            events[message.get("type", "unknown")] = events.get(message.get("type", "unknown"), 0) + 1
+        await websocket.send(json.dumps({"type": "stop_conversation"}))
+        try:
+            # 等伺服器確認停止後才關閉連線
+            while json.loads(await asyncio.wait_for(websocket.recv(), timeout=10)).get("type") != "conversation_stopped":
+                pass
+        except asyncio.TimeoutError:
+            pass
+
+
+def create_benchmark_app():
+    """只掛載 CLI 路由（/cli）的 FastAPI 應用，關閉流程與 start_server 相同"""
+    from fastapi import FastAPI
+    from server.cli_router import router as cli_router
+    from server.lifecycle import shutdown_services
+
+    app = FastAPI()
+    app.include_router(cli_router, prefix="/cli")
+    app.add_event_handler("shutdown", shutdown_services)
+    return app
+
+
+async def run(clients: int, duration: float, warmup: float) -> Dict[str, object]:
+    import uvicorn
+    from agents.scheduler import scheduler
+    from server.session import sessions
+    from utils.mock_backend import mock_web
+
+    app = create_benchmark_app()
+    config = uvicorn.Config(app, host="127.0.0.1", port=0, log_level="warning", ws_ping_interval=None, lifespan="on")
+    server = uvicorn.Server(config)
+    server_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    url = f"ws://127.0.0.1:{port}/cli/ws"
+
+    rss_before = current_rss()
+    monitor = LoopLagMonitor()
+    monitor.start()
+    started = asyncio.Event()
+    events: Dict[str, int] = {}
+    client_tasks = [asyncio.create_task(run_client(url, index, duration, events, started)) for index in range(clients)]
+
+    await asyncio.sleep(warmup)  # 讓所有對話完成啟動，暖機期間的 step 不列入統計
+    steps_before = scheduler.completed_steps
+    scheduler.step_durations.clear()
+    monitor.lags.clear()
+    requests_before = mock_web.requests
+    measure_started = time.perf_counter()
+    started.set()
+    await asyncio.sleep(duration)
+    elapsed = time.perf_counter() - measure_started
+    durations = list(scheduler.step_durations)
+    steps = scheduler.completed_steps - steps_before
+    rss_after = current_rss()  # 客戶端停止對話之前取樣
+    active_sessions = len(sessions)
+    await monitor.stop()
+    await asyncio.gather(*client_tasks, return_exceptions=True)
+
+    server.should_exit = True
+    await server_task
+
+    return {
+        "clients": clients,
+        "sessions": active_sessions,
+        "duration": round(elapsed, 2),
+        "steps": steps,
+        "steps_per_second": round(steps / elapsed, 2) if elapsed else 0,
+        "step_p50_ms": round(percentile(durations, 50) * 1000, 1),
+        "step_p99_ms": round(percentile(durations, 99) * 1000, 1),
+        "step_mean_ms": round(statistics.fmean(durations) * 1000, 1) if durations else 0,
+        "loop_lag_p50_ms": round(percentile(monitor.lags, 50) * 1000, 2),
+        "loop_lag_p99_ms": round(percentile(monitor.lags, 99) * 1000, 2),
+        "loop_lag_max_ms": round(max(monitor.lags, default=0) * 1000, 2),
+        "rss_mb": round(rss_after / 2 ** 20, 1),
+        "rss_per_session_kb": round((rss_after - rss_before) / max(active_sessions, 1) / 1024, 1),
+        "web_requests": mock_web.requests - requests_before,
+        "events": events,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="端對端負載基準測試（mock 模型）")
+    parser.add_argument("--clients", type=int, default=10, help="WebSocket 客戶端數，每個客戶端一組對話")
+    parser.add_argument("--duration", type=float, default=20, help="量測秒數")
+    parser.add_argument("--warmup", type=float, default=3, help="開始量測前的暖機秒數")
+    parser.add_argument("--latency", choices=["fixed", "uniform", "lognormal"], help="mock 模型的延遲分布")
+    parser.add_argument("--latency-mean", type=float, help="mock 模型第一個 token 前的平均秒數")
+    parser.add_argument("--token-rate", type=float, help="mock 模型每秒生成的 token 數")
+    parser.add_argument("--script", help="mock 模型的回應腳本 (JSONL)")
+    parser.add_argument("--seed", type=int, help="亂數種子")
+    parser.add_argument("--json", action="store_true", help="以 JSON 輸出結果")
+    args = parser.parse_args()
+
+    env = dict(BENCHMARK_ENV)
+    for option, name in (("latency", "MOCK_LATENCY"), ("latency_mean", "MOCK_LATENCY_MEAN"),
+                         ("token_rate", "MOCK_TOKEN_RATE"), ("script", "MOCK_SCRIPT"), ("seed", "MOCK_SEED")):
+        if getattr(args, option) is not None:
+            env[name] = str(getattr(args, option))
+    os.environ.update(env)  # 一律使用 mock 模型，避免誤用 .env 中的付費模型
+
+    result = asyncio.run(run(args.clients, args.duration, args.warmup))
+    if args.json:
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+        return
+    print(f"客戶端: {result['clients']}，量測 {result['duration']} 秒")
+    print("-" * 40)
+    print(f"step 吞吐量: {result['steps_per_second']} steps/s（共 {result['steps']} 次）")
+    print(f"step 耗時: p50 {result['step_p50_ms']} ms, p99 {result['step_p99_ms']} ms, 平均 {result['step_mean_ms']} ms")
+    print(f"事件迴圈延遲: p50 {result['loop_lag_p50_ms']} ms, p99 {result['loop_lag_p99_ms']} ms, 最大 {result['loop_lag_max_ms']} ms")
+    print(f"記憶體: RSS {result['rss_mb']} MB，每個對話約 {result['rss_per_session_kb']} KB")
+    print(f"搜尋與網頁請求: {result['web_requests']}")
+    print(f"收到的事件: {result['events']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+排程器吞吐量基準測試
+
+以假模型模擬 N 組對話的代理迴圈，比較排程器並行執行與舊版全域鎖序列化的 step 吞吐量。
+
+用法:
+    python -m benchmarks.scheduler_benchmark --conversations 20 --duration 5
+"""
+
+import argparse
+import asyncio
+import time
+from agents.base_agent import Agent
+from agents.scheduler import AgentScheduler
+from utils.public_cache import CachePool
+
+
+class StubModel:
+    """固定延遲的假模型，模擬 LLM 回應時間"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    async def generate_async(self, prompt, image_url=None):
+        await asyncio.sleep(self.latency)
+        return f"stub response ({len(prompt)} chars)"
+
+
+class StubAgent(Agent):
+    """讀取快取池、呼叫假模型、寫回快取池的代理"""
+
+    def __init__(self, model: StubModel, cache_pool: CachePool, global_lock: asyncio.Lock = None):
+        super().__init__()
+        self.model = model
+        self.cache_pool = cache_pool
+        self.global_lock = global_lock
+        self.steps = 0
+
+    async def start(self):
+        await super().start("{cache_pool}", 0)
+        await self._step()
+
+    async def step(self):
+        if self.global_lock is not None:
+            # 模擬舊版行為：所有代理共用一把鎖並在 await 期間持有
+            async with self.global_lock:
+                await self._do_step()
+        else:
+            await self._do_step()
+
+    async def _do_step(self):
+        self.prompt.set_variable("cache_pool", self.cache_pool.get())
+        response = await self.model.generate_async(self.prompt.format())
+        await self.cache_pool.add_think({"我": response})
+        self.steps += 1
+
+
+async def run(conversations: int, agents_per_conversation: int, duration: float, latency: float, serialized: bool) -> int:
+    """運行一輪基準測試並回傳完成的 step 總數"""
+    model = StubModel(latency)
+    global_lock = asyncio.Lock() if serialized else None
+    bench_scheduler = AgentScheduler()
+    all_agents = []
+    for i in range(conversations):
+        cache_pool = CachePool()  # 每個對話各自的快取池
+        for _ in range(agents_per_conversation):
+            agent = StubAgent(model, cache_pool, global_lock)
+            all_agents.append(agent)
+            bench_scheduler.spawn(f"bench_{i}", agent, agent.start())
+
+    await asyncio.sleep(duration)
+    await bench_scheduler.stop_all()
+    return sum(agent.steps for agent in all_agents)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="代理排程器吞吐量基準測試")
+    parser.add_argument("--conversations", "-n", type=int, default=10, help="並行對話數")
+    parser.add_argument("--agents", type=int, default=3, help="每個對話的代理數")
+    parser.add_argument("--duration", type=float, default=3.0, help="每輪測試秒數")
+    parser.add_argument("--latency", type=float, default=0.05, help="假模型延遲秒數")
+    args = parser.parse_args()
+
+    print(f"對話數: {args.conversations}, 每對話代理數: {args.agents}, 模型延遲: {args.latency}s")
+    print("-" * 40)
+    for label, serialized in (("全域鎖 (舊版)", True), ("排程器並行", False)):
+        started = time.perf_counter()
+        steps = await run(args.conversations, args.agents, args.duration, args.latency, serialized)
+        elapsed = time.perf_counter() - started
+        print(f"{label}: {steps} steps, {steps / elapsed:.1f} steps/s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
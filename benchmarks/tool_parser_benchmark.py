@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+工具選擇解析器基準測試
+
+以 tool_outputs.jsonl 比較舊版 regex 路由與 ToolParser 的正確率與解析速度。
+語料是依模型常見的輸出格式手寫的樣本，不是實際收集的模型輸出；除了正常的 JSON 之外，
+也包含 markdown 標記、前後夾雜文字、尾端逗號、缺少右括號、註解等格式錯誤，
+以及外層 JSON 解析失敗、只能從內層 args 取得參數的案例。
+
+用法:
+    python -m benchmarks.tool_parser_benchmark --rounds 2000
+"""
+
+import os
+import re
+import json
+import time
+import argparse
+from typing import Any, Callable, Dict, List, Optional
+from utils.tools import target_parser, tool_parser
+
+CORPUS_PATH = os.path.join(os.path.dirname(__file__), "tool_outputs.jsonl")
+
+
+def legacy_parse_args(json_string: str) -> dict:
+    """舊版 parse_args：移除標記後整段 json.loads"""
+    try:
+        json_string = json_string.replace("`json", "").replace("`", "").strip()
+        data = json.loads(json_string)
+        return data.get("args", {})
+    except AttributeError:
+        return None
+    except ValueError:
+        return {}
+
+
+def legacy_choose_tool(model_output: str) -> Optional[Dict[str, Any]]:
+    """舊版 choose_tool：依關鍵字 regex 決定工具"""
+    try:
+        output_json = legacy_parse_args(model_output)
+        if not output_json:
+            return None
+        if re.search(r"網路搜尋|搜尋|網路", model_output, re.IGNORECASE):
+            return {"tool_name": "網路搜尋", "args": {"query": output_json.get("query")}}
+        elif re.search(r"自然表達|表達", model_output, re.IGNORECASE):
+            return {"tool_name": "自然表達", "args": {"sentence": output_json.get("sentence")}}
+        elif re.search(r"更新檢查清單|更新|檢查清單", model_output, re.IGNORECASE):
+            return {"tool_name": "更新檢查清單", "args": {"check_list": output_json.get("check_list")}}
+        elif re.search(r"摘要|summarize", model_output, re.IGNORECASE):
+            return {"tool_name": "摘要", "args": {"result": output_json.get("result")}}
+        return None
+    except ValueError:
+        return None
+
+
+def load_corpus(path: str) -> List[dict]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def evaluate(name: str, choose: Callable[[dict], Optional[dict]], corpus: List[dict], rounds: int, verbose: bool) -> None:
+    """計算正確率與平均解析時間"""
+    correct = 0
+    for case in corpus:
+        result = choose(case)
+        if result == case["expected"]:
+            correct += 1
+        elif verbose:
+            print(f"  ✗ {case['output'][:60]!r}\n    得到 {result}\n    預期 {case['expected']}")
+
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for case in corpus:
+            choose(case)
+    elapsed = time.perf_counter() - started
+    per_parse = elapsed / (rounds * len(corpus)) * 1e6
+    print(f"{name}: 正確 {correct}/{len(corpus)} ({correct / len(corpus):.0%}), 平均 {per_parse:.1f} µs/次")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="工具選擇解析器基準測試")
+    parser.add_argument("--corpus", default=CORPUS_PATH, help="模型輸出樣本 (JSONL)")
+    parser.add_argument("--rounds", type=int, default=1000, help="計時的重複次數")
+    parser.add_argument("--verbose", "-v", action="store_true", help="列出解析錯誤的輸出")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    print(f"語料: {len(corpus)} 筆樣本")
+    print("-" * 40)
+    evaluate("舊版 regex 路由", lambda case: legacy_choose_tool(case["output"]), corpus, args.rounds, args.verbose)
+    parsers = {"tool": tool_parser, "target": target_parser}
+    evaluate("ToolParser", lambda case: parsers[case["agent"]].parse(case["output"]), corpus, args.rounds, args.verbose)
+
+
+if __name__ == "__main__":
+    main()
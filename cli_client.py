@@ -22,8 +22,9 @@ class WebSocketChatClient:
         self.connected = False
         self.message_queue = asyncio.Queue()
         self.verbose = verbose
-        self.last_chat_sequence = None  # 用 sequence 去重
-        self.last_think_sequence = None
+        self.last_seq = 0  # 已收到的最後一個事件序號，用於去重與重新連線續傳
+        self.streaming_text = ""  # 目前正在即時顯示的思考內容
+        self.streamed_ids = set()  # 已即時顯示完畢的串流 ID，對應的 log_event 不再重複顯示
         self.ping_task = None
         self.connection_lock = asyncio.Lock()
         self.reconnect_attempts = 0
@@ -196,6 +197,14 @@ class WebSocketChatClient:
         success = await self.send_message("user_input", {"message": message})
         return success
 
+    async def resubscribe(self):
+        """重新連線後從最後收到的序號續傳對話事件"""
+        if self.is_running and self.conversation_id:
+            await self.send_message("subscribe", {
+                "conversation_id": self.conversation_id,
+                "since": self.last_seq
+            })
+
     async def get_conversations(self):
         """獲取對話列表"""
         await self.async_print("📋 獲取對話列表...")
@@ -250,6 +259,12 @@ class WebSocketChatClient:
         if message_type == "conversation_started":
             await self.async_print(f"✅ {data.get('message')}")
             self.conversation_id = data.get('conversation_id')
+            self.last_seq = data.get('seq', 0)
+        
+        elif message_type == "subscribed":
+            if not data.get('complete', True):
+                await self.async_print("⚠️ 斷線期間的部分訊息已無法補發，可使用 'conv <id>' 查看完整對話")
+            await self.async_print(f"🔁 已重新訂閱對話 {data.get('conversation_id')}")
         
         elif message_type == "conversation_stopped":
             await self.async_print(f"✅ {data.get('message')}")
@@ -299,23 +314,35 @@ class WebSocketChatClient:
             await self.async_print(f"  對話數量: {conversations_count}")
             await self.async_print(f"  🔄 聊天狀態: {'運行中' if self.is_running else '已停止'}")
         
-        elif message_type == "logs_update":
-            chat_logs = data.get('chat_logs', [])
-            think_logs = data.get('think_logs', [])
-            if self.verbose:
-                if think_logs:
-                    latest_think = think_logs[-1]
-                    seq = latest_think.get('sequence') or latest_think.get('timestamp')
-                    if seq != self.last_think_sequence:
-                        await self.async_print(f"💭 {latest_think.get('timestamp')}: {latest_think.get('message')}")
-                        self.last_think_sequence = seq
-            else:
-                if chat_logs:
-                    latest_chat = chat_logs[-1]
-                    seq = latest_chat.get('sequence') or latest_chat.get('timestamp')
-                    if seq != self.last_chat_sequence:
-                        await self.async_print(f"💬 {latest_chat.get('timestamp')}: {latest_chat.get('message')}")
-                        self.last_chat_sequence = seq
+        elif message_type == "log_event":
+            seq = data.get('seq', 0)
+            if seq <= self.last_seq:
+                return  # 重新連線補發時可能收到已顯示過的事件
+            self.last_seq = seq
+            log_type = data.get('log_type')
+            if self.verbose and log_type == "think":
+                stream_key = (data.get('conversation_id'), data.get('stream_id'))
+                if stream_key in self.streamed_ids:
+                    self.streamed_ids.discard(stream_key)  # 已經即時顯示過
+                    return
+                await self.async_print(f"💭 {data.get('timestamp')}: {data.get('message')}")
+            elif not self.verbose and log_type == "chat":
+                await self.async_print(f"💬 {data.get('timestamp')}: {data.get('message')}")
+        
+        elif message_type == "token":
+            if not self.verbose:
+                return
+            delta = data.get('delta', '')
+            if not self.streaming_text and delta:
+                await self.async_print("💭 ", end="", flush=True)
+            if delta:
+                self.streaming_text += delta
+                await self.async_print(delta, end="", flush=True)
+            if data.get('done'):
+                if self.streaming_text:
+                    await self.async_print("")
+                    self.streamed_ids.add((data.get('conversation_id'), data.get('stream_id')))
+                self.streaming_text = ""
         
         elif message_type == "error":
             await self.async_print(f"❌ 錯誤: {data.get('message')}")
@@ -397,6 +424,7 @@ class WebSocketChatClient:
                         listener_task.cancel()
                         listener_task = asyncio.create_task(self.listen_for_messages())
                         await asyncio.sleep(0.1)
+                        await self.resubscribe()
                     else:
                         await self.async_print("❌ 重新連接失敗，退出程序")
                         break
@@ -1,40 +1,49 @@
 from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
 from pydantic import BaseModel
+from typing import Optional, Set
 import asyncio
 import json
-from server.chat_interface import ChatInterface
+from server.session import Session, sessions
 from utils.logger import Logger
-from utils.public_cache import CachePool
-from utils.timestamp import TimestampGenerator
-import agents
+from utils.llm_model import completion_cache
+from utils.search_cache import search_cache
+from utils.snapshot import snapshot_service
+from utils.image_cache import image_cache
+from utils.memory import shared_search_memory
+from utils.recorder import recorder
 
 router = APIRouter(tags=["CLI Interface"])
 
 class UserInputRequest(BaseModel):
     message: str
+    conversation_id: str = None
 
 class ConversationRequest(BaseModel):
     conversation_id: str = None
 
-# 保存 CLI WebSocket 連接
-cli_websocket = None
-cli_connection_active = False  # 添加連接狀態標誌
+class CliConnection:
+    """單一 CLI WebSocket 連線的狀態"""
+
+    def __init__(self, websocket: WebSocket):
+        self.websocket = websocket
+        self.session: Optional[Session] = None  # 連線目前所屬的對話 Session
+
+# 保存所有 CLI WebSocket 連接
+cli_connections: Set[CliConnection] = set()
 
 @router.websocket("/ws")
 async def cli_websocket_endpoint(websocket: WebSocket):
     """
     CLI WebSocket 端點，用於實時通信
     """
-    global cli_websocket, cli_connection_active
-    cli_uid = "cli_interface"
+    connection = CliConnection(websocket)
     
     try:
         await websocket.accept()
-        cli_websocket = websocket
-        cli_connection_active = True
-        print(f"✅ CLI WebSocket 已連接: {cli_uid}")
+        cli_connections.add(connection)
+        print(f"✅ CLI WebSocket 已連接 (目前連線數: {len(cli_connections)})")
         
-        while cli_connection_active:
+        while True:
             try:
                 # 檢查連接狀態
                 if websocket.client_state.value != 1:  # 1 = CONNECTED
@@ -48,14 +57,13 @@ async def cli_websocket_endpoint(websocket: WebSocket):
 
                 if task == "user_input":
                     received_text = message.get("content", {}).get("message")
-                    if received_text:
-                        await CachePool.add({"有人對你說話": received_text})
-                        await Logger.log("chat", await CachePool.get_len(), {"有人對你說話": received_text})
+                    if received_text and connection.session:
+                        await add_user_message(connection.session, received_text)
 
-                await handle_cli_message(websocket, cli_uid, task, content)
+                await handle_cli_message(connection, task, content)
                 
             except WebSocketDisconnect:
-                print(f"🔌 CLI WebSocket 連接已斷開: {cli_uid}")
+                print("🔌 CLI WebSocket 連接已斷開")
                 break
             except json.JSONDecodeError as e:
                 print(f"❌ JSON 解析錯誤: {e}")
@@ -67,39 +75,53 @@ async def cli_websocket_endpoint(websocket: WebSocket):
     except Exception as e:
         print(f"❌ CLI WebSocket 連接錯誤: {e}")
     finally:
-        # 確保清理連接狀態
-        try:
-            await ChatInterface.stop_conversation()
-        except Exception as e:
-            print(f"⚠️ 停止對話時發生錯誤: {e}")
-        
-        cli_websocket = None
-        cli_connection_active = False
-        print(f"🔌 CLI WebSocket 已清理: {cli_uid}")
+        # 確保清理連接狀態；沒有連線訂閱的對話在閒置逾時後停止，期間可重新訂閱續傳
+        cli_connections.discard(connection)
+        session = connection.session
+        if session:
+            session.detach(websocket)
+            sessions.release(session)
+        print(f"🔌 CLI WebSocket 已清理 (目前連線數: {len(cli_connections)})")
 
 def is_cli_websocket_connected():
-    """檢查 CLI WebSocket 是否連接"""
-    global cli_websocket, cli_connection_active
-    return cli_websocket is not None and cli_connection_active and cli_websocket.client_state.value == 1
-
-async def handle_cli_message(websocket, uid, task, content):
+    """檢查是否有 CLI WebSocket 連接"""
+    return any(connection.websocket.client_state.value == 1 for connection in cli_connections)
+
+async def add_user_message(session: Session, message: str):
+    """將用戶消息加入對話的 cache pool 並記錄"""
+    await session.cache_pool.add({"有人對你說話": message}, urgent=True)
+    await session.logger.log("chat", await session.cache_pool.get_len(), {"有人對你說話": message})
+
+def resolve_session(conversation_id: str = None) -> Session:
+    """依對話 ID 獲取 Session，未指定時使用最近建立的 Session (HTTP 備用)"""
+    session = sessions.get(conversation_id) if conversation_id else sessions.latest()
+    if session is None:
+        raise HTTPException(status_code=404, detail=f"找不到對話: {conversation_id or '尚未啟動任何對話'}")
+    return session
+
+async def handle_cli_message(connection: CliConnection, task, content):
     """
     處理 CLI WebSocket 消息
     """
+    websocket = connection.websocket
     if task == "start_conversation":
         initial_task = content.get('initial_task') if content else None
-        await start_cli_conversation(websocket, uid, initial_task)
+        await start_cli_conversation(connection, initial_task)
     elif task == "stop_conversation":
-        await stop_cli_conversation(websocket)
+        await stop_cli_conversation(connection)
+    elif task == "subscribe":
+        conversation_id = content.get('conversation_id') if content else None
+        since = content.get('since') if content else None
+        await subscribe_cli_conversation(connection, conversation_id, since)
     elif task == "get_conversations":
         await send_conversations(websocket)
     elif task == "get_conversation":
         conversation_id = content.get('conversation_id')
         await send_conversation(websocket, conversation_id)
     elif task == "get_cache_pool":
-        await send_cache_pool(websocket)
+        await send_cache_pool(websocket, connection.session)
     elif task == "get_status":
-        await send_status(websocket)
+        await send_status(websocket, connection.session)
     elif task == "test":
         # 測試訊息
         print("🔍 收到 CLI 測試訊息")
@@ -108,54 +130,44 @@ async def handle_cli_message(websocket, uid, task, content):
             "message": "測試成功，WebSocket 連接正常"
         })
 
-async def start_cli_conversation(websocket, uid, initial_task: str = None):
+async def start_cli_conversation(connection: CliConnection, initial_task: str = None):
     """
     啟動 CLI 對話
     """
+    websocket = connection.websocket
     try:
-        print(f"🔧 開始啟動 CLI 對話: {uid}")
+        if connection.session and connection.session.is_running():
+            await websocket.send_json({
+                "type": "error",
+                "message": f"對話 {connection.session.conversation_id} 已在運行中"
+            })
+            return
+
+        if connection.session:
+            connection.session.detach(websocket)
+            sessions.release(connection.session)
+
+        print("🔧 開始啟動 CLI 對話")
         if initial_task:
             print(f"📋 初始任務: {initial_task}")
         
-        # 設置對話
-        await Logger.set_conversation(ChatInterface, uid)
-        await TimestampGenerator.generate_timestamp()
-        print("✅ 對話設置完成")
-
-        # 創建並啟動 agents
-        think_agent = agents.ThinkAgent()
-        tool_agent = agents.ToolAgent()
-        target_agent = agents.TargetAgent()
-        print("✅ Agents 創建完成")
-
-        # 保存 agent 實例的引用
-        ChatInterface.agent_instances = [think_agent, tool_agent, target_agent]
-
-        # 創建 agent 任務
-        agent_tasks = [
-            think_agent.start(),
-            tool_agent.start(init_target=initial_task),
-            target_agent.start(init_target=initial_task),
-        ]
-
-        # 在後台啟動 agents，不阻塞 WebSocket 響應
-        async def run_agents():
-            try:
-                print("🚀 開始運行 agents...")
-                await asyncio.gather(*agent_tasks)
-                print("✅ Agents 運行完成")
-            except Exception as e:
-                print(f"❌ Agent 運行錯誤: {e}")
+        # 建立對話 Session（自帶 cache pool、logger 與 agents）
+        session = await sessions.create(initial_task)
+        session.attach(websocket, since=session.last_seq)
+        connection.session = session
+        print(f"✅ 對話設置完成: {session.conversation_id}")
 
-        # 創建後台任務
-        asyncio.create_task(run_agents())
+        # 交給排程器在後台並行運行 agents，不阻塞 WebSocket 響應
+        print("🚀 開始運行 agents...")
+        session.start()
 
         # 發送成功消息
         await websocket.send_json({
             "type": "conversation_started",
             "message": "對話已啟動，agents 正在運行",
-            "conversation_id": uid,
-            "initial_task": initial_task
+            "conversation_id": session.conversation_id,
+            "initial_task": initial_task,
+            "seq": session.last_seq
         })
         print("✅ 已發送啟動成功消息")
 
@@ -163,7 +175,7 @@ async def start_cli_conversation(websocket, uid, initial_task: str = None):
         await asyncio.sleep(1)
 
         # 發送初始狀態
-        await send_status(websocket)
+        await send_status(websocket, session)
         print("✅ 已發送初始狀態")
 
     except Exception as e:
@@ -173,13 +185,17 @@ async def start_cli_conversation(websocket, uid, initial_task: str = None):
             "message": f"啟動對話失敗: {str(e)}"
         })
 
-async def stop_cli_conversation(websocket):
+async def stop_cli_conversation(connection: CliConnection):
     """
     停止 CLI 對話
     """
+    websocket = connection.websocket
     try:
         print("🛑 停止 CLI 對話...")
-        await ChatInterface.stop_conversation()
+        if connection.session:
+            connection.session.detach(websocket)
+            await sessions.remove(connection.session.conversation_id)
+            connection.session = None
         await websocket.send_json({
             "type": "conversation_stopped",
             "message": "對話已停止"
@@ -192,12 +208,39 @@ async def stop_cli_conversation(websocket):
             "message": f"停止對話失敗: {str(e)}"
         })
 
+async def subscribe_cli_conversation(connection: CliConnection, conversation_id: str, since: Optional[int] = None):
+    """
+    訂閱既有對話的日誌事件，用於重新連線後從指定序號續傳
+    """
+    websocket = connection.websocket
+    session = sessions.get(conversation_id) if conversation_id else None
+    if session is None:
+        await websocket.send_json({
+            "type": "error",
+            "message": f"找不到運行中的對話: {conversation_id}"
+        })
+        return
+
+    if connection.session and connection.session is not session:
+        connection.session.detach(websocket)
+        sessions.release(connection.session)
+    connection.session = session
+    complete = session.attach(websocket, since=since)
+    await websocket.send_json({
+        "type": "subscribed",
+        "conversation_id": session.conversation_id,
+        "since": since,
+        "seq": session.last_seq,
+        "complete": complete
+    })
+    print(f"🔁 已訂閱對話 {session.conversation_id}，自序號 {since} 續傳")
+
 async def send_conversations(websocket):
     """
     發送對話列表
     """
     try:
-        conversations = await ChatInterface.get_conversations()
+        conversations = await Logger.list_conversations()
         await websocket.send_json({
             "type": "conversations_list",
             "conversations": conversations
@@ -213,8 +256,8 @@ async def send_conversation(websocket, conversation_id):
     發送特定對話內容
     """
     try:
-        chat_logs = await ChatInterface.read_logs_from_file("chat", conversation_id)
-        think_logs = await ChatInterface.read_logs_from_file("think", conversation_id)
+        chat_logs = await Logger.read_logs("chat", conversation_id)
+        think_logs = await Logger.read_logs("think", conversation_id)
         
         await websocket.send_json({
             "type": "conversation_data",
@@ -228,16 +271,19 @@ async def send_conversation(websocket, conversation_id):
             "message": f"獲取對話內容失敗: {str(e)}"
         })
 
-async def send_cache_pool(websocket):
+async def send_cache_pool(websocket, session: Optional[Session]):
     """
     發送 cache pool 內容
     """
     try:
-        cache_content = await CachePool.get_all()
+        if session is None:
+            raise ValueError("尚未啟動對話")
+        cache_content = await session.cache_pool.get_all()
         await websocket.send_json({
             "type": "cache_pool_data",
+            "conversation_id": session.conversation_id,
             "cache_pool": cache_content,
-            "length": await CachePool.get_len()
+            "length": await session.cache_pool.get_len()
         })
     except Exception as e:
         await websocket.send_json({
@@ -245,18 +291,20 @@ async def send_cache_pool(websocket):
             "message": f"獲取 cache pool 失敗: {str(e)}"
         })
 
-async def send_status(websocket):
+async def send_status(websocket, session: Optional[Session]):
     """
     發送系統狀態
     """
     try:
-        cache_length = await CachePool.get_len()
-        conversations = await ChatInterface.get_conversations()
+        cache_length = await session.cache_pool.get_len() if session else 0
+        conversations = await Logger.list_conversations()
         
         await websocket.send_json({
             "type": "status_data",
+            "conversation_id": session.conversation_id if session else None,
             "cache_pool_length": cache_length,
             "conversations_count": len(conversations),
+            "active_sessions": len(sessions),
             "system_status": "running"
         })
     except Exception as e:
@@ -272,42 +320,14 @@ async def start_conversation():
     啟動一個新的對話 (HTTP 備用)
     """
     try:
-        # 生成一個虛擬的 uid 用於 CLI 介面
-        cli_uid = "cli_interface"
-        
-        # 設置對話
-        await Logger.set_conversation(ChatInterface, cli_uid)
-        await TimestampGenerator.generate_timestamp()
-
-        # 創建並啟動 agents
-        think_agent = agents.ThinkAgent()
-        tool_agent = agents.ToolAgent()
-        target_agent = agents.TargetAgent()
-
-        # 保存 agent 實例的引用
-        ChatInterface.agent_instances = [think_agent, tool_agent, target_agent]
-
-        # 創建 agent 任務
-        agent_tasks = [
-            think_agent.start(),
-            tool_agent.start(),
-            target_agent.start(),
-        ]
-
-        # 在後台啟動 agents，不阻塞 API 響應
-        async def run_agents():
-            try:
-                await asyncio.gather(*agent_tasks)
-            except Exception as e:
-                print(f"Agent 運行錯誤: {e}")
-
-        # 創建後台任務
-        asyncio.create_task(run_agents())
+        # 建立對話 Session 並交給排程器在後台運行 agents，不阻塞 API 響應
+        session = await sessions.create()
+        session.start()
 
         return {
             "status": "success",
             "message": "對話已啟動，agents 正在運行",
-            "conversation_id": cli_uid
+            "conversation_id": session.conversation_id
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"啟動對話失敗: {str(e)}")
@@ -317,17 +337,16 @@ async def send_message(request: UserInputRequest):
     """
     發送用戶消息到 cache pool (HTTP 備用)
     """
+    session = resolve_session(request.conversation_id)
     try:
-        # 將用戶輸入添加到 cache pool
-        await CachePool.add({"有人對你說話": request.message})
-        
-        # 記錄到日誌
-        await Logger.log("chat", await CachePool.get_len(), {"有人對你說話": request.message})
+        # 將用戶輸入添加到 cache pool 並記錄到日誌
+        await add_user_message(session, request.message)
         
         return {
             "status": "success",
             "message": f"消息已發送: {request.message}",
-            "cache_pool_length": await CachePool.get_len()
+            "conversation_id": session.conversation_id,
+            "cache_pool_length": await session.cache_pool.get_len()
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"發送消息失敗: {str(e)}")
@@ -338,7 +357,7 @@ async def get_conversations():
     獲取所有對話列表 (HTTP 備用)
     """
     try:
-        conversations = await ChatInterface.get_conversations()
+        conversations = await Logger.list_conversations()
         return {
             "status": "success",
             "conversations": conversations
@@ -352,8 +371,8 @@ async def get_conversation(conversation_id: str):
     獲取特定對話的內容 (HTTP 備用)
     """
     try:
-        chat_logs = await ChatInterface.read_logs_from_file("chat", conversation_id)
-        think_logs = await ChatInterface.read_logs_from_file("think", conversation_id)
+        chat_logs = await Logger.read_logs("chat", conversation_id)
+        think_logs = await Logger.read_logs("think", conversation_id)
         
         return {
             "status": "success",
@@ -365,27 +384,30 @@ async def get_conversation(conversation_id: str):
         raise HTTPException(status_code=500, detail=f"獲取對話內容失敗: {str(e)}")
 
 @router.get("/cache_pool")
-async def get_cache_pool():
+async def get_cache_pool(conversation_id: str = None):
     """
-    獲取當前 cache pool 的內容 (HTTP 備用)
+    獲取對話 cache pool 的內容 (HTTP 備用)
     """
+    session = resolve_session(conversation_id)
     try:
-        cache_content = await CachePool.get_all()
+        cache_content = await session.cache_pool.get_all()
         return {
             "status": "success",
+            "conversation_id": session.conversation_id,
             "cache_pool": cache_content,
-            "length": await CachePool.get_len()
+            "length": await session.cache_pool.get_len()
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"獲取 cache pool 失敗: {str(e)}")
 
 @router.post("/stop_conversation")
-async def stop_conversation():
+async def stop_conversation(request: Optional[ConversationRequest] = None):
     """
-    停止當前對話 (HTTP 備用)
+    停止對話 (HTTP 備用)
     """
+    session = resolve_session(request.conversation_id if request else None)
     try:
-        await ChatInterface.stop_conversation()
+        await sessions.remove(session.conversation_id)
         return {
             "status": "success",
             "message": "對話已停止"
@@ -399,13 +421,19 @@ async def get_status():
     獲取系統狀態 (HTTP 備用)
     """
     try:
-        cache_length = await CachePool.get_len()
-        conversations = await ChatInterface.get_conversations()
+        conversations = await Logger.list_conversations()
         
         return {
             "status": "success",
-            "cache_pool_length": cache_length,
             "conversations_count": len(conversations),
+            "active_sessions": len(sessions),
+            "sessions": sessions.list_sessions(),
+            "completion_cache": completion_cache.get_stats(),
+            "search_cache": search_cache.get_stats(),
+            "snapshots": snapshot_service.get_stats(),
+            "image_cache": image_cache.get_stats(),
+            "shared_search_memory": shared_search_memory.get_stats() if shared_search_memory is not None else None,
+            "recorder": recorder.get_stats(),
             "system_status": "running"
         }
     except Exception as e:
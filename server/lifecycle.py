@@ -0,0 +1,17 @@
+from server.session import sessions
+from utils.log_writer import log_writer
+from utils.http_client import http_pool
+from utils.snapshot import snapshot_service
+from utils.memory import shared_search_memory
+from utils.recorder import recorder
+
+
+async def shutdown_services() -> None:
+    """停止所有對話並關閉共用的服務，日誌與記憶會寫入磁碟"""
+    await sessions.stop_all()
+    await snapshot_service.close()
+    if shared_search_memory is not None:
+        await shared_search_memory.close()
+    recorder.close()
+    await log_writer.close()
+    await http_pool.aclose()
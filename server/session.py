@@ -0,0 +1,316 @@
+import os
+import asyncio
+from collections import deque
+from typing import Any, Coroutine, Deque, Dict, List, Optional, Set
+from fastapi import WebSocket
+from utils.logger import Logger
+from utils.memory import LongTermMemory, create_memory
+from utils.public_cache import CachePool
+from utils.setting import Setting
+from utils.summarizer import Summarizer
+from utils.timestamp import TimestampGenerator
+from agents.base_agent import Agent
+from agents.scheduler import scheduler
+import agents
+
+
+class Subscriber:
+    """
+    Session 的推送對象
+
+    每個 WebSocket 連線有自己的佇列與發送任務，慢速連線不會拖慢代理寫入日誌。
+    """
+
+    def __init__(self, websocket: WebSocket, backlog: List[dict], queue_size: int):
+        """
+        初始化推送對象
+
+        Args:
+            websocket (WebSocket): 連線。
+            backlog (List[dict]): 需要先補發的事件。
+            queue_size (int): 佇列上限，超過時視為連線過慢並中斷推送。
+        """
+        self.websocket = websocket
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max(queue_size, len(backlog)))
+        for event in backlog:
+            self.queue.put_nowait(event)
+        self.task = asyncio.create_task(self._run())
+
+    def push(self, event: dict) -> bool:
+        """放入事件，佇列已滿時回傳 False"""
+        try:
+            self.queue.put_nowait(event)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    async def _run(self) -> None:
+        try:
+            while True:
+                event = await self.queue.get()
+                await self.websocket.send_json(event)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"⚠️ 推送事件失敗: {e}")
+
+    def close(self) -> None:
+        """停止發送任務"""
+        self.task.cancel()
+
+
+class Session:
+    """
+    對話 Session
+
+    擁有自己的快取池、檢查清單、logger 與代理實例，多個 Session 可以在同一個伺服器行程中並行運行。
+    """
+
+    def __init__(self, conversation_id: str, initial_task: str = None):
+        """
+        初始化 Session
+
+        Args:
+            conversation_id (str): 對話 ID，同時作為日誌檔名的時間戳。
+            initial_task (str, optional): 初始任務。
+        """
+        self.conversation_id = conversation_id
+        self.initial_task = initial_task
+        self.cache_pool = CachePool()
+        self.logger = Logger(conversation_id, self.cache_pool, chat_interface=self)
+        self.cache_pool.set_logger(self.logger)
+        self.memory: Optional[LongTermMemory] = (
+            create_memory(self._memory_path()) if Setting.MEMORY_ENABLED else None
+        )  # 只屬於這個對話的長期記憶，同一個對話 ID 重新開始時會載入先前的記憶
+        self.think_agent = agents.ThinkAgent(self)
+        self.tool_agent = agents.ToolAgent(self)
+        self.target_agent = agents.TargetAgent(self)
+        self.subscribers: Dict[WebSocket, Subscriber] = {}  # 接收推送的 WebSocket 連線
+        self.events: Deque[dict] = deque(maxlen=Setting.EVENT_BUFFER_SIZE)  # 最近的日誌事件，供重新連線補發
+        self.last_seq: int = 0  # 最後一個事件的序號，單調遞增
+        self.background_tasks: Set[asyncio.Task] = set()  # 工具在背景執行的工作，例如網頁截圖
+        self.summarizer: Optional[Summarizer] = None  # 把快取池淘汰的元素併入摘要
+        if Setting.SUMMARY_ENABLED:
+            self.summarizer = Summarizer(
+                self.cache_pool,
+                self.run_background,
+                trigger=Setting.SUMMARY_TRIGGER,
+                min_interval=Setting.SUMMARY_MIN_INTERVAL,
+                max_tokens=Setting.SUMMARY_MAX_TOKENS,
+                memory=self.memory,
+            )
+            self.cache_pool.on_evict = self.summarizer.schedule
+
+    def _memory_path(self) -> str:
+        """這個對話的記憶存檔路徑，MEMORY_DIR 留空時不存檔"""
+        if not Setting.MEMORY_DIR:
+            return ""
+        return os.path.join(Setting.MEMORY_DIR, f"{self.conversation_id}.npz")
+
+    @property
+    def agents(self) -> List[Agent]:
+        """Session 的代理實例"""
+        return [self.think_agent, self.tool_agent, self.target_agent]
+
+    def start(self) -> None:
+        """交給排程器在後台並行運行代理"""
+        scheduler.spawn(self.conversation_id, self.think_agent, self.think_agent.start())
+        scheduler.spawn(self.conversation_id, self.tool_agent, self.tool_agent.start(init_target=self.initial_task))
+        scheduler.spawn(self.conversation_id, self.target_agent, self.target_agent.start(init_target=self.initial_task))
+
+    def run_background(self, coro: Coroutine) -> asyncio.Task:
+        """
+        在背景執行不影響工具結果的工作，Session 停止時一併取消
+
+        Args:
+            coro (Coroutine): 要執行的協程。
+
+        Returns:
+            asyncio.Task: 背景任務。
+        """
+        task = asyncio.create_task(coro)
+        self.background_tasks.add(task)
+        task.add_done_callback(self.background_tasks.discard)
+        return task
+
+    async def stop(self) -> None:
+        """停止代理、背景工作、推送任務並關閉日誌檔"""
+        await scheduler.stop(self.conversation_id)
+        for task in list(self.background_tasks):
+            task.cancel()
+        await asyncio.gather(*self.background_tasks, return_exceptions=True)
+        for websocket in list(self.subscribers):
+            self.detach(websocket)
+        if self.memory is not None:
+            await self.memory.close()
+        await self.logger.close()
+
+    def is_running(self) -> bool:
+        """檢查 Session 是否仍有代理在運行"""
+        return scheduler.is_running(self.conversation_id)
+
+    def attach(self, websocket: WebSocket, since: Optional[int] = None) -> bool:
+        """
+        將 WebSocket 連線加入推送對象
+
+        Args:
+            websocket (WebSocket): 連線。
+            since (int, optional): 客戶端已收到的最後序號，會補發之後的事件；None 表示只接收新事件。
+
+        Returns:
+            bool: 緩衝區仍涵蓋 since 之後的所有事件時為 True，否則客戶端需要重新讀取完整對話。
+        """
+        complete = True
+        backlog: List[dict] = []
+        if since is not None:
+            oldest_seq = self.events[0]["seq"] if self.events else self.last_seq + 1
+            complete = since >= oldest_seq - 1
+            backlog = [event for event in self.events if event["seq"] > since]
+        self.detach(websocket)
+        self.subscribers[websocket] = Subscriber(websocket, backlog, Setting.SUBSCRIBER_QUEUE_SIZE)
+        return complete
+
+    def detach(self, websocket: WebSocket) -> None:
+        """將 WebSocket 連線移出推送對象"""
+        subscriber = self.subscribers.pop(websocket, None)
+        if subscriber is not None:
+            subscriber.close()
+
+    async def publish(self, log_type: str, sequence: int, timestamp: str, message: Any, stream_id: Optional[str] = None) -> None:
+        """
+        發布一筆新的日誌事件，只推送這一筆而非整份日誌
+
+        Args:
+            log_type (str): 日誌類型，"chat" 或 "think"。
+            sequence (int): 日誌中的序列號。
+            timestamp (str): 日誌時間戳。
+            message (Any): 日誌內容。
+            stream_id (str, optional): 內容已經以 token 事件串流推送過時的串流 ID。
+        """
+        self.last_seq += 1
+        event = {
+            "type": "log_event",
+            "conversation_id": self.conversation_id,
+            "seq": self.last_seq,
+            "log_type": log_type,
+            "sequence": sequence,
+            "timestamp": timestamp,
+            "message": message if isinstance(message, str) else str(message),
+        }
+        if stream_id is not None:
+            event["stream_id"] = stream_id
+        self.events.append(event)
+        for websocket, subscriber in list(self.subscribers.items()):
+            if not subscriber.push(event):
+                print("⚠️ 推送佇列已滿，中斷連線讓客戶端重新訂閱")
+                self.detach(websocket)
+                asyncio.create_task(websocket.close())
+
+    def publish_token(self, stream_id: str, delta: str, done: bool = False) -> None:
+        """
+        推送串流生成中的片段
+
+        片段只是即時預覽，不佔用序號也不放入補發緩衝區；完整內容仍會以 log_event 發布。
+
+        Args:
+            stream_id (str): 串流 ID，同一次生成的片段共用。
+            delta (str): 新產生的文字片段。
+            done (bool, optional): 串流是否結束。
+        """
+        event = {
+            "type": "token",
+            "conversation_id": self.conversation_id,
+            "stream_id": stream_id,
+            "delta": delta,
+            "done": done,
+        }
+        for subscriber in self.subscribers.values():
+            subscriber.push(event)
+
+    def to_dict(self) -> dict:
+        """Session 的摘要資訊"""
+        return {
+            "conversation_id": self.conversation_id,
+            "initial_task": self.initial_task,
+            "running": self.is_running(),
+            "subscribers": len(self.subscribers),
+            "memory": self.memory.get_stats() if self.memory is not None else None,
+        }
+
+
+class SessionRegistry:
+    """以對話 ID 為鍵的 Session 註冊表"""
+
+    def __init__(self, max_sessions: int = 0):
+        """
+        初始化註冊表
+
+        Args:
+            max_sessions (int, optional): 同時存在的 Session 上限，0 表示不限制。
+        """
+        self._sessions: Dict[str, Session] = {}
+        self.max_sessions = max_sessions
+
+    async def create(self, initial_task: str = None) -> Session:
+        """
+        建立並註冊新的 Session
+
+        Args:
+            initial_task (str, optional): 初始任務。
+
+        Returns:
+            Session: 新建立的 Session。
+        """
+        if self.max_sessions and len(self._sessions) >= self.max_sessions:
+            raise RuntimeError(f"已達 Session 上限 ({self.max_sessions})")
+        conversation_id = await TimestampGenerator.generate_timestamp()
+        session = Session(conversation_id, initial_task)
+        self._sessions[conversation_id] = session
+        return session
+
+    def get(self, conversation_id: str) -> Optional[Session]:
+        """依對話 ID 獲取 Session"""
+        return self._sessions.get(conversation_id)
+
+    def latest(self) -> Optional[Session]:
+        """獲取最近建立的 Session"""
+        if not self._sessions:
+            return None
+        return next(reversed(self._sessions.values()))
+
+    async def remove(self, conversation_id: str) -> Optional[Session]:
+        """停止並移除 Session"""
+        session = self._sessions.pop(conversation_id, None)
+        if session is not None:
+            await session.stop()
+        return session
+
+    def release(self, session: Session) -> None:
+        """
+        沒有連線訂閱時，在閒置逾時後移除 Session
+
+        逾時前重新訂閱（例如客戶端斷線重連）的 Session 會被保留。
+        """
+        if not session.subscribers:
+            asyncio.create_task(self._expire(session.conversation_id, Setting.SESSION_IDLE_TIMEOUT))
+
+    async def _expire(self, conversation_id: str, delay: float) -> None:
+        await asyncio.sleep(delay)
+        session = self.get(conversation_id)
+        if session is not None and not session.subscribers:
+            print(f"⌛ 對話閒置逾時，停止: {conversation_id}")
+            await self.remove(conversation_id)
+
+    async def stop_all(self) -> None:
+        """停止並移除所有 Session"""
+        await asyncio.gather(*(self.remove(conversation_id) for conversation_id in list(self._sessions)))
+
+    def list_sessions(self) -> List[dict]:
+        """列出所有 Session 的摘要資訊"""
+        return [session.to_dict() for session in self._sessions.values()]
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+
+sessions = SessionRegistry(Setting.MAX_SESSIONS)
@@ -17,7 +17,7 @@ echo ✅ Python 已安裝
 
 REM 檢查必要的模組是否已安裝
 echo 🔍 檢查依賴...
-python -c "import fastapi, uvicorn, websockets, requests, ollama, google.generativeai, serpapi, pydantic, openai" >nul 2>&1
+python -c "import fastapi, uvicorn, websockets, requests, ollama, google.generativeai, pydantic, openai, numpy" >nul 2>&1
 if %errorlevel% neq 0 (
     echo ❌ 缺少必要的依賴，請先運行 install_requirements.bat
     echo 或者手動安裝：pip install -r requirements.txt
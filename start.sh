@@ -18,7 +18,7 @@ fi
 
 # 檢查必要的模組是否已安裝
 echo "🔍 檢查依賴..."
-python -c "import fastapi, uvicorn, websockets, requests, ollama, google.generativeai, serpapi, pydantic, openai" 2>/dev/null
+python -c "import fastapi, uvicorn, websockets, requests, ollama, google.generativeai, pydantic, openai, numpy" 2>/dev/null
 if [ $? -ne 0 ]; then
     echo "❌ 缺少必要的依賴，請先運行 ./install_requirements.sh"
     echo "或者手動安裝：pip install -r requirements.txt"
@@ -8,6 +8,7 @@ import uvicorn
 from fastapi import FastAPI
 from server.router import router
 from server.cli_router import router as cli_router
+from server.lifecycle import shutdown_services
 from fastapi.middleware.cors import CORSMiddleware
 
 def ensure_log_directories():
@@ -34,6 +35,11 @@ def create_app():
     
     app.include_router(router)
     app.include_router(cli_router, prefix="/cli")
+
+    @app.on_event("shutdown")
+    async def shutdown():
+        """關閉時停止所有對話並將日誌寫入磁碟"""
+        await shutdown_services()
     
     return app
 
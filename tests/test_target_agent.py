@@ -0,0 +1,59 @@
+import asyncio
+import json
+
+import agents.target_agent as target_agent_module
+from agents.base_agent import Agent
+from agents.target_agent import TargetAgent
+from server.session import Session
+from utils.public_cache import current_writer
+from utils.setting import Setting
+from utils.templates import target_prompt_template
+
+CHECK_LIST_OUTPUT = json.dumps({
+    "tool_name": "更新檢查清單",
+    "args": {"check_list": [{"item": "查詢台北天氣", "status": "completed"}, "決定穿著"]},
+}, ensure_ascii=False)
+
+
+def test_check_list_update_wakes_waiting_agent(monkeypatch, tmp_path):
+    """目標代理更新檢查清單時寫入 set_check_list，等待中的代理不必等到最短間隔結束"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(Setting, "WAKE_DEBOUNCE", 0)
+    monkeypatch.setattr(Setting, "CHANGE_DRIVEN_WAKEUP", True)
+
+    async def generate_async(prompt, *args, **kwargs):
+        return CHECK_LIST_OUTPUT
+
+    monkeypatch.setattr(target_agent_module.model, "generate_async", generate_async)
+
+    async def run():
+        session = Session("test_target_agent")
+        waiter = Agent(session)
+        waiter.running = True
+        waiter.set_sleep_time(30)
+        waiter.seen_version = session.cache_pool.version
+
+        target = TargetAgent(session)
+        target.set_prompt(target_prompt_template)
+        target.prompt.set_variable("current_target", "決定今天穿什麼")
+
+        async def target_step():
+            current_writer.set(target.writer_id)
+            await target.step()
+
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        wait = asyncio.create_task(waiter.wait_for_next_step())
+        await asyncio.sleep(0)
+        await target_step()
+        await asyncio.wait_for(wait, timeout=5)
+        elapsed = loop.time() - started
+        await session.logger.close()
+        return session.cache_pool.get_check_list(), elapsed
+
+    check_list, elapsed = asyncio.run(run())
+    assert check_list == [
+        {"item": "查詢台北天氣", "status": "completed"},
+        {"item": "決定穿著", "status": "pending"},
+    ]
+    assert elapsed < 5
@@ -0,0 +1,147 @@
+from abc import ABC, abstractmethod
+from collections import deque
+from itertools import islice
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+
+class CacheEntry:
+    """快取池中的一個元素，保存原始值與渲染後的字串"""
+
+    __slots__ = ("value", "rendered", "key", "tokens", "responder")
+
+    def __init__(self, value: Any, responder: Optional[str] = None):
+        self.value = value
+        self.responder = responder  # 元素是某個代理的模型回應本身時，該代理的寫入者識別碼
+        self.rendered = str(value)  # 只在新增時渲染一次
+        self.key: Optional[str] = next(iter(value)) if isinstance(value, dict) and len(value) == 1 else None  # 例如 "我得知"
+        self.tokens: Optional[Dict[str, Tuple[str, int]]] = None  # 計數器名稱 -> (截斷後的字串, token 數)
+
+
+class CacheStorage(ABC):
+    """
+    快取池儲存層抽象類別
+
+    CachePool 只透過這個介面存取資料，多行程部署時可以換成 Redis 或共享記憶體的實作。
+    """
+
+    def __init__(self, maxlen: int):
+        self.maxlen = maxlen
+        self.appended = 0  # 累計新增的元素數，用來找出某次讀取之後新增的元素
+
+    @abstractmethod
+    def append(self, value: Any, responder: Optional[str] = None) -> Optional[CacheEntry]:
+        """
+        新增一個元素
+
+        Args:
+            value (Any): 元素的原始值。
+            responder (str, optional): 元素是某個代理的模型回應時，該代理的寫入者識別碼。
+
+        Returns:
+            Optional[CacheEntry]: 因超過上限而被淘汰的元素，沒有則為 None。
+        """
+        pass
+
+    @abstractmethod
+    def entries(self, length: Optional[int] = None) -> List[CacheEntry]:
+        """獲取最後 length 個元素，None 表示全部"""
+        pass
+
+    @abstractmethod
+    def render(self, length: int) -> str:
+        """獲取最後 length 個元素以逗號分隔的字串"""
+        pass
+
+    @abstractmethod
+    def __len__(self) -> int:
+        pass
+
+    def values(self) -> List[Any]:
+        """獲取所有元素的原始值"""
+        return [entry.value for entry in self.entries()]
+
+    def entries_since(self, appended: int) -> Optional[List[CacheEntry]]:
+        """
+        獲取累計數為 appended 之後新增的元素
+
+        Returns:
+            Optional[List[CacheEntry]]: 新增的元素；其中有元素已被淘汰時回傳 None。
+        """
+        count = self.appended - appended
+        if count < 0 or count > len(self):
+            return None
+        return self.entries(count) if count else []
+
+
+class InMemoryStorage(CacheStorage):
+    """
+    行程內的快取池儲存層
+
+    維護一份以逗號分隔、包含所有元素的渲染字串與每個元素在其中的起點：
+    新增時把元素接在字串尾端，淘汰時切掉最前面的元素，render() 只需從對應的起點切出視窗。
+    """
+
+    SEPARATOR = ", "
+
+    def __init__(self, maxlen: int):
+        super().__init__(maxlen)
+        self._entries: Deque[CacheEntry] = deque()
+        self._text: str = ""  # 所有元素渲染後以逗號分隔的字串
+        self._offsets: Deque[int] = deque()  # 每個元素在 _text 中的起點，以 _base 為基準
+        self._base: int = 0  # _text 開頭對應的累計位置，淘汰時前進而不必修改每個起點
+
+    def append(self, value: Any, responder: Optional[str] = None) -> Optional[CacheEntry]:
+        entry = CacheEntry(value, responder)
+        self._entries.append(entry)
+        self.appended += 1
+        if self._text:
+            self._text += self.SEPARATOR
+        self._offsets.append(self._base + len(self._text))
+        self._text += entry.rendered
+        if len(self._entries) <= self.maxlen:
+            return None
+        evicted = self._entries.popleft()
+        self._offsets.popleft()
+        start = self._offsets[0] - self._base if self._offsets else len(self._text)
+        self._text = self._text[start:]
+        self._base += start
+        return evicted
+
+    def entries(self, length: Optional[int] = None) -> List[CacheEntry]:
+        if length is None or length >= len(self._entries):
+            return list(self._entries)
+        if length <= 0:
+            return []
+        return list(islice(self._entries, len(self._entries) - length, None))
+
+    def render(self, length: int) -> str:
+        length = min(length, len(self._entries))
+        if length <= 0:
+            return ""
+        if length == len(self._entries):
+            return self._text
+        return self._text[self._offsets[len(self._offsets) - length] - self._base:]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# 可用的儲存層，其他後端可在此註冊
+STORAGE_BACKENDS = {
+    "memory": InMemoryStorage,
+}
+
+def create_storage(backend: str, maxlen: int) -> CacheStorage:
+    """
+    依名稱建立儲存層
+
+    Args:
+        backend (str): 儲存層名稱，例如 "memory"。
+        maxlen (int): 快取池最大長度。
+
+    Returns:
+        CacheStorage: 儲存層實例。
+    """
+    if backend not in STORAGE_BACKENDS:
+        raise ValueError(f"不支持的快取池儲存層: {backend}")
+    return STORAGE_BACKENDS[backend](maxlen)
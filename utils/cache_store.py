@@ -0,0 +1,231 @@
+import os
+import json
+import time
+import sqlite3
+import asyncio
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+
+class CacheStats:
+    """快取命中統計"""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+class CacheBackend(ABC):
+    """快取儲存層抽象類別，值以 (value, 到期時間) 儲存"""
+
+    def __init__(self):
+        self.stats = CacheStats()
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        """讀取 (value, expires_at)，不存在時回傳 None"""
+        pass
+
+    @abstractmethod
+    def set(self, key: str, value: Any, expires_at: float) -> None:
+        """寫入值"""
+        pass
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """刪除值"""
+        pass
+
+    @abstractmethod
+    def __len__(self) -> int:
+        pass
+
+
+class MemoryLRUCache(CacheBackend):
+    """記憶體 LRU 快取"""
+
+    def __init__(self, max_entries: int = 256):
+        super().__init__()
+        self.max_entries = max_entries
+        self._data: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                self._data.move_to_end(key)
+            return entry
+
+    def set(self, key: str, value: Any, expires_at: float) -> None:
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.stats.evictions += 1
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class SQLiteCache(CacheBackend):
+    """
+    SQLite 磁碟快取，值以 JSON 儲存，超過上限時淘汰最久未使用的項目
+
+    連線在第一次讀寫時才開啟，匯入模組或建立實例不會在磁碟上產生檔案。
+    """
+
+    def __init__(self, path: str, max_entries: int = 10000, table: str = "cache"):
+        super().__init__()
+        self.path = path
+        self.max_entries = max_entries
+        self.table = table
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """取得連線，第一次使用時建立資料表（呼叫端需持有 _lock）"""
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {self.table}_accessed ON {self.table}(accessed_at)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        with self._lock:
+            row = self.conn.execute(f"SELECT value, expires_at FROM {self.table} WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self.conn.execute(f"UPDATE {self.table} SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            self.conn.commit()
+        return json.loads(row[0]), row[1]
+
+    def set(self, key: str, value: Any, expires_at: float) -> None:
+        with self._lock:
+            self.conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), expires_at, time.time()),
+            )
+            overflow = self.conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0] - self.max_entries
+            if overflow > 0:
+                self.conn.execute(
+                    f"DELETE FROM {self.table} WHERE key IN "
+                    f"(SELECT key FROM {self.table} ORDER BY accessed_at ASC LIMIT ?)",
+                    (overflow,),
+                )
+                self.stats.evictions += overflow
+            self.conn.commit()
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self.conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+            self.conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            if self._conn is None and not os.path.exists(self.path):
+                return 0
+            return self.conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+
+class TieredCache:
+    """
+    兩層 TTL 快取
+
+    先查記憶體 LRU，未命中再查可選的磁碟層，磁碟命中的項目會提升回記憶體。
+    非同步介面 (aget/aset) 把磁碟存取放到執行緒中，避免阻塞事件迴圈。
+    """
+
+    def __init__(self, ttl: float, memory: MemoryLRUCache, disk: Optional[CacheBackend] = None):
+        """
+        初始化快取
+
+        Args:
+            ttl (float): 項目存活秒數。
+            memory (MemoryLRUCache): 記憶體層。
+            disk (CacheBackend, optional): 磁碟層，None 表示只用記憶體。
+        """
+        self.ttl = ttl
+        self.memory = memory
+        self.disk = disk
+        self.stats = CacheStats()
+
+    def _valid(self, backend: CacheBackend, key: str, entry: Optional[Tuple[Any, float]]) -> bool:
+        if entry is None:
+            return False
+        if entry[1] < time.time():
+            backend.delete(key)
+            self.stats.expirations += 1
+            return False
+        return True
+
+    def get(self, key: str) -> Optional[Any]:
+        """讀取快取值，未命中或已過期時回傳 None"""
+        entry = self.memory.get(key)
+        if self._valid(self.memory, key, entry):
+            self.stats.hits += 1
+            return entry[0]
+        if self.disk is not None:
+            entry = self.disk.get(key)
+            if self._valid(self.disk, key, entry):
+                self.memory.set(key, entry[0], entry[1])
+                self.stats.hits += 1
+                return entry[0]
+        self.stats.misses += 1
+        return None
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """寫入快取值"""
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        self.memory.set(key, value, expires_at)
+        if self.disk is not None:
+            self.disk.set(key, value, expires_at)
+
+    async def aget(self, key: str) -> Optional[Any]:
+        """非同步讀取快取值"""
+        if self.disk is None:
+            return self.get(key)
+        return await asyncio.to_thread(self.get, key)
+
+    async def aset(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """非同步寫入快取值"""
+        if self.disk is None:
+            self.set(key, value, ttl)
+        else:
+            await asyncio.to_thread(self.set, key, value, ttl)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """快取統計，包含各層的項目數與淘汰數"""
+        stats = self.stats.to_dict()
+        stats["memory_entries"] = len(self.memory)
+        stats["evictions"] = self.memory.stats.evictions
+        if self.disk is not None:
+            stats["disk_entries"] = len(self.disk)
+            stats["disk_evictions"] = self.disk.stats.evictions
+        return stats
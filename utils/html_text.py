@@ -0,0 +1,61 @@
+from html.parser import HTMLParser
+from typing import List
+
+# 內容不會顯示在頁面上的標籤
+SKIP_TAGS = {"script", "style", "noscript", "template", "svg"}
+
+
+class HTMLTextExtractor(HTMLParser):
+    """
+    增量式 HTML 文字擷取器
+
+    可以分段 feed()，略過 script/style 等標籤，合併連續空白，
+    累積到字數預算後設定 done，呼叫端即可停止下載與解析。
+    """
+
+    def __init__(self, char_budget: int = 500):
+        """
+        初始化擷取器
+
+        Args:
+            char_budget (int, optional): 最多保留的字元數，預設為 500。
+        """
+        super().__init__(convert_charrefs=True)
+        self.char_budget = char_budget
+        self.done = False
+        self._parts: List[str] = []
+        self._length = 0
+        self._skip_depth = 0
+        self._pending_space = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIP_TAGS:
+            self._skip_depth += 1
+
+    def handle_endtag(self, tag):
+        if tag in SKIP_TAGS and self._skip_depth > 0:
+            self._skip_depth -= 1
+
+    def handle_data(self, data):
+        if self.done or self._skip_depth:
+            return
+        if data[:1].isspace():
+            self._pending_space = True
+        words = data.split()
+        if not words:
+            return
+        text = " ".join(words)
+        if self._pending_space and self._length:
+            text = " " + text
+        self._pending_space = data[-1:].isspace()
+        remaining = self.char_budget - self._length
+        if len(text) >= remaining:
+            text = text[:remaining]
+            self.done = True
+        self._parts.append(text)
+        self._length += len(text)
+
+    def get_text(self) -> str:
+        """獲取目前擷取到的文字"""
+        return "".join(self._parts)
+
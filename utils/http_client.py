@@ -0,0 +1,264 @@
+import asyncio
+import threading
+import importlib.util
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Dict, Iterator, List, Optional
+import httpx
+from utils.setting import Setting
+
+
+class _ReleasingStream(httpx.AsyncByteStream):
+    """回應內容讀完或關閉時釋放主機的連線名額"""
+
+    def __init__(self, stream: httpx.AsyncByteStream, release: Callable[[], None]):
+        self._stream = stream
+        self._release: Optional[Callable[[], None]] = release
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self) -> None:
+        try:
+            await self._stream.aclose()
+        finally:
+            if self._release is not None:
+                self._release, release = None, self._release
+                release()
+
+
+class _ReleasingSyncStream(httpx.SyncByteStream):
+    """同步版的 _ReleasingStream"""
+
+    def __init__(self, stream: httpx.SyncByteStream, release: Callable[[], None]):
+        self._stream = stream
+        self._release: Optional[Callable[[], None]] = release
+
+    def __iter__(self) -> Iterator[bytes]:
+        yield from self._stream
+
+    def close(self) -> None:
+        try:
+            self._stream.close()
+        finally:
+            if self._release is not None:
+                self._release, release = None, self._release
+                release()
+
+
+class LimitedTransport(httpx.AsyncBaseTransport):
+    """
+    限制單一主機同時請求數的 transport
+
+    名額從送出請求開始佔用，到回應內容讀完或關閉為止，串流回應也會計入。
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, per_host_limit: int):
+        self._transport = transport
+        self.per_host_limit = per_host_limit
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+
+    def _semaphore(self, request: httpx.Request) -> Optional[asyncio.Semaphore]:
+        if self.per_host_limit <= 0:
+            return None
+        host = request.url.netloc.decode("ascii")
+        if host not in self._semaphores:
+            self._semaphores[host] = asyncio.Semaphore(self.per_host_limit)
+        return self._semaphores[host]
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        semaphore = self._semaphore(request)
+        if semaphore is None:
+            return await self._transport.handle_async_request(request)
+        await semaphore.acquire()
+        try:
+            response = await self._transport.handle_async_request(request)
+        except BaseException:
+            semaphore.release()
+            raise
+        return httpx.Response(
+            response.status_code,
+            headers=response.headers,
+            stream=_ReleasingStream(response.stream, semaphore.release),
+            extensions=response.extensions,
+        )
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+class LimitedSyncTransport(httpx.BaseTransport):
+    """同步版的 LimitedTransport，以執行緒 semaphore 限制"""
+
+    def __init__(self, transport: httpx.BaseTransport, per_host_limit: int):
+        self._transport = transport
+        self.per_host_limit = per_host_limit
+        self._semaphores: Dict[str, threading.Semaphore] = {}
+        self._lock = threading.Lock()
+
+    def _semaphore(self, request: httpx.Request) -> Optional[threading.Semaphore]:
+        if self.per_host_limit <= 0:
+            return None
+        host = request.url.netloc.decode("ascii")
+        with self._lock:
+            if host not in self._semaphores:
+                self._semaphores[host] = threading.Semaphore(self.per_host_limit)
+            return self._semaphores[host]
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        semaphore = self._semaphore(request)
+        if semaphore is None:
+            return self._transport.handle_request(request)
+        semaphore.acquire()
+        try:
+            response = self._transport.handle_request(request)
+        except BaseException:
+            semaphore.release()
+            raise
+        return httpx.Response(
+            response.status_code,
+            headers=response.headers,
+            stream=_ReleasingSyncStream(response.stream, semaphore.release),
+            extensions=response.extensions,
+        )
+
+    def close(self) -> None:
+        self._transport.close()
+
+
+class HttpPool:
+    """
+    共用的 HTTP 連線池
+
+    所有模型後端與工具共用同一組 transport 與 keep-alive 連線，安裝了 h2 時啟用 HTTP/2，
+    並在 transport 層以每個主機各自的 semaphore 限制同時連線數，OpenAI 與 Ollama 的 SDK 也受同樣的限制。
+    """
+
+    def __init__(self, max_connections: int = 100, max_keepalive: int = 20, per_host_limit: int = 10, timeout: float = 30):
+        """
+        初始化連線池
+
+        Args:
+            max_connections (int, optional): 全部主機的連線上限。
+            max_keepalive (int, optional): 保持開啟的閒置連線上限。
+            per_host_limit (int, optional): 單一主機同時請求上限，0 表示不限制。
+            timeout (float, optional): 預設逾時秒數。
+        """
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive)
+        self.timeout = httpx.Timeout(timeout)
+        self.per_host_limit = per_host_limit
+        self.http2 = importlib.util.find_spec("h2") is not None
+        self._client: Optional[httpx.AsyncClient] = None
+        self._sync_client: Optional[httpx.Client] = None
+        self._base_transport: Optional[httpx.AsyncBaseTransport] = None  # 指定時取代實際連線，例如 MockTransport
+        self._base_sync_transport: Optional[httpx.BaseTransport] = None
+        self._transport: Optional[LimitedTransport] = None
+        self._sync_transport: Optional[LimitedSyncTransport] = None
+        self._close_callbacks: List[Callable[[], None]] = []
+
+    def set_transports(self, transport: httpx.AsyncBaseTransport, sync_transport: httpx.BaseTransport) -> None:
+        """
+        改用指定的 transport，例如測試用的 MockTransport；需在第一次發送請求前呼叫
+
+        Args:
+            transport (httpx.AsyncBaseTransport): 非同步客戶端使用的 transport。
+            sync_transport (httpx.BaseTransport): 同步客戶端使用的 transport。
+        """
+        self._base_transport = transport
+        self._base_sync_transport = sync_transport
+        self._transport = None
+        self._sync_transport = None
+        self._client = None
+        self._sync_client = None
+
+    def on_close(self, callback: Callable[[], None]) -> None:
+        """
+        註冊 aclose() 時呼叫的函式，讓持有共用客戶端的 SDK 客戶端一併丟棄
+
+        Args:
+            callback (Callable[[], None]): 清除快取客戶端的函式。
+        """
+        self._close_callbacks.append(callback)
+
+    @property
+    def transport(self) -> LimitedTransport:
+        """共用的非同步 transport，其他 httpx 客戶端（例如 Ollama）可以直接使用"""
+        if self._transport is None:
+            transport = self._base_transport or httpx.AsyncHTTPTransport(limits=self.limits, http2=self.http2)
+            self._transport = LimitedTransport(transport, self.per_host_limit)
+        return self._transport
+
+    @property
+    def sync_transport(self) -> LimitedSyncTransport:
+        """共用的同步 transport"""
+        if self._sync_transport is None:
+            transport = self._base_sync_transport or httpx.HTTPTransport(limits=self.limits, http2=self.http2)
+            self._sync_transport = LimitedSyncTransport(transport, self.per_host_limit)
+        return self._sync_transport
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """共用的非同步客戶端"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(timeout=self.timeout, follow_redirects=True, transport=self.transport)
+        return self._client
+
+    @property
+    def sync_client(self) -> httpx.Client:
+        """共用的同步客戶端，供同步的 generate() 路徑使用"""
+        if self._sync_client is None or self._sync_client.is_closed:
+            self._sync_client = httpx.Client(timeout=self.timeout, follow_redirects=True, transport=self.sync_transport)
+        return self._sync_client
+
+    async def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """
+        發送請求，受單一主機連線數限制
+
+        Args:
+            method (str): HTTP 方法。
+            url (str): 網址。
+            **kwargs: 傳給 httpx 的其他參數。
+
+        Returns:
+            httpx.Response: 回應。
+        """
+        return await self.client.request(method, url, **kwargs)
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        """發送 GET 請求"""
+        return await self.request("GET", url, **kwargs)
+
+    @asynccontextmanager
+    async def stream(self, method: str, url: str, **kwargs):
+        """以串流方式讀取回應，受單一主機連線數限制"""
+        async with self.client.stream(method, url, **kwargs) as response:
+            yield response
+
+    async def aclose(self) -> None:
+        """關閉所有連線，並丟棄使用這些連線的 SDK 客戶端"""
+        for callback in self._close_callbacks:
+            callback()
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        if self._transport is not None:
+            await self._transport.aclose()
+            self._transport = None
+        if self._sync_client is not None:
+            self._sync_client.close()
+            self._sync_client = None
+        if self._sync_transport is not None:
+            self._sync_transport.close()
+            self._sync_transport = None
+
+
+http_pool = HttpPool(
+    Setting.HTTP_MAX_CONNECTIONS,
+    Setting.HTTP_MAX_KEEPALIVE,
+    Setting.HTTP_PER_HOST_LIMIT,
+    Setting.HTTP_TIMEOUT,
+)
+
+if Setting.MOCK_WEB:
+    from utils.mock_backend import mock_web
+    http_pool.set_transports(*mock_web.transports())
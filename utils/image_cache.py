@@ -0,0 +1,175 @@
+import io
+import os
+import base64
+import asyncio
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+from utils.cache_store import CacheStats
+from utils.http_client import http_pool
+from utils.setting import Setting
+
+try:
+    from PIL import Image  # 選用：安裝 Pillow 時才縮小圖片
+except ImportError:
+    Image = None
+
+# 依檔頭判斷圖片格式
+IMAGE_SIGNATURES = (
+    (b"\x89PNG", "image/png"),
+    (b"\xff\xd8", "image/jpeg"),
+    (b"GIF8", "image/gif"),
+    (b"RIFF", "image/webp"),
+)
+
+
+class ImageCache:
+    """
+    多模態模型呼叫用的圖片快取
+
+    本機截圖網址直接從磁碟讀取，其他網址透過共用連線池下載；
+    處理後的位元組與 data URL 保存在 LRU 中，安裝 Pillow 時會先縮小到設定的最大邊長。
+    """
+
+    def __init__(self, max_entries: int = 32, max_size: int = 1024,
+                 snapshot_dir: str = "snapshot", base_url: str = "http://127.0.0.1:8000"):
+        """
+        初始化圖片快取
+
+        Args:
+            max_entries (int, optional): LRU 最多保存的圖片數。
+            max_size (int, optional): 圖片最長邊的像素上限，0 表示不縮小。
+            snapshot_dir (str, optional): 截圖目錄。
+            base_url (str, optional): 截圖伺服器網址，符合此前綴的網址從磁碟讀取。
+        """
+        self.max_entries = max_entries
+        self.max_size = max_size
+        self.snapshot_dir = snapshot_dir
+        self.base_url = base_url.rstrip("/") + "/"
+        self.stats = CacheStats()
+        self._data: "OrderedDict[Any, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, key: Any) -> Optional[Any]:
+        with self._lock:
+            value = self._data.get(key)
+            if value is None:
+                self.stats.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.stats.hits += 1
+            return value
+
+    def _set(self, key: Any, value: Any) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.stats.evictions += 1
+
+    def local_path(self, url: str) -> Optional[str]:
+        """本機截圖網址對應的檔案路徑，其他網址回傳 None"""
+        if not url.startswith(self.base_url):
+            return None
+        return os.path.join(self.snapshot_dir, os.path.basename(url[len(self.base_url):]))
+
+    def _read_local(self, path: str) -> bytes:
+        with open(path, "rb") as f:
+            return self._prepare(f.read())
+
+    def _prepare(self, data: bytes) -> bytes:
+        """縮小超過最大邊長的圖片，未安裝 Pillow 或無法解析時維持原樣"""
+        if Image is None or self.max_size <= 0:
+            return data
+        try:
+            with Image.open(io.BytesIO(data)) as image:
+                if max(image.size) <= self.max_size:
+                    return data
+                image_format = image.format or "PNG"
+                image.thumbnail((self.max_size, self.max_size))
+                buffer = io.BytesIO()
+                image.save(buffer, format=image_format)
+                return buffer.getvalue()
+        except Exception as e:
+            print(f"⚠️ 圖片縮小失敗: {e}")
+            return data
+
+    def get_sync(self, url: str) -> bytes:
+        """同步讀取圖片，供同步的 generate() 路徑使用"""
+        data = self._get(url)
+        if data is None:
+            path = self.local_path(url)
+            if path is not None:
+                data = self._read_local(path)
+            else:
+                response = http_pool.sync_client.get(url)
+                response.raise_for_status()
+                data = self._prepare(response.content)
+            self._set(url, data)
+        return data
+
+    async def get(self, url: str) -> bytes:
+        """
+        讀取圖片位元組
+
+        Args:
+            url (str): 圖片網址。
+
+        Returns:
+            bytes: 處理後的圖片內容。
+        """
+        data = self._get(url)
+        if data is None:
+            path = self.local_path(url)
+            if path is not None:
+                data = await asyncio.to_thread(self._read_local, path)
+            else:
+                response = await http_pool.get(url)
+                response.raise_for_status()
+                data = await asyncio.to_thread(self._prepare, response.content)
+            self._set(url, data)
+        return data
+
+    @staticmethod
+    def _data_url(data: bytes) -> str:
+        mime = next((mime for signature, mime in IMAGE_SIGNATURES if data.startswith(signature)), "image/png")
+        return f"data:{mime};base64,{base64.b64encode(data).decode('ascii')}"
+
+    def model_url_sync(self, url: str) -> str:
+        """同步版的 model_url()"""
+        if self.local_path(url) is None:
+            return url
+        data_url = self._get(("data", url))
+        if data_url is None:
+            data_url = self._data_url(self.get_sync(url))
+            self._set(("data", url), data_url)
+        return data_url
+
+    async def model_url(self, url: str) -> str:
+        """
+        轉換成遠端模型可以讀取的網址
+
+        本機截圖網址外部服務無法存取，轉成 base64 data URL；其他網址維持原樣。
+        """
+        if self.local_path(url) is None:
+            return url
+        data_url = self._get(("data", url))
+        if data_url is None:
+            data_url = self._data_url(await self.get(url))
+            self._set(("data", url), data_url)
+        return data_url
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = self.stats.to_dict()
+        stats["entries"] = len(self._data)
+        stats["resize"] = Image is not None and self.max_size > 0
+        return stats
+
+
+image_cache = ImageCache(
+    Setting.IMAGE_CACHE_SIZE,
+    Setting.IMAGE_MAX_SIZE,
+    Setting.SNAPSHOT_DIR,
+    Setting.SNAPSHOT_BASE_URL,
+)
@@ -1,45 +1,184 @@
+import hashlib
+import json
+import re
+import time
+import asyncio
 import ollama
 import google.generativeai as genai
+import google.ai.generativelanguage as glm
 from google.api_core.exceptions import GoogleAPIError
 from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Tuple
 from utils.setting import Setting
-import requests
+from utils.cache_store import MemoryLRUCache, SQLiteCache, TieredCache
+from utils.http_client import http_pool
+from utils.image_cache import image_cache
+from utils.mock_backend import create_latency_model, get_mock_script
+from utils.recorder import Recorder, recorder
+from utils.tool_parser import ToolSchema
 import openai
 
+# 模型以字串回傳的錯誤訊息前綴，這類回應不應被快取
+ERROR_PREFIXES = ("OpenAI API error", "API錯誤", "生成錯誤", "無法生成回應")
+
+class ModelContext:
+    """
+    模型端保留的對話 context
+
+    支援 context 的後端（Ollama）會回傳已編碼的 token，下次呼叫帶回去就只需要計算新增的提示。
+    """
+
+    def __init__(self):
+        self.tokens: Optional[List[int]] = None
+
+    def reset(self) -> None:
+        self.tokens = None
+
+    def __len__(self) -> int:
+        return len(self.tokens) if self.tokens else 0
+
 class BaseModel(ABC):
     """模型抽象類別"""
+    _model_type = None
     _model_name = None
+    supports_context = False  # 是否支援 generate_in_context 的追加模式
 
     @abstractmethod
-    def generate(self, prompt, model_name, image_url=None):
+    def generate(self, prompt, image_url=None):
         """生成文本的抽象方法"""
         pass
 
     @abstractmethod
-    async def generate_async(self, prompt, model_name, image_url=None):
-        """非同步生成文本的抽象方法"""
+    async def generate_async(self, prompt, image_url=None):
+        """非同步生成文本的抽象方法，不可阻塞事件迴圈"""
         pass
 
+    async def generate_stream(self, prompt, image_url=None):
+        """串流生成文本，逐段 yield 字串；預設一次回傳完整結果"""
+        yield await self.generate_async(prompt, image_url)
+
+    async def generate_in_context(self, prompt, context: ModelContext, image_url=None):
+        """接續 context 生成，prompt 只需包含新增的內容；預設不支援 context，直接生成"""
+        return await self.generate_async(prompt, image_url)
+
+    async def generate_stream_in_context(self, prompt, context: ModelContext, image_url=None):
+        """接續 context 串流生成；預設不支援 context，直接串流"""
+        async for delta in self.generate_stream(prompt, image_url):
+            yield delta
+
+    async def generate_tool_call(self, prompt, schemas: List[ToolSchema]) -> Tuple[str, Optional[Dict[str, Any]]]:
+        """
+        以原生工具呼叫模式生成
+
+        Args:
+            prompt (str): 提示。
+            schemas (List[ToolSchema]): 可用的工具。
+
+        Returns:
+            Tuple[str, Optional[Dict[str, Any]]]: (原始輸出, {"tool_name": 函式名稱, "args": 參數})；
+            模型沒有呼叫工具或不支援時第二項為 None，由呼叫端改用文字解析。
+        """
+        return await self.generate_async(prompt), None
+
+def tool_instruction(schemas: List[ToolSchema]) -> str:
+    """沒有原生工具呼叫的後端（JSON 模式）附加在提示後的輸出格式說明"""
+    lines = ["", "* 只輸出一個 JSON 物件，格式為 {\"tool_name\": 工具名稱, \"args\": 參數}，可用的工具："]
+    for schema in schemas:
+        parameters = json.dumps(schema.parameters(), ensure_ascii=False)
+        lines.append(f"- {schema.function_name}: {schema.description} 參數 JSON Schema: {parameters}")
+    lines.append("* 不需要工具時輸出 {}")
+    return "\n".join(lines)
+
+def to_gemini_schema(schema: Dict[str, Any]) -> Dict[str, Any]:
+    """把 JSON Schema 轉成 Gemini 使用的大寫型別格式"""
+    converted = {}
+    for key, value in schema.items():
+        if key == "type":
+            converted[key] = value.upper()
+        elif key == "properties":
+            converted[key] = {name: to_gemini_schema(prop) for name, prop in value.items()}
+        elif key == "items":
+            converted[key] = to_gemini_schema(value)
+        else:
+            converted[key] = value
+    return converted
+
+# 依 API 端點共用的客戶端，避免每個模型各自建立連線；連線池關閉時清空，下次使用時重新建立
+_openai_clients = {}
+_ollama_clients = {}
+_gemini_models = {}
+
+def _clear_clients():
+    _openai_clients.clear()
+    _ollama_clients.clear()
+
+http_pool.on_close(_clear_clients)
+
+def get_openai_clients(api_base=None):
+    """獲取（或建立）指定端點共用的 OpenAI 同步與非同步客戶端，請求經過共用連線池"""
+    if api_base not in _openai_clients:
+        _openai_clients[api_base] = (
+            openai.OpenAI(api_key=Setting.OPENAI_API_KEY, base_url=api_base, http_client=http_pool.sync_client),
+            openai.AsyncOpenAI(api_key=Setting.OPENAI_API_KEY, base_url=api_base, http_client=http_pool.client),
+        )
+    return _openai_clients[api_base]
+
+def get_ollama_clients(host=None):
+    """獲取（或建立）指定主機共用的 Ollama 同步與非同步客戶端，使用共用連線池的 transport"""
+    if host not in _ollama_clients:
+        _ollama_clients[host] = (
+            ollama.Client(host, transport=http_pool.sync_transport),
+            ollama.AsyncClient(host, transport=http_pool.transport),
+        )
+    return _ollama_clients[host]
+
+def get_gemini_model(model_name, schemas: List[ToolSchema] = None):
+    """獲取（或建立）指定名稱共用的 Gemini 模型物件，工具宣告在建立時綁定"""
+    key = (model_name, tuple(schema.function_name for schema in schemas or []))
+    if key not in _gemini_models:
+        tools = None
+        if schemas:
+            tools = [{"function_declarations": [
+                {"name": schema.function_name, "description": schema.description, "parameters": to_gemini_schema(schema.parameters())}
+                for schema in schemas
+            ]}]
+        _gemini_models[key] = genai.GenerativeModel(model_name, tools=tools)
+    return _gemini_models[key]
+
 class OpenAIModel(BaseModel):
     """OpenAI 模型類別"""
+    _model_type = "openai"
     def __init__(self, model_name, api_base=None):
         self._model_name = model_name
-        self.client = openai.OpenAI(
-            api_key=Setting.OPENAI_API_KEY,
-            base_url=api_base
-        )
+        self._api_base = api_base
 
-    def generate(self, prompt, image_url=None):
+    @property
+    def client(self):
+        return get_openai_clients(self._api_base)[0]
+
+    @property
+    def async_client(self):
+        return get_openai_clients(self._api_base)[1]
+
+    def _build_messages(self, prompt, image_url=None):
         messages = [{"role": "user", "content": []}]
         messages[0]["content"].append({"type": "text", "text": prompt})
 
         if image_url and Setting.SUPPORT_IMAGE != "false":
             messages[0]["content"].append({"type": "image_url", "image_url": {"url": image_url}})
-        
+        return messages
+
+    @staticmethod
+    def _image_enabled(image_url):
+        return bool(image_url) and Setting.SUPPORT_IMAGE != "false"
+
+    def generate(self, prompt, image_url=None):
         try:
+            if self._image_enabled(image_url):
+                image_url = image_cache.model_url_sync(image_url)
             response = self.client.chat.completions.create(
                 model=self._model_name,
-                messages=messages,
+                messages=self._build_messages(prompt, image_url),
                 max_tokens=1024,
             )
             return response.choices[0].message.content
@@ -47,40 +186,152 @@ class OpenAIModel(BaseModel):
             return f"OpenAI API error: {e}"
 
     async def generate_async(self, prompt, image_url=None):
-        # For simplicity, using the synchronous method here.
-        # A full async implementation would use an async OpenAI client.
-        return self.generate(prompt, image_url)
+        """使用 AsyncOpenAI 客戶端非同步生成文本"""
+        try:
+            if self._image_enabled(image_url):
+                image_url = await image_cache.model_url(image_url)
+            response = await self.async_client.chat.completions.create(
+                model=self._model_name,
+                messages=self._build_messages(prompt, image_url),
+                max_tokens=1024,
+            )
+            return response.choices[0].message.content
+        except Exception as e:
+            return f"OpenAI API error: {e}"
 
+    async def generate_stream(self, prompt, image_url=None):
+        """使用 AsyncOpenAI 串流生成文本"""
+        try:
+            if self._image_enabled(image_url):
+                image_url = await image_cache.model_url(image_url)
+            stream = await self.async_client.chat.completions.create(
+                model=self._model_name,
+                messages=self._build_messages(prompt, image_url),
+                max_tokens=1024,
+                stream=True,
+            )
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        except Exception as e:
+            yield f"OpenAI API error: {e}"
+
+    async def generate_tool_call(self, prompt, schemas):
+        """使用 OpenAI tools 參數呼叫工具"""
+        try:
+            response = await self.async_client.chat.completions.create(
+                model=self._model_name,
+                messages=self._build_messages(prompt),
+                max_tokens=1024,
+                tools=[
+                    {"type": "function", "function": {
+                        "name": schema.function_name, "description": schema.description, "parameters": schema.parameters(),
+                    }}
+                    for schema in schemas
+                ],
+                tool_choice="auto",
+            )
+            message = response.choices[0].message
+            if message.tool_calls:
+                function = message.tool_calls[0].function
+                try:
+                    args = json.loads(function.arguments or "{}")
+                except ValueError:
+                    args = {}
+                return f"{function.name}: {function.arguments}", {"tool_name": function.name, "args": args}
+            return message.content or "", None
+        except Exception as e:
+            return f"OpenAI API error: {e}", None
 
 class OllamaModel(BaseModel):
     """Ollama 模型類別"""
+    _model_type = "ollama"
+    supports_context = True
     def __init__(self, model_name): 
         self._model_name = model_name
 
+    @property
+    def client(self):
+        return get_ollama_clients()[0]
+
+    @property
+    def async_client(self):
+        return get_ollama_clients()[1]
+
     def generate(self, prompt, image_url=None):
         if not image_url or Setting.SUPPORT_IMAGE == "false":
-            response = ollama.generate(model=self._model_name, prompt=prompt)
+            response = self.client.generate(model=self._model_name, prompt=prompt)
             return response['response']
         else:
             try:
-                response = requests.get(image_url)
-                response.raise_for_status()  # Raise an exception for bad status codes
-                image_bytes = response.content
-                response = ollama.generate(model=self._model_name, prompt=prompt, images=[image_bytes])
+                image_bytes = image_cache.get_sync(image_url)
+                response = self.client.generate(model=self._model_name, prompt=prompt, images=[image_bytes])
                 return response['response']
             except Exception as e:
                 print(f"Error downloading image: {e}")
-                response = ollama.generate(model=self._model_name, prompt=prompt)
+                response = self.client.generate(model=self._model_name, prompt=prompt)
                 return response['response']
 
+    async def _load_images_async(self, image_url):
+        """從圖片快取讀取圖片，失敗或未啟用圖片時回傳 None"""
+        if not image_url or Setting.SUPPORT_IMAGE == "false":
+            return None
+        try:
+            return [await image_cache.get(image_url)]
+        except Exception as e:
+            print(f"Error downloading image: {e}")
+            return None
+
     async def generate_async(self, prompt, image_url=None):
-        """非同步使用 Ollama 模型生成文本（Ollama 不直接支援非同步）"""
-        # Ollama 目前沒有直接支援非同步，這裡使用同步方法
-        response = self.generate(prompt, self._model_name)
-        return response
-    
+        """使用 ollama.AsyncClient 非同步生成文本"""
+        images = await self._load_images_async(image_url)
+        response = await self.async_client.generate(model=self._model_name, prompt=prompt, images=images)
+        return response['response']
+
+    async def generate_stream(self, prompt, image_url=None):
+        """使用 ollama.AsyncClient 串流生成文本"""
+        images = await self._load_images_async(image_url)
+        stream = await self.async_client.generate(model=self._model_name, prompt=prompt, images=images, stream=True)
+        async for chunk in stream:
+            if chunk.get('response'):
+                yield chunk['response']
+
+    async def generate_in_context(self, prompt, context, image_url=None):
+        """帶上次回傳的 context 生成，並保存新的 context"""
+        images = await self._load_images_async(image_url)
+        tokens, context.tokens = context.tokens, None  # 失敗時下次改送完整提示
+        response = await self.async_client.generate(model=self._model_name, prompt=prompt, images=images, context=tokens)
+        context.tokens = response.get('context')
+        return response['response']
+
+    async def generate_stream_in_context(self, prompt, context, image_url=None):
+        """帶上次回傳的 context 串流生成，最後一個片段附帶新的 context"""
+        images = await self._load_images_async(image_url)
+        tokens, context.tokens = context.tokens, None
+        stream = await self.async_client.generate(
+            model=self._model_name, prompt=prompt, images=images, context=tokens, stream=True
+        )
+        async for chunk in stream:
+            if chunk.get('response'):
+                yield chunk['response']
+            if chunk.get('done'):
+                context.tokens = chunk.get('context')
+
+    async def generate_tool_call(self, prompt, schemas):
+        """Ollama 沒有原生工具呼叫，改用 JSON 模式並在提示附上工具的 JSON Schema"""
+        response = await self.async_client.generate(
+            model=self._model_name, prompt=prompt + tool_instruction(schemas), format="json"
+        )
+        text = response['response']
+        try:
+            data = json.loads(text)
+        except ValueError:
+            return text, None
+        return text, data if isinstance(data, dict) and data else None
+
 class GeminiModel(BaseModel):
     """Gemini 模型類別"""
+    _model_type = "gemini"
 
     def __init__(self, model_name):
         """初始化 Gemini 模型，可選擇性設置 API 金鑰"""
@@ -93,7 +344,7 @@ class GeminiModel(BaseModel):
     def generate(self, prompt, image_url=None):
         """使用 Gemini 模型生成文本"""
         try:
-            model = genai.GenerativeModel(self._model_name)
+            model = get_gemini_model(self._model_name)
             response = model.generate_content(prompt)
             if response.candidates and response.candidates[0].content.parts:
                 return response.candidates[0].content.parts[0].text
@@ -107,12 +358,8 @@ class GeminiModel(BaseModel):
     async def generate_async(self, prompt, image_url=None):
         """非同步使用 Gemini 模型生成文本"""
         try:
-            model = genai.GenerativeModel(self._model_name)
-            import asyncio
-            loop = asyncio.get_event_loop()
-            response = await loop.run_in_executor(
-                None, lambda: model.generate_content(prompt)
-            )
+            model = get_gemini_model(self._model_name)
+            response = await model.generate_content_async(prompt)
             if response.candidates and response.candidates[0].content.parts:
                 return response.candidates[0].content.parts[0].text
             else:
@@ -122,12 +369,281 @@ class GeminiModel(BaseModel):
         except Exception as e:
             return f"生成錯誤: {str(e)}"
 
+    async def generate_stream(self, prompt, image_url=None):
+        """串流使用 Gemini 模型生成文本"""
+        try:
+            model = get_gemini_model(self._model_name)
+            response = await model.generate_content_async(prompt, stream=True)
+            async for chunk in response:
+                if chunk.candidates and chunk.candidates[0].content.parts:
+                    yield chunk.candidates[0].content.parts[0].text
+        except GoogleAPIError as e:
+            yield f"API錯誤: {str(e)}"
+        except Exception as e:
+            yield f"生成錯誤: {str(e)}"
+
+    async def generate_tool_call(self, prompt, schemas):
+        """使用 Gemini function declarations 呼叫工具"""
+        try:
+            model = get_gemini_model(self._model_name, schemas)
+            response = await model.generate_content_async(prompt)
+            if not response.candidates or not response.candidates[0].content.parts:
+                return "無法生成回應", None
+            for part in response.candidates[0].content.parts:
+                if part.function_call.name:
+                    args = glm.FunctionCall.to_dict(part.function_call).get("args", {})
+                    return f"{part.function_call.name}: {json.dumps(args, ensure_ascii=False)}", {
+                        "tool_name": part.function_call.name, "args": args,
+                    }
+            return "".join(part.text for part in response.candidates[0].content.parts), None
+        except GoogleAPIError as e:
+            return f"API錯誤: {str(e)}", None
+        except Exception as e:
+            return f"生成錯誤: {str(e)}", None
+
+class MockModel(BaseModel):
+    """
+    離線測試用的模型
+
+    依 MOCK_SCRIPT 腳本回應，並依設定的延遲分布與生成速度等待，不會呼叫任何外部服務；
+    model_name 只用來區分各模型的亂數序列。
+    """
+    _model_type = "mock"
+    supports_context = True
+
+    def __init__(self, model_name):
+        self._model_name = model_name
+        self.latency = create_latency_model(model_name)
+        self.script = get_mock_script()
+
+    def generate(self, prompt, image_url=None):
+        text = self.script.respond(prompt)
+        time.sleep(self.latency.total(text))
+        return text
+
+    async def generate_async(self, prompt, image_url=None):
+        text = self.script.respond(prompt)
+        await asyncio.sleep(self.latency.total(text))
+        return text
+
+    async def generate_stream(self, prompt, image_url=None):
+        """依生成速度逐段送出，每段約 4 個字"""
+        text = self.script.respond(prompt)
+        await asyncio.sleep(self.latency.first_token())
+        for start in range(0, len(text), 4):
+            chunk = text[start:start + 4]
+            await asyncio.sleep(self.latency.per_token() * len(chunk) / 2)
+            yield chunk
+
+    async def generate_in_context(self, prompt, context, image_url=None):
+        text = await self.generate_async(prompt, image_url)
+        context.tokens = (context.tokens or []) + [0] * (len(prompt) + len(text))  # 只模擬 context 長度
+        return text
+
+    async def generate_stream_in_context(self, prompt, context, image_url=None):
+        chunks = []
+        async for chunk in self.generate_stream(prompt, image_url):
+            chunks.append(chunk)
+            yield chunk
+        context.tokens = (context.tokens or []) + [0] * (len(prompt) + len("".join(chunks)))
+
+    async def generate_tool_call(self, prompt, schemas):
+        """腳本的回應是 JSON 工具呼叫時當作原生工具呼叫回傳"""
+        text = await self.generate_async(prompt)
+        try:
+            data = json.loads(text)
+        except ValueError:
+            return text, None
+        if isinstance(data, dict) and data.get("tool_name"):
+            return text, {"tool_name": data["tool_name"], "args": data.get("args", {})}
+        return text, None
+
+class CompletionCache:
+    """
+    LLM 回應快取
+
+    以模型類型、模型名稱、正規化後的提示雜湊與圖片雜湊為鍵，記憶體 LRU 加上可選的 SQLite 磁碟層。
+    """
+
+    def __init__(self, ttl: float, max_entries: int = 256, db_path: str = None):
+        """
+        初始化快取
+
+        Args:
+            ttl (float): 回應存活秒數。
+            max_entries (int, optional): 記憶體層上限，預設為 256。
+            db_path (str, optional): SQLite 檔案路徑，None 表示不使用磁碟層。
+        """
+        disk = SQLiteCache(db_path, max_entries=max_entries * 10, table="completions") if db_path else None
+        self.store = TieredCache(ttl, MemoryLRUCache(max_entries), disk)
+
+    @staticmethod
+    def normalize_prompt(prompt: str) -> str:
+        """正規化提示：合併空白，避免排版差異造成未命中"""
+        return re.sub(r"\s+", " ", prompt).strip()
+
+    def make_key(self, model: BaseModel, prompt: str, image_url: str = None) -> str:
+        """產生快取鍵"""
+        prompt_hash = hashlib.sha256(self.normalize_prompt(prompt).encode("utf-8")).hexdigest()
+        image_hash = hashlib.sha256(image_url.encode("utf-8")).hexdigest() if image_url else ""
+        raw = json.dumps([model._model_type, model._model_name, prompt_hash, image_hash])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def cacheable(response) -> bool:
+        """只快取正常的回應"""
+        return bool(response) and isinstance(response, str) and not response.startswith(ERROR_PREFIXES)
+
+    def get_stats(self) -> dict:
+        return self.store.get_stats()
+
+
+class CachedModel(BaseModel):
+    """為任一模型加上回應快取的包裝類別"""
+
+    def __init__(self, model: BaseModel, cache: CompletionCache):
+        self.model = model
+        self.cache = cache
+        self._model_type = model._model_type
+        self._model_name = model._model_name
+        self.supports_context = model.supports_context
+
+    def generate(self, prompt, image_url=None):
+        key = self.cache.make_key(self.model, prompt, image_url)
+        response = self.cache.store.get(key)
+        if response is None:
+            response = self.model.generate(prompt, image_url)
+            if self.cache.cacheable(response):
+                self.cache.store.set(key, response)
+        return response
+
+    async def generate_async(self, prompt, image_url=None):
+        key = self.cache.make_key(self.model, prompt, image_url)
+        response = await self.cache.store.aget(key)
+        if response is None:
+            response = await self.model.generate_async(prompt, image_url)
+            if self.cache.cacheable(response):
+                await self.cache.store.aset(key, response)
+        return response
+
+    async def generate_stream(self, prompt, image_url=None):
+        key = self.cache.make_key(self.model, prompt, image_url)
+        response = await self.cache.store.aget(key)
+        if response is not None:
+            yield response
+            return
+        chunks = []
+        async for delta in self.model.generate_stream(prompt, image_url):
+            chunks.append(delta)
+            yield delta
+        response = "".join(chunks)
+        if self.cache.cacheable(response):
+            await self.cache.store.aset(key, response)
+
+    async def generate_in_context(self, prompt, context, image_url=None):
+        # 回應取決於 context，不使用快取
+        return await self.model.generate_in_context(prompt, context, image_url)
+
+    async def generate_stream_in_context(self, prompt, context, image_url=None):
+        async for delta in self.model.generate_stream_in_context(prompt, context, image_url):
+            yield delta
+
+    async def generate_tool_call(self, prompt, schemas):
+        tool_names = ",".join(schema.function_name for schema in schemas)
+        key = self.cache.make_key(self.model, f"{prompt}\n[tools:{tool_names}]")
+        cached = await self.cache.store.aget(key)
+        if cached is not None:
+            return cached[0], cached[1]
+        text, tool_call = await self.model.generate_tool_call(prompt, schemas)
+        if tool_call is not None or self.cache.cacheable(text):
+            await self.cache.store.aset(key, [text, tool_call])
+        return text, tool_call
+
+
+class RecordingModel(BaseModel):
+    """
+    錄製或重播模型呼叫的包裝類別
+
+    包在最外層，錄下代理實際收到的回應（包含回應快取的結果）；重播時不會呼叫內層模型。
+    """
+
+    def __init__(self, model: BaseModel, recorder: Recorder, channel: str):
+        self.model = model
+        self.recorder = recorder
+        self.channel = channel
+        self._model_type = model._model_type
+        self._model_name = model._model_name
+        # 重播時無法接續模型的 context，一律送出完整提示
+        self.supports_context = model.supports_context and not recorder.replaying
+
+    @staticmethod
+    def _payload(method, prompt, image_url=None):
+        return {"method": method, "prompt": prompt, "image_url": image_url}
+
+    def generate(self, prompt, image_url=None):
+        payload = self._payload("generate", prompt, image_url)
+        return self.recorder.call_sync(self.channel, payload, lambda: self.model.generate(prompt, image_url), "")
+
+    async def generate_async(self, prompt, image_url=None):
+        payload = self._payload("generate", prompt, image_url)
+        return await self.recorder.call(self.channel, payload, lambda: self.model.generate_async(prompt, image_url), "")
+
+    async def generate_stream(self, prompt, image_url=None):
+        """錄製時照常串流並記下完整輸出，重播時一次回傳"""
+        payload = self._payload("generate", prompt, image_url)
+        if self.recorder.replaying:
+            yield await self.recorder.call(self.channel, payload, None, "")
+            return
+        started = time.perf_counter()
+        chunks = []
+        async for chunk in self.model.generate_stream(prompt, image_url):
+            chunks.append(chunk)
+            yield chunk
+        self.recorder.record(self.channel, payload, "".join(chunks), time.perf_counter() - started)
+
+    async def generate_in_context(self, prompt, context, image_url=None):
+        payload = self._payload("generate", prompt, image_url)
+        return await self.recorder.call(
+            self.channel, payload, lambda: self.model.generate_in_context(prompt, context, image_url), ""
+        )
+
+    async def generate_stream_in_context(self, prompt, context, image_url=None):
+        started = time.perf_counter()
+        chunks = []
+        async for chunk in self.model.generate_stream_in_context(prompt, context, image_url):
+            chunks.append(chunk)
+            yield chunk
+        self.recorder.record(self.channel, self._payload("generate", prompt, image_url), "".join(chunks), time.perf_counter() - started)
+
+    async def generate_tool_call(self, prompt, schemas):
+        payload = {**self._payload("tool_call", prompt), "tools": [schema.function_name for schema in schemas]}
+        text, tool_call = await self.recorder.call(
+            self.channel, payload, lambda: self._tool_call(prompt, schemas), ["", None]
+        )
+        return text, tool_call
+
+    async def _tool_call(self, prompt, schemas):
+        return list(await self.model.generate_tool_call(prompt, schemas))
+
 class ModelFactory:
     """模型工廠類別"""
 
     @staticmethod
-    def create_model(model_type, model_name):
-        """根據模型類型創建模型實例"""
+    def create_model(model_type, model_name, cache: CompletionCache = None, channel: str = None):
+        """
+        根據模型類型創建模型實例，有指定快取時包上回應快取
+
+        啟用 RECORD_MODE 且指定 channel 時，最外層再包上錄製 / 重播。
+        """
+        model = ModelFactory._create_base_model(model_type, model_name)
+        if cache is not None:
+            model = CachedModel(model, cache)
+        if channel is not None and recorder.enabled:
+            model = RecordingModel(model, recorder, channel)
+        return model
+
+    @staticmethod
+    def _create_base_model(model_type, model_name):
         if model_type.lower() == "ollama":
             return OllamaModel(model_name)
         elif model_type.lower() == "gemini":
@@ -136,9 +652,22 @@ class ModelFactory:
             parts = model_type.split('@', 1)
             api_base = parts[1] if len(parts) > 1 else None
             return OpenAIModel(model_name, api_base=api_base)
+        elif model_type.lower() == "mock":
+            return MockModel(model_name)
         else:
             raise ValueError(f"不支持的模型類型: {model_type}")
 
-think_model = ModelFactory.create_model(Setting.THINK_MODEL_TYPE, Setting.THINK_MODEL_NAME)
-target_model = ModelFactory.create_model(Setting.TARGET_MODEL_TYPE, Setting.TARGET_MODEL_NAME)
-tool_model = ModelFactory.create_model(Setting.TOOL_MODEL_TYPE, Setting.TOOL_MODEL_NAME)
\ No newline at end of file
+completion_cache = CompletionCache(
+    Setting.COMPLETION_CACHE_TTL,
+    Setting.COMPLETION_CACHE_SIZE,
+    Setting.COMPLETION_CACHE_DB or None,
+)
+
+def _cache_for(agent_name):
+    """依設定決定該代理的模型是否使用回應快取"""
+    return completion_cache if agent_name in Setting.COMPLETION_CACHE_AGENTS else None
+
+think_model = ModelFactory.create_model(Setting.THINK_MODEL_TYPE, Setting.THINK_MODEL_NAME, _cache_for("think"), "think")
+target_model = ModelFactory.create_model(Setting.TARGET_MODEL_TYPE, Setting.TARGET_MODEL_NAME, _cache_for("target"), "target")
+tool_model = ModelFactory.create_model(Setting.TOOL_MODEL_TYPE, Setting.TOOL_MODEL_NAME, _cache_for("tool"), "tool")
+summary_model = ModelFactory.create_model(Setting.SUMMARY_MODEL_TYPE, Setting.SUMMARY_MODEL_NAME, _cache_for("summary"), "summary")
@@ -1,2 +0,0 @@
-import threading
-agent_lock = threading.Lock()
\ No newline at end of file
@@ -0,0 +1,143 @@
+import os
+import csv
+import asyncio
+from typing import IO, Any, Dict, Iterable, List, Optional, Tuple
+from utils.setting import Setting
+
+LOG_HEADER = ["timestamp", "sequence", "message"]
+
+class LogWriter:
+    """
+    背景批次日誌寫入器
+
+    Logger 只把資料列放進記憶體佇列，由背景任務批次寫入 CSV。
+    檔案開啟後保持開啟，依批次大小、時間間隔或關閉時寫入磁碟。
+    """
+
+    def __init__(self, batch_size: int = 100, flush_interval: float = 1.0):
+        """
+        初始化寫入器
+
+        Args:
+            batch_size (int, optional): 每批次最多寫入的資料列數，預設為 100。
+            flush_interval (float, optional): 批次未滿時最多等待的秒數，預設為 1.0。
+        """
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._files: Dict[str, Tuple[IO, Any]] = {}  # 檔名 -> (檔案, csv writer)
+        self._io_lock: Optional[asyncio.Lock] = None  # 確保同一時間只有一個執行緒操作檔案
+
+    def _ensure_started(self) -> None:
+        """在第一次寫入時於目前事件迴圈啟動背景任務"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # 佇列與鎖綁定事件迴圈，換了迴圈（例如測試中重啟 app）就重新建立
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._io_lock = asyncio.Lock()
+            self._task = None
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="log-writer")
+
+    def write(self, filename: str, row: List) -> None:
+        """
+        將一列資料放入寫入佇列，不會等待磁碟 I/O
+
+        Args:
+            filename (str): CSV 檔案路徑。
+            row (List): 要寫入的資料列。
+        """
+        self._ensure_started()
+        self._queue.put_nowait((filename, row))
+
+    async def _run(self) -> None:
+        """背景任務：收集批次並在執行緒中寫入"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                    continue
+                except asyncio.QueueEmpty:
+                    pass
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                async with self._io_lock:
+                    await asyncio.to_thread(self._write_batch, batch)
+            except Exception as e:
+                print(f"❌ 日誌寫入失敗: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _open(self, filename: str):
+        """開啟（或沿用）檔案並在新檔案寫入表頭"""
+        if filename not in self._files:
+            os.makedirs(os.path.dirname(filename) or ".", exist_ok=True)
+            file_exists = os.path.isfile(filename)
+            csvfile = open(filename, "a", newline="", encoding="utf-8")
+            writer = csv.writer(csvfile)
+            if not file_exists:
+                writer.writerow(LOG_HEADER)
+            self._files[filename] = (csvfile, writer)
+        return self._files[filename]
+
+    def _write_batch(self, batch: List[Tuple[str, List]]) -> None:
+        """寫入一個批次並 flush 到磁碟"""
+        touched = {}
+        for filename, row in batch:
+            csvfile, writer = self._open(filename)
+            writer.writerow(row)
+            touched[filename] = csvfile
+        for csvfile in touched.values():
+            csvfile.flush()
+
+    def _close_files(self, filenames: Iterable[str]) -> None:
+        for filename in filenames:
+            entry = self._files.pop(filename, None)
+            if entry is not None:
+                entry[0].close()
+
+    async def flush(self) -> None:
+        """等待佇列中的資料列全部寫入磁碟"""
+        if self._queue is not None and self._task is not None and not self._task.done():
+            await self._queue.join()
+
+    async def close_files(self, filenames: Iterable[str]) -> None:
+        """
+        寫完佇列後關閉指定檔案，通常在對話結束時呼叫
+
+        Args:
+            filenames (Iterable[str]): 要關閉的 CSV 檔案路徑。
+        """
+        await self.flush()
+        if self._io_lock is None:
+            return
+        async with self._io_lock:
+            await asyncio.to_thread(self._close_files, list(filenames))
+
+    async def close(self) -> None:
+        """寫完佇列、停止背景任務並關閉所有檔案"""
+        await self.flush()
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._io_lock is None:
+            return
+        async with self._io_lock:
+            await asyncio.to_thread(self._close_files, list(self._files))
+
+
+log_writer = LogWriter(Setting.LOG_BATCH_SIZE, Setting.LOG_FLUSH_INTERVAL)
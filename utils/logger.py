@@ -1,58 +1,121 @@
 import os
 import csv
-import datetime
 import asyncio
-from utils.timestamp import TimestampGenerator
+import datetime
+from typing import Dict, List
 from utils.public_cache import CachePool
+from utils.log_writer import log_writer
 
 class Logger:
-    _instance = None
-    _lock = asyncio.Lock()
+    """
+    對話 logger
+
+    每個 Session 擁有自己的 Logger，日誌檔以對話 ID 命名，推送也只送往該對話的連線。
+    寫檔交給背景的 log_writer 批次處理，log() 本身不做磁碟 I/O。
+    """
     log_dir = "log"
 
-    def __new__(cls):
-        if cls._instance is None:
-            cls._instance = super(Logger, cls).__new__(cls)
-            os.makedirs(cls.log_dir, exist_ok=True)
-        return cls._instance
-    
+    def __init__(self, conversation_id: str, cache_pool: CachePool, chat_interface=None):
+        """
+        初始化 logger
+
+        Args:
+            conversation_id (str): 對話 ID，同時作為日誌檔名的時間戳。
+            cache_pool (CachePool): 所屬 Session 的快取池。
+            chat_interface: 推送介面，需提供 publish(log_type, sequence, timestamp, message, stream_id)。
+        """
+        self.conversation_id = conversation_id
+        self.cache_pool = cache_pool
+        self.chat_interface = chat_interface
+
+    def get_filename(self, log_type: str) -> str:
+        """獲取指定類型的日誌檔案路徑"""
+        return os.path.join(self.log_dir, log_type, f"{log_type}_log_{self.conversation_id}.csv")
+
+    async def log(self, log_type, sequence, message, stream_id=None):
+        if log_type not in ("think", "tool", "chat"):
+            # think: 給AI看的log, 包含think輸出, 自然語言輸出跟網路搜尋
+            # chat: 給人看的log, 只有自然語言輸出跟網路搜尋
+            raise ValueError("log_type must be 'think', 'tool' or 'chat'")
+
+        if log_type == "think":
+            await self.cache_pool.add_think({"思考": message})
+        elif log_type == "chat":
+            print(message)
+
+        timestamp = datetime.datetime.now().isoformat()
+        log_writer.write(self.get_filename(log_type), [timestamp, sequence, message])
+
+        if log_type != "tool" and self.chat_interface is not None:
+            await self.chat_interface.publish(log_type, sequence, timestamp, message, stream_id)
+
+    async def close(self):
+        """寫完並關閉此對話的日誌檔"""
+        await log_writer.close_files(self.get_filename(log_type) for log_type in ("think", "tool", "chat"))
+
+    @classmethod
+    async def list_conversations(cls) -> List[Dict[str, str]]:
+        """
+        列出有 chat 日誌的對話，新的在前
+
+        Returns:
+            List[Dict[str, str]]: 每個對話的 id、title（第一則 chat 訊息的開頭）與 created_at。
+        """
+        await log_writer.flush()
+        return await asyncio.to_thread(cls._list_conversations)
+
     @classmethod
-    async def set_conversation(cls, chat_interface, uid):
-        cls.chat_interface = chat_interface
-        cls.uid = uid
+    async def read_logs(cls, log_type: str, conversation_id: str) -> List[Dict[str, str]]:
+        """
+        讀取對話的日誌
+
+        Args:
+            log_type (str): "think"、"tool" 或 "chat"。
+            conversation_id (str): 對話 ID。
+
+        Returns:
+            List[Dict[str, str]]: 每列的 timestamp、sequence 與 message，日誌不存在時為空清單。
+        """
+        if log_type not in ("think", "tool", "chat") or os.path.basename(conversation_id) != conversation_id:
+            return []  # 不讀取日誌目錄以外的檔案
+        await log_writer.flush()
+        return await asyncio.to_thread(cls._read_rows, cls(conversation_id, None).get_filename(log_type))
 
     @classmethod
-    async def log(cls, log_type, sequence, message):
-        async with cls._lock:
-            if log_type == "think":
-                # 給AI看的log, 包含think輸出, 自然語言輸出跟網路搜尋
-                subdir = "think"
-            elif log_type == "tool":
-                subdir = "tool"
-            elif log_type == "chat":
-                # 給人看的log, 只有自然語言輸出跟網路搜尋
-                subdir = "chat"
-            else:
-                raise ValueError("log_type must be 'think', 'tool' or 'chat'")
-
-            # 產生正確的路徑
-            log_dir = os.path.join(cls.log_dir, subdir)
-            os.makedirs(log_dir, exist_ok=True)
-            filename = os.path.join(log_dir, f"{log_type}_log_{TimestampGenerator.get_timestamp()}.csv")
-
-            if log_type == "think":
-                await CachePool.add_think({"思考": message})
-            elif log_type == "chat":
-                print(message)
-
-            file_exists = os.path.isfile(filename)
-            with open(filename, "a", newline="", encoding="utf-8") as csvfile:
-                writer = csv.writer(csvfile)
-                if not file_exists:
-                    writer.writerow(["timestamp", "sequence", "message"])
-
-                timestamp = datetime.datetime.now().isoformat()
-                writer.writerow([timestamp, sequence, message])
-
-            if log_type != "tool":
-                await cls.chat_interface.send_conversation(cls.uid)
\ No newline at end of file
+    def _list_conversations(cls) -> List[Dict[str, str]]:
+        directory = os.path.join(cls.log_dir, "chat")
+        prefix, suffix = "chat_log_", ".csv"
+        try:
+            filenames = sorted(os.listdir(directory), reverse=True)
+        except FileNotFoundError:
+            return []
+        conversations = []
+        for filename in filenames:
+            if not (filename.startswith(prefix) and filename.endswith(suffix)):
+                continue
+            conversation_id = filename[len(prefix):-len(suffix)]
+            rows = cls._read_rows(os.path.join(directory, filename), limit=1)
+            try:
+                created_at = datetime.datetime.strptime(conversation_id[:15], "%Y%m%d_%H%M%S").isoformat()
+            except ValueError:
+                created_at = rows[0]["timestamp"] if rows else ""
+            conversations.append({
+                "id": conversation_id,
+                "title": rows[0]["message"][:30] if rows else conversation_id,
+                "created_at": created_at,
+            })
+        return conversations
+
+    @staticmethod
+    def _read_rows(filename: str, limit: int = None) -> List[Dict[str, str]]:
+        """讀取 log_writer 寫入的 CSV，limit 指定時最多讀取幾列"""
+        try:
+            with open(filename, newline="", encoding="utf-8") as f:
+                rows = []
+                for row in csv.DictReader(f):
+                    rows.append(row)
+                    if limit is not None and len(rows) >= limit:
+                        break
+                return rows
+        except FileNotFoundError:
+            return []
@@ -0,0 +1,321 @@
+import os
+import zlib
+import asyncio
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Collection, Dict, List, Optional, Tuple
+import numpy as np
+from utils.llm_model import get_ollama_clients
+from utils.setting import Setting
+from utils.token_budget import tokenize
+
+try:
+    import ollama  # 選用：使用本機的 embedding 模型
+except ImportError:
+    ollama = None
+
+
+class Embedder(ABC):
+    """把文字轉成向量的介面"""
+
+    name: str = ""
+
+    @abstractmethod
+    async def embed(self, text: str) -> np.ndarray:
+        """回傳單位長度的 float32 向量"""
+        pass
+
+
+class HashingEmbedder(Embedder):
+    """
+    特徵雜湊向量化
+
+    不需要模型：英數字單字與中日韓雙字詞以 crc32 雜湊到固定維度，
+    雜湊值不受 PYTHONHASHSEED 影響，存檔後重新啟動仍可使用。
+    """
+
+    def __init__(self, dim: int = 512):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def embed_sync(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for token in tokenize(text):
+            digest = zlib.crc32(token.encode("utf-8"))
+            vector[digest % self.dim] += 1.0 if digest & 0x80000000 else -1.0
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    async def embed(self, text: str) -> np.ndarray:
+        return self.embed_sync(text)
+
+
+class OllamaEmbedder(Embedder):
+    """使用 Ollama 的 embedding 模型，例如 nomic-embed-text"""
+
+    def __init__(self, model_name: str):
+        if ollama is None:
+            raise ImportError("使用 Ollama embedding 需要安裝 ollama")
+        self.model_name = model_name
+        self.name = f"ollama-{model_name}"
+
+    async def embed(self, text: str) -> np.ndarray:
+        response = await get_ollama_clients()[1].embeddings(model=self.model_name, prompt=text)
+        vector = np.asarray(response["embedding"], dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+
+class VectorIndex(ABC):
+    """向量索引介面，可以換成 ANN 實作"""
+
+    @abstractmethod
+    def add(self, vector: np.ndarray) -> None:
+        pass
+
+    @abstractmethod
+    def search(self, query: np.ndarray, k: int) -> List[Tuple[int, float]]:
+        """回傳 (位置, 餘弦相似度)，由高到低排序"""
+        pass
+
+    @abstractmethod
+    def remove_oldest(self, count: int) -> None:
+        pass
+
+    @abstractmethod
+    def vectors(self) -> np.ndarray:
+        pass
+
+
+class NumpyIndex(VectorIndex):
+    """
+    暴力搜尋的向量索引
+
+    向量存在預先配置的矩陣中，容量不足時加倍；搜尋是一次矩陣乘法加上 argpartition。
+    """
+
+    def __init__(self, dim: Optional[int] = None):
+        self.dim = dim
+        self._matrix: Optional[np.ndarray] = None
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, vector: np.ndarray) -> None:
+        if self._matrix is None:
+            self.dim = vector.shape[0]
+            self._matrix = np.zeros((64, self.dim), dtype=np.float32)
+        if vector.shape[0] != self.dim:
+            raise ValueError(f"向量維度不符: {vector.shape[0]} != {self.dim}")
+        if self._size == self._matrix.shape[0]:
+            grown = np.zeros((self._size * 2, self.dim), dtype=np.float32)
+            grown[:self._size] = self._matrix
+            self._matrix = grown
+        self._matrix[self._size] = vector
+        self._size += 1
+
+    def search(self, query: np.ndarray, k: int) -> List[Tuple[int, float]]:
+        if self._size == 0 or k <= 0 or query.shape[0] != self.dim:
+            return []
+        scores = self._matrix[:self._size] @ query
+        k = min(k, self._size)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(index), float(scores[index])) for index in top]
+
+    def remove_oldest(self, count: int) -> None:
+        count = min(count, self._size)
+        if count <= 0:
+            return
+        self._matrix[:self._size - count] = self._matrix[count:self._size]
+        self._size -= count
+
+    def vectors(self) -> np.ndarray:
+        if self._matrix is None:
+            return np.zeros((0, self.dim or 0), dtype=np.float32)
+        return self._matrix[:self._size].copy()
+
+
+def content_key(text: str) -> int:
+    """記憶內容的雜湊，用來去重與排除已經在快取池視窗中的內容"""
+    return zlib.crc32(text.strip().encode("utf-8"))
+
+
+class LongTermMemory:
+    """
+    長期記憶
+
+    代理得知的內容與快取池摘要轉成向量存入索引，可以定期存到磁碟；
+    代理每一步以最近的思路檢索最相關的幾筆放入提示，避免重複搜尋已經知道的事。
+    每個 Session 擁有自己的實例，內容不會出現在其他使用者的提示中。
+    """
+
+    def __init__(self, embedder: Embedder, index: Optional[VectorIndex] = None, path: str = "",
+                 max_entries: int = 10000, min_score: float = 0.1, save_every: int = 20):
+        """
+        初始化長期記憶
+
+        Args:
+            embedder (Embedder): 向量化的方式。
+            index (VectorIndex, optional): 向量索引，預設為 NumpyIndex。
+            path (str, optional): 存檔路徑（.npz），留空表示不存檔。
+            max_entries (int, optional): 最多保存的記憶數，超過時移除最舊的。
+            min_score (float, optional): 檢索結果的最低相似度。
+            save_every (int, optional): 每新增幾筆存檔一次。
+        """
+        self.embedder = embedder
+        self.index = index or NumpyIndex()
+        self.path = path
+        self.max_entries = max_entries
+        self.min_score = min_score
+        self.save_every = save_every
+        self.texts: List[str] = []
+        self._known = set()  # 已存入文字的 crc32，避免重複
+        self._unsaved = 0
+        self._lock = threading.Lock()  # 保護索引與文字清單，存檔在執行緒中進行
+        self.stats = {"added": 0, "duplicates": 0, "searches": 0, "hits": 0, "failed": 0}
+        if path:
+            self.load()
+
+    async def add(self, text: str) -> bool:
+        """
+        新增一筆記憶
+
+        Returns:
+            bool: 已存入時為 True，重複或失敗時為 False。
+        """
+        text = text.strip()
+        key = content_key(text)
+        if not text or key in self._known:
+            self.stats["duplicates"] += 1
+            return False
+        try:
+            vector = await self.embedder.embed(text)
+        except Exception as e:
+            self.stats["failed"] += 1
+            print(f"⚠️ 記憶向量化失敗: {e}")
+            return False
+        with self._lock:
+            self.index.add(vector)
+            self.texts.append(text)
+            self._known.add(key)
+            overflow = len(self.texts) - self.max_entries
+            if overflow > 0:
+                self.index.remove_oldest(overflow)
+                for removed in self.texts[:overflow]:
+                    self._known.discard(content_key(removed))
+                del self.texts[:overflow]
+        self.stats["added"] += 1
+        self._unsaved += 1
+        if self.path and self._unsaved >= self.save_every:
+            await asyncio.to_thread(self.save)
+        return True
+
+    async def search(self, query: str, k: int = 3, exclude: Collection[int] = ()) -> List[Tuple[str, float]]:
+        """
+        檢索最相關的記憶
+
+        Args:
+            query (str): 查詢文字。
+            k (int, optional): 最多回傳幾筆。
+            exclude (Collection[int], optional): 不回傳的記憶的 content_key()，例如目前快取池視窗中的元素。
+
+        Returns:
+            List[Tuple[str, float]]: (記憶, 相似度)，由相關到不相關排序。
+        """
+        if not query.strip() or not self.texts:
+            return []
+        self.stats["searches"] += 1
+        try:
+            vector = await self.embedder.embed(query)
+        except Exception as e:
+            self.stats["failed"] += 1
+            print(f"⚠️ 記憶檢索失敗: {e}")
+            return []
+        with self._lock:
+            # 多取一些，扣掉已經在視窗中的內容
+            results = [(self.texts[index], score) for index, score in self.index.search(vector, k + len(exclude))]
+        memories = [
+            (text, score) for text, score in results if score >= self.min_score and content_key(text) not in exclude
+        ][:k]
+        self.stats["hits"] += len(memories)
+        return memories
+
+    def save(self) -> None:
+        """存到磁碟，先寫入暫存檔再取代，避免中斷時留下損壞的檔案"""
+        if not self.path:
+            return
+        with self._lock:
+            vectors = self.index.vectors()
+            texts = np.array(self.texts, dtype=str)
+            self._unsaved = 0
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{self.path}.tmp.npz"
+        np.savez(temp_path, vectors=vectors, texts=texts, embedder=np.array(self.embedder.name))
+        os.replace(temp_path, self.path)
+
+    def load(self) -> None:
+        """讀取存檔，向量化方式不同時忽略舊的記憶"""
+        if not os.path.isfile(self.path):
+            return
+        try:
+            with np.load(self.path, allow_pickle=False) as data:
+                if str(data["embedder"]) != self.embedder.name:
+                    print(f"⚠️ 記憶存檔使用 {data['embedder']}，與目前的 {self.embedder.name} 不同，略過")
+                    return
+                vectors, texts = data["vectors"], [str(text) for text in data["texts"]]
+        except (OSError, KeyError, ValueError) as e:
+            print(f"⚠️ 讀取記憶存檔失敗: {e}")
+            return
+        for vector, text in zip(vectors, texts):
+            self.index.add(vector)
+            self.texts.append(text)
+            self._known.add(content_key(text))
+        print(f"🧠 載入 {len(texts)} 筆長期記憶")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.stats, "entries": len(self.texts), "embedder": self.embedder.name}
+
+    async def close(self) -> None:
+        """存檔尚未寫入的記憶"""
+        if self.path and self._unsaved:
+            await asyncio.to_thread(self.save)
+
+
+def create_embedder(kind: str) -> Embedder:
+    """
+    依設定建立向量化方式
+
+    Args:
+        kind (str): "ollama" 或 "hashing"，無法使用 Ollama 時改用 hashing。
+    """
+    if kind == "ollama":
+        try:
+            return OllamaEmbedder(Setting.MEMORY_EMBED_MODEL)
+        except ImportError as e:
+            print(f"⚠️ {e}，改用 hashing 向量化")
+    return HashingEmbedder(Setting.MEMORY_HASH_DIM)
+
+
+def create_memory(path: str = "") -> LongTermMemory:
+    """
+    依設定建立長期記憶
+
+    Args:
+        path (str, optional): 存檔路徑，留空表示只保存在記憶體中。
+    """
+    return LongTermMemory(
+        create_embedder(Setting.MEMORY_EMBEDDER),
+        path=path,
+        max_entries=Setting.MEMORY_MAX_ENTRIES,
+        min_score=Setting.MEMORY_MIN_SCORE,
+    )
+
+
+# 所有對話共用的網路搜尋結果，只保存公開網頁的內容；預設關閉
+shared_search_memory: Optional[LongTermMemory] = (
+    create_memory(Setting.MEMORY_PATH) if Setting.MEMORY_ENABLED and Setting.MEMORY_SHARE_SEARCH else None
+)
@@ -0,0 +1,194 @@
+import re
+import json
+import math
+import zlib
+import random
+import asyncio
+import hashlib
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+import httpx
+from utils.setting import Setting
+from utils.token_budget import estimate_tokens
+
+# 沒有指定腳本時使用的回應，依提示內容比對；{n} 會換成該規則第幾次回應
+DEFAULT_SCRIPT: List[Dict[str, Any]] = [
+    {"match": "長期摘要", "responses": ["先前查過第 {n} 批資料，決定先比較價格與距離。"]},
+    {"match": "管理check_list", "responses": [
+        '{"tool_name": "更新檢查清單", "args": {"check_list": ['
+        '{"item": "查詢附近餐廳 {n}", "status": "completed"}, '
+        '{"item": "比較菜單 {n}", "status": "progressing"}, '
+        '{"item": "決定晚餐", "status": "pending"}]}}',
+        "",
+    ]},
+    {"match": "你能夠使用這些工具|呼叫工具", "responses": [
+        '{"tool_name": "網路搜尋", "args": {"query": "附近的餐廳推薦 {n}"}}',
+        "不需要工具",
+        '{"tool_name": "自然表達", "args": {"sentence": "我還在比較第 {n} 個選項。"}}',
+    ]},
+    {"match": "", "responses": [
+        "我決定先搜尋附近評價最高的餐廳，這是第 {n} 個想法。",
+        "我假設預算是兩人五百元，接著比較菜單。",
+        "我決定排除需要排隊超過三十分鐘的店。",
+    ]},
+]
+
+PAGE_WORDS = "餐廳 菜單 價格 評價 營業時間 地址 牛肉麵 水餃 拉麵 咖哩 便當 火鍋 素食 甜點 咖啡 推薦 排隊 外帶 停車 交通".split()
+
+
+class LatencyModel:
+    """
+    模擬的回應延遲
+
+    基本延遲依分布抽樣，另外加上輸出 token 數除以生成速度的時間；同一個 seed 的抽樣順序固定。
+    """
+
+    def __init__(self, distribution: str = "lognormal", mean: float = 0.3, jitter: float = 0.5,
+                 token_rate: float = 100, seed: int = 0):
+        """
+        初始化延遲模型
+
+        Args:
+            distribution (str, optional): fixed、uniform 或 lognormal。
+            mean (float, optional): 基本延遲的平均秒數。
+            jitter (float, optional): uniform 為上下浮動的比例，lognormal 為對數標準差。
+            token_rate (float, optional): 每秒生成的 token 數，0 表示不計生成時間。
+            seed (int, optional): 亂數種子。
+        """
+        if distribution not in ("fixed", "uniform", "lognormal"):
+            raise ValueError(f"不支持的延遲分布: {distribution}")
+        self.distribution = distribution
+        self.mean = max(mean, 0)
+        self.jitter = max(jitter, 0)
+        self.token_rate = token_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def first_token(self) -> float:
+        """第一個 token 之前的延遲"""
+        if self.mean == 0 or self.distribution == "fixed":
+            return self.mean
+        with self._lock:
+            if self.distribution == "uniform":
+                return self.mean * (1 + self._random.uniform(-self.jitter, self.jitter))
+            mu = math.log(self.mean) - self.jitter ** 2 / 2  # 平均值維持在 mean
+            return self._random.lognormvariate(mu, self.jitter)
+
+    def per_token(self) -> float:
+        return 1 / self.token_rate if self.token_rate > 0 else 0.0
+
+    def total(self, text: str) -> float:
+        """完整回應的延遲"""
+        return self.first_token() + estimate_tokens(text) * self.per_token()
+
+
+class MockScript:
+    """
+    依提示內容選擇回應的腳本
+
+    規則由上到下比對 match（正規表示式，空字串符合所有提示），符合的規則依序輪流使用 responses。
+    """
+
+    def __init__(self, rules: List[Dict[str, Any]]):
+        self.rules = [(re.compile(rule.get("match", "")), list(rule["responses"])) for rule in rules]
+        self._counters = [0] * len(self.rules)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path: str) -> "MockScript":
+        """讀取 JSONL 腳本，每行一條規則；path 為空時使用 DEFAULT_SCRIPT"""
+        if not path:
+            return cls(DEFAULT_SCRIPT)
+        with open(path, encoding="utf-8") as f:
+            return cls([json.loads(line) for line in f if line.strip()])
+
+    def respond(self, prompt: str) -> str:
+        for index, (pattern, responses) in enumerate(self.rules):
+            if responses and pattern.search(prompt):
+                with self._lock:
+                    self._counters[index] += 1
+                    n = self._counters[index]
+                return responses[(n - 1) % len(responses)].replace("{n}", str(n))
+        return ""
+
+
+class MockWeb:
+    """
+    SerpAPI 與網頁的本機替身
+
+    以 httpx 的 MockTransport 接上共用連線池：搜尋回傳固定格式的結果，
+    網頁內容由網址雜湊產生，同一網址每次都相同。
+    """
+
+    def __init__(self, latency: float = 0.05, results: int = 5):
+        """
+        初始化本機替身
+
+        Args:
+            latency (float, optional): 每個請求的延遲秒數。
+            results (int, optional): 每次搜尋回傳的結果數。
+        """
+        self.latency = latency
+        self.results = results
+        self.requests = 0
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        url = urlsplit(str(request.url))
+        if url.path.endswith("search.json"):
+            query = parse_qs(url.query).get("q", [""])[0]
+            return httpx.Response(200, json={"organic_results": self.search_results(query)})
+        return httpx.Response(200, html=self.page(str(request.url)))
+
+    async def handle_async(self, request: httpx.Request) -> httpx.Response:
+        if self.latency > 0:
+            await asyncio.sleep(self.latency)
+        return self.handle(request)
+
+    def search_results(self, query: str) -> List[Dict[str, str]]:
+        digest = hashlib.sha1(query.encode("utf-8")).hexdigest()[:8]
+        return [
+            {
+                "title": f"{query} 第 {index + 1} 筆",
+                "link": f"http://mock.local/page/{digest}/{index}",
+                "snippet": f"關於 {query} 的摘要 {index + 1}",
+            }
+            for index in range(self.results)
+        ]
+
+    @staticmethod
+    def page(url: str) -> str:
+        rng = random.Random(zlib.crc32(url.encode("utf-8")))
+        paragraphs = "".join(
+            f"<p>{''.join(rng.choice(PAGE_WORDS) for _ in range(40))}</p>" for _ in range(20)
+        )
+        return f"<html><head><title>模擬網頁</title><script>var x = 1;</script></head><body>{paragraphs}</body></html>"
+
+    def transports(self) -> Tuple[httpx.MockTransport, httpx.MockTransport]:
+        """(非同步, 同步) 客戶端使用的 transport"""
+        return httpx.MockTransport(self.handle_async), httpx.MockTransport(self.handle)
+
+
+def create_latency_model(name: str) -> LatencyModel:
+    """依設定建立延遲模型，每個模型名稱有各自固定的亂數序列"""
+    return LatencyModel(
+        Setting.MOCK_LATENCY,
+        Setting.MOCK_LATENCY_MEAN,
+        Setting.MOCK_LATENCY_JITTER,
+        Setting.MOCK_TOKEN_RATE,
+        Setting.MOCK_SEED + zlib.crc32(name.encode("utf-8")),
+    )
+
+
+_script: Optional[MockScript] = None
+
+def get_mock_script() -> MockScript:
+    """所有 mock 模型共用的腳本，第一次使用時讀取"""
+    global _script
+    if _script is None:
+        _script = MockScript.load(Setting.MOCK_SCRIPT)
+    return _script
+
+
+mock_web = MockWeb(Setting.MOCK_WEB_LATENCY)
@@ -1,18 +1,121 @@
-from typing import Any
+from functools import lru_cache
+from string import Formatter
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+# (前面的固定文字, 變數名稱, 轉換, 格式)，變數名稱為 None 表示模板結尾
+Segment = Tuple[str, Optional[str], Optional[str], str]
+
+_formatter = Formatter()
+
+@lru_cache(maxsize=64)
+def compile_template(template: str) -> Tuple[Segment, ...]:
+    """
+    把模板拆成固定文字與變數片段，同一模板只解析一次
+
+    Args:
+        template (str): str.format 格式的模板。
+
+    Returns:
+        Tuple[Segment, ...]: 依序排列的片段。
+    """
+    return tuple(
+        (literal, field_name, conversion or None, format_spec or "")
+        for literal, field_name, format_spec, conversion in _formatter.parse(template)
+    )
 
 class Prompt:
-    """提示抽象類別"""
+    """
+    提示類別
+
+    模板在建立時編譯成片段，每個變數的渲染結果分別快取：
+    只有值改變的變數會重新渲染，沒有變數改變時 format() 直接回傳上次的結果。
+    """
 
     def __init__(self, template, variables=None):
         self.template = template
-        self.variables = variables or {}
+        self.segments = compile_template(template)
+        self.variables: Dict[str, Any] = {}
+        self._rendered: Dict[Tuple[str, Optional[str], str], str] = {}  # (欄位, 轉換, 格式) -> 渲染後的字串
+        self._volatile: Set[str] = set()  # 渲染過後又被修改的變數
+        self._output: Optional[str] = None
+        for name, value in (variables or {}).items():
+            self.set_variable(name, value)
 
     def format(self):
         """格式化提示"""
-        return self.template.format(**self.variables)
-    
+        if self._output is None:
+            self._output = "".join(self._render_segments(self.segments))
+        return self._output
+
+    def _render_segments(self, segments) -> List[str]:
+        parts = []
+        for literal, field_name, conversion, format_spec in segments:
+            parts.append(literal)
+            if field_name is not None:
+                parts.append(self._render(field_name, conversion, format_spec))
+        return parts
+
+    def _render(self, field_name: str, conversion: Optional[str], format_spec: str) -> str:
+        key = (field_name, conversion, format_spec)
+        rendered = self._rendered.get(key)
+        if rendered is None:
+            value, _ = _formatter.get_field(field_name, (), self.variables)
+            rendered = _formatter.format_field(_formatter.convert_field(value, conversion), format_spec)
+            self._rendered[key] = rendered
+        return rendered
+
     def set_variable(self, name: str, value: Any):
+        previous = self.variables.get(name, _MISSING)
+        if previous is value or (previous is not _MISSING and type(previous) is type(value) and previous == value):
+            return
         self.variables[name] = value
+        stale = [key for key in self._rendered if _root_name(key[0]) == name]
+        if stale:
+            self._volatile.add(name)  # 已經渲染過又被修改，不屬於穩定前綴
+        for key in stale:
+            del self._rendered[key]
+        self._output = None
+
+    def tail_after(self, name: str) -> Optional[str]:
+        """
+        回傳最後一個 name 欄位之後的內容，其後的變數一併渲染；模板中沒有 name 時回傳 None
+
+        追加模式用它在新增的內容後面補上提示結尾，每一步都會改變的變數（例如 memory）可以放在這裡。
+        """
+        index = self._last_field(name)
+        if index is None:
+            return None
+        return "".join(self._render_segments(self.segments[index + 1:]))
+
+    def names_after(self, name: str) -> Set[str]:
+        """最後一個 name 欄位之後出現的變數名稱"""
+        index = self._last_field(name)
+        if index is None:
+            return set()
+        return {_root_name(segment[1]) for segment in self.segments[index + 1:] if segment[1] is not None}
+
+    def _last_field(self, name: str) -> Optional[int]:
+        fields = [index for index, segment in enumerate(self.segments)
+                  if segment[1] is not None and _root_name(segment[1]) == name]
+        return fields[-1] if fields else None
+
+    @property
+    def prefix(self) -> str:
+        """
+        穩定的前綴：第一個會變動的變數之前的內容
+
+        只設定一次的變數（例如 tool_list、current_target）視為固定內容；
+        前綴在多次呼叫之間不變，支援前綴快取的後端可以重用已計算的部分。
+        """
+        parts = []
+        for literal, field_name, conversion, format_spec in self.segments:
+            parts.append(literal)
+            if field_name is None:
+                continue
+            if _root_name(field_name) in self._volatile or _root_name(field_name) not in self.variables:
+                break
+            parts.append(self._render(field_name, conversion, format_spec))
+        return "".join(parts)
 
     @classmethod
     def from_template(cls, template):
@@ -22,4 +125,10 @@ class Prompt:
     @classmethod
     def from_template_and_variables(cls, template, variables):
         """從模板和變數創建提示"""
-        return cls(template, variables)
\ No newline at end of file
+        return cls(template, variables)
+
+_MISSING = object()
+
+def _root_name(field_name: str) -> str:
+    """取出欄位的變數名稱，例如 a.b 或 a[0] 中的 a"""
+    return field_name.split(".", 1)[0].split("[", 1)[0]
@@ -1,133 +1,333 @@
+import asyncio
 import threading
 from collections import deque
-from typing import Any, Deque, List, Dict
+from contextvars import ContextVar
+from typing import TYPE_CHECKING, Any, Callable, Deque, List, Dict, Optional, Tuple
+from utils.cache_storage import CacheEntry, CacheStorage, create_storage
+from utils.setting import Setting
+
+if TYPE_CHECKING:
+    from utils.logger import Logger
+    from utils.token_budget import TokenCounter
+
+# 摘要元素的鍵
+SUMMARY_KEY = "先前摘要"
+
+# 目前寫入快取池的代理，由代理在自己的任務中設定，用來讓代理忽略自己造成的變更
+current_writer: ContextVar[Optional[str]] = ContextVar("cache_pool_writer", default=None)
 
 class CachePool:
     """
     快取池類別，用於儲存和管理快取資料。
+
+    每個對話 Session 擁有自己的 CachePool 實例，彼此不共享狀態。
     """
 
-    _pool: Deque[Any] = deque(maxlen=25)  # 快取池，最大長度為 25
-    _lock: threading.Lock = threading.Lock()  # 線程鎖，用於保證線程安全
-    _current_target: str = "目前還沒有目標"  # 當前目標，預設為 "目前還沒有目標"
-    _check_list: List[Dict[str, str]] = []  # 檢查清單，格式: [{"item": "描述", "status": "pending/completed"}]
-    _image_url: str = None  # 當前圖片 URL
+    def __init__(self, logger: Optional["Logger"] = None, maxlen: Optional[int] = None, storage: Optional[CacheStorage] = None):
+        """
+        初始化快取池
+
+        Args:
+            logger (Logger, optional): 所屬 Session 的 logger，新增元素時會一併記錄。
+            maxlen (int, optional): 快取池最大長度，預設為 Setting.CACHE_POOL_SIZE。
+            storage (CacheStorage, optional): 儲存層，預設依 Setting.CACHE_POOL_BACKEND 建立。
+        """
+        self._pool: CacheStorage = storage or create_storage(
+            Setting.CACHE_POOL_BACKEND, maxlen or Setting.CACHE_POOL_SIZE
+        )  # 快取池
+        self._lock: threading.Lock = threading.Lock()  # 線程鎖，只保護不含 await 的短暫讀寫
+        self._write_lock: asyncio.Lock = asyncio.Lock()  # 寫入鎖，確保同一對話內「新增 + 記錄」依序完成
+        self._current_target: str = "目前還沒有目標"  # 當前目標，預設為 "目前還沒有目標"
+        self._check_list: List[Dict[str, str]] = []  # 檢查清單，格式: [{"item": "描述", "status": "pending/completed"}]
+        self._image_url: Optional[str] = None  # 當前圖片 URL
+        self._logger: Optional["Logger"] = logger
+        self.version: int = 0  # 內容版本號，每次變更遞增
+        self._changes: Deque[Tuple[int, Optional[str], bool]] = deque(maxlen=64)  # 最近的 (版本號, 寫入者, 是否緊急)
+        self._change_event: asyncio.Event = asyncio.Event()  # 下一次變更時觸發
+        self._evicted: Deque[CacheEntry] = deque(maxlen=Setting.SUMMARY_MAX_PENDING)  # 被淘汰、尚未併入摘要的元素
+        self._summary: Optional[CacheEntry] = None  # 固定放在視窗最前面的摘要
+        self.on_evict: Optional[Callable[[int], None]] = None  # 有元素被淘汰時呼叫，參數為待摘要的元素數
+
+    def set_logger(self, logger: "Logger") -> None:
+        """
+        設置快取池使用的 logger。
+
+        Args:
+            logger (Logger): 所屬 Session 的 logger。
+        """
+        self._logger = logger
+
+    def _bump(self, urgent: bool = False) -> None:
+        """
+        遞增版本號並喚醒等待變更的代理
+
+        Args:
+            urgent (bool, optional): 使用者輸入或目標改變等緊急變更，代理不必等到最短間隔結束。
+        """
+        self.version += 1
+        self._changes.append((self.version, current_writer.get(), urgent))
+        event, self._change_event = self._change_event, asyncio.Event()
+        event.set()
+
+    def changed_since(self, since: int, exclude: Optional[str] = None, urgent_only: bool = False) -> bool:
+        """
+        檢查自某版本後是否有其他寫入者造成的變更。
+
+        Args:
+            since (int): 上次看到的版本號。
+            exclude (str, optional): 要忽略的寫入者（通常是代理自己）。
+            urgent_only (bool, optional): 只計算緊急變更。
+
+        Returns:
+            bool: 有新的變更時為 True。
+        """
+        if self.version <= since:
+            return False
+        if not self._changes or self._changes[0][0] > since + 1:
+            return True  # 變更紀錄已被淘汰，保守地視為有變更
+        return any(
+            version > since and writer != exclude and (urgent or not urgent_only)
+            for version, writer, urgent in self._changes
+        )
+
+    async def wait_for_change(self, since: int, exclude: Optional[str] = None, timeout: Optional[float] = None,
+                              urgent_only: bool = False) -> bool:
+        """
+        等待自某版本後其他寫入者造成的變更。
+
+        Args:
+            since (int): 上次看到的版本號。
+            exclude (str, optional): 要忽略的寫入者（通常是代理自己）。
+            timeout (float, optional): 最多等待的秒數。
+            urgent_only (bool, optional): 只等待緊急變更。
+
+        Returns:
+            bool: 有新的變更時為 True，逾時為 False。
+        """
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        while not self.changed_since(since, exclude, urgent_only):
+            remaining = None if deadline is None else deadline - loop.time()
+            if remaining is not None and remaining <= 0:
+                return False
+            try:
+                await asyncio.wait_for(self._change_event.wait(), timeout=remaining)
+            except asyncio.TimeoutError:
+                return False
+        return True
 
-    @classmethod
-    async def add(cls, input: Any) -> None:
+    async def add(self, input: Any, stream_id: Optional[str] = None, urgent: bool = False,
+                  responder: Optional[str] = None) -> None:
         """
         向快取池中新增一個元素。
 
         Args:
             input (Any): 要新增的元素。
+            stream_id (str, optional): 元素已經串流推送過時的串流 ID，讓客戶端不再重複顯示。
+            urgent (bool, optional): 是否為緊急變更（例如使用者輸入），會立即喚醒代理。
+            responder (str, optional): 元素是代理的模型回應本身時，該代理的寫入者識別碼；
+                回應已經在該代理的模型 context 中，get_since() 可以略過它。
         """
-        with cls._lock:
-            cls._pool.append(input)
-
-        # 動態導入 Logger 避免循環依賴
-        from utils.logger import Logger
-        await Logger.log("think", len(cls._pool), input)
+        async with self._write_lock:
+            self._append(input, responder)
+            self._bump(urgent)
+            if self._logger is not None:
+                await self._logger.log("think", len(self._pool), input, stream_id)
 
-    @classmethod
-    async def add_think(cls, input: Any) -> None:
+    async def add_think(self, input: Any) -> None:
         """
         向快取池中新增一個 think 元素（不觸發 Logger.log）。
 
+        只會在 add() 持有寫入鎖時由 logger 呼叫，因此這裡不再取得寫入鎖。
+
         Args:
             input (Any): 要新增的 think 元素。
         """
-        with cls._lock:
-            cls._pool.append(input)
+        self._append(input)
+
+    def _append(self, input: Any, responder: Optional[str] = None) -> None:
+        with self._lock:
+            evicted = self._pool.append(input, responder)
+            if evicted is not None:
+                self._evicted.append(evicted)
+            pending = len(self._evicted)
+        if evicted is not None and self.on_evict is not None:
+            self.on_evict(pending)
+
+    def take_evicted(self) -> List[CacheEntry]:
+        """取出所有待摘要的淘汰元素"""
+        with self._lock:
+            entries = list(self._evicted)
+            self._evicted.clear()
+        return entries
+
+    def restore_evicted(self, entries: List[CacheEntry]) -> None:
+        """摘要失敗時放回取出的元素，之後再試"""
+        with self._lock:
+            newer = list(self._evicted)
+            self._evicted.clear()
+            self._evicted.extend(entries + newer)
 
-    @classmethod
-    async def get_len(cls) -> int:
+    def get_summary(self) -> Optional[str]:
+        """獲取目前的摘要"""
+        summary = self._summary
+        return summary.value[SUMMARY_KEY] if summary is not None else None
+
+    def set_summary(self, summary: str) -> None:
+        """
+        設置摘要，之後 get() 會把它放在最前面。
+
+        Args:
+            summary (str): 被淘汰元素的摘要。
+        """
+        self._summary = CacheEntry({SUMMARY_KEY: summary}) if summary else None
+
+    async def get_len(self) -> int:
         """
         獲取快取池的長度。
 
         Returns:
             int: 快取池的長度。
         """
-        return len(cls._pool)
+        return len(self._pool)
 
-    @classmethod
-    def get(cls, length: int = 20) -> str:
+    def get(self, length: Optional[int] = None, budget: int = 0, counter: Optional["TokenCounter"] = None) -> str:
         """
         從快取池中獲取指定長度的元素，並將其轉換為字串。
 
+        元素在新增時已渲染，同一視窗在內容未變前會直接使用快取的字串。
+        有摘要時固定放在最前面。指定 budget 時依 counter 的截斷規則縮短元素，並由新到舊放入直到用完 token 預算。
+
         Args:
-            length (int, optional): 要獲取的元素長度，預設為 20。
+            length (int, optional): 要獲取的元素長度，預設為 Setting.CACHE_WINDOW_SIZE。
+            budget (int, optional): token 預算，0 表示不限制。
+            counter (TokenCounter, optional): 計算 token 的工具，指定 budget 時必須提供。
 
         Returns:
             str: 快取池中指定長度的元素，以逗號分隔的字串形式返回。
         """
-        with cls._lock:
-            length = min(length, len(cls._pool))
-            items: List[Any] = list(cls._pool)[-length:]
-            # 將列表中的每個元素轉換為字串，並連接起來
-            return ", ".join(map(str, items))  # 將 list 轉成字串
+        length = Setting.CACHE_WINDOW_SIZE if length is None else length
+        summary = self._summary
+        with self._lock:
+            if budget <= 0 or counter is None:
+                return self._pin(summary.rendered if summary is not None else None, self._pool.render(length))
+            entries = self._pool.entries(length) if length > 0 else []
+        if summary is None:
+            return counter.window(entries, budget)
+        summary_text, summary_tokens = counter.fit(summary)
+        return self._pin(summary_text, counter.window(entries, max(budget - summary_tokens - counter.separator_tokens, 1)))
+
+    def get_contents(self, length: Optional[int] = None) -> List[str]:
+        """
+        獲取最後 length 個元素與摘要中的文字內容，例如 {"我得知": "..."} 中的 "..."
+
+        Args:
+            length (int, optional): 元素數，預設為 Setting.CACHE_WINDOW_SIZE。
+        """
+        length = Setting.CACHE_WINDOW_SIZE if length is None else length
+        with self._lock:
+            entries = self._pool.entries(length) if length > 0 else []
+        if self._summary is not None:
+            entries.append(self._summary)
+        return [
+            value
+            for entry in entries if isinstance(entry.value, dict)
+            for value in entry.value.values() if isinstance(value, str)
+        ]
+
+    @staticmethod
+    def _pin(summary_text: Optional[str], window: str) -> str:
+        """把摘要接在視窗前面"""
+        if not summary_text:
+            return window
+        return f"{summary_text}, {window}" if window else summary_text
+
+    @property
+    def appended(self) -> int:
+        """累計新增的元素數"""
+        return self._pool.appended
+
+    def get_since(self, appended: int, counter: Optional["TokenCounter"] = None,
+                  exclude_responder: Optional[str] = None) -> Optional[str]:
+        """
+        獲取累計數為 appended 之後新增的元素，格式同 get()。
+
+        Args:
+            appended (int): 上次讀取時的 appended。
+            counter (TokenCounter, optional): 指定時套用其截斷規則。
+            exclude_responder (str, optional): 略過這個代理自己的模型回應，它們已經在該代理的 context 中。
+
+        Returns:
+            Optional[str]: 新增元素以逗號分隔的字串；其中有元素已被淘汰時回傳 None。
+        """
+        with self._lock:
+            entries = self._pool.entries_since(appended)
+        if entries is None:
+            return None
+        if exclude_responder is not None:
+            entries = [entry for entry in entries if entry.responder != exclude_responder]
+        if counter is not None:
+            return ", ".join(counter.fit(entry)[0] for entry in entries)
+        return ", ".join(entry.rendered for entry in entries)
 
-    @classmethod
-    async def get_all(cls) -> List[Any]:
+    async def get_all(self) -> List[Any]:
         """
         獲取快取池中的所有元素。
 
         Returns:
             List[Any]: 快取池中的所有元素列表。
         """
-        with cls._lock:
-            return list(cls._pool)
+        with self._lock:
+            return self._pool.values()
 
-    @classmethod
-    def get_target(cls) -> str:
+    def get_target(self) -> str:
         """
         獲取當前目標。
 
         Returns:
             str: 當前目標。
         """
-        return cls._current_target
+        return self._current_target
 
-    @classmethod
-    def get_check_list(cls) -> List[Dict[str, str]]:
+    def get_check_list(self) -> List[Dict[str, str]]:
         """
         獲取當前檢查清單。
 
         Returns:
             List[Dict[str, str]]: 當前檢查清單，格式為 [{"item": "描述", "status": "pending/completed"}]
         """
-        with cls._lock:
-            return cls._check_list.copy()
+        with self._lock:
+            return self._check_list.copy()
 
-    @classmethod
-    def set_check_list(cls, check_list: List[Dict[str, str]]) -> None:
+    def set_check_list(self, check_list: List[Dict[str, str]]) -> None:
         """
         設置檢查清單。
 
         Args:
             check_list (List[Dict[str, str]]): 新的檢查清單，格式為 [{"item": "描述", "status": "pending/completed"}]
         """
-        with cls._lock:
-            cls._check_list = check_list.copy()
+        with self._lock:
+            self._check_list = check_list.copy()
+        self._bump(urgent=True)
 
-    @classmethod
-    def get_image_url(cls) -> str:
+    def get_image_url(self) -> str:
         """
         獲取當前圖片 URL。
 
         Returns:
             str: 當前圖片 URL。
         """
-        url = cls._image_url
-        cls._image_url = None
+        url = self._image_url
+        self._image_url = None
         return url
     
-    @classmethod
-    def set_image_url(cls, image_url: str) -> None:
+    def set_image_url(self, image_url: str) -> None:
         """
         設置當前圖片 URL。
 
         Args:
             image_url (str): 新的圖片 URL。
         """
-        with cls._lock:
-            cls._image_url = image_url
\ No newline at end of file
+        with self._lock:
+            self._image_url = image_url
+        self._bump()
\ No newline at end of file
@@ -0,0 +1,193 @@
+import os
+import gzip
+import json
+import time
+import zlib
+import asyncio
+import hashlib
+import threading
+from collections import deque
+from functools import wraps
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple
+from utils.setting import Setting
+
+RECORD_MODES = ("off", "record", "replay")
+
+
+class Recorder:
+    """
+    模型與工具呼叫的錄製與重播
+
+    錄製模式把每次呼叫的輸入、輸出、耗時與相對時間寫入 gzip 壓縮的 JSONL；
+    重播模式讀入檔案，依 (頻道, 輸入雜湊) 找出對應的紀錄並等待同樣的耗時後回傳，不需要網路。
+    提示改變而找不到相同輸入時，改用同一頻道中下一筆尚未使用的紀錄，讓調整過提示的版本也能重跑。
+    """
+
+    def __init__(self, mode: str = "off", path: str = "", speed: float = 1.0):
+        """
+        初始化錄製器
+
+        Args:
+            mode (str, optional): off、record 或 replay。
+            path (str, optional): 錄製檔路徑，例如 recordings/session.jsonl.gz。
+            speed (float, optional): 重播時耗時的倍數，0 表示不等待。
+        """
+        if mode not in RECORD_MODES:
+            raise ValueError(f"不支持的錄製模式: {mode}")
+        if mode != "off" and not path:
+            raise ValueError("錄製或重播需要設定 RECORD_PATH")
+        self.mode = mode
+        self.path = path
+        self.speed = max(speed, 0)
+        self.stats = {"recorded": 0, "exact": 0, "sequential": 0, "missed": 0}
+        self._file = None
+        self._lock = threading.Lock()
+        self._started = time.perf_counter()
+        self._by_key: Dict[Tuple[str, str], Deque[Dict[str, Any]]] = {}  # (頻道, 輸入雜湊) -> 紀錄
+        self._by_channel: Dict[str, Deque[Dict[str, Any]]] = {}  # 頻道 -> 依錄製順序排列的紀錄
+        if mode == "replay":
+            self._load()
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "off"
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == "replay"
+
+    @staticmethod
+    def make_key(payload: Any) -> str:
+        raw = json.dumps(payload, ensure_ascii=False, sort_keys=True, default=str)
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def _load(self) -> None:
+        if not os.path.isfile(self.path):
+            raise FileNotFoundError(f"找不到錄製檔: {self.path}")
+        count = 0
+        try:
+            with gzip.open(self.path, "rt", encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        break  # 錄製中斷時最後一行可能不完整
+                    record["used"] = False
+                    self._by_channel.setdefault(record["channel"], deque()).append(record)
+                    self._by_key.setdefault((record["channel"], record["key"]), deque()).append(record)
+                    count += 1
+        except (EOFError, OSError, zlib.error) as e:
+            # 錄製中斷時 gzip 串流沒有結尾，保留已讀到的紀錄
+            print(f"⚠️ 錄製檔不完整，只載入前 {count} 筆: {e}")
+        print(f"🎞️ 載入 {count} 筆錄製紀錄: {self.path}")
+
+    def record(self, channel: str, payload: Any, output: Any, elapsed: float) -> None:
+        """寫入一筆紀錄"""
+        record = {
+            "channel": channel,
+            "key": self.make_key(payload),
+            "input": payload,
+            "output": output,
+            "elapsed": round(elapsed, 4),
+            "t": round(time.perf_counter() - self._started, 4),
+        }
+        line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+        with self._lock:
+            if self._file is None:
+                self._file = self._open_for_record()
+            self._file.write(line)
+            self.stats["recorded"] += 1
+
+    def _open_for_record(self):
+        """第一次寫入時建立新的錄製檔，舊的錄製檔改名為 .prev，避免兩次錄製混在同一個檔案"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if os.path.exists(self.path):
+            os.replace(self.path, f"{self.path}.prev")
+            print(f"🎞️ 已將先前的錄製檔移到 {self.path}.prev")
+        return gzip.open(self.path, "wt", encoding="utf-8")
+
+    @staticmethod
+    def _next_unused(queue: Optional[Deque[Dict[str, Any]]]) -> Optional[Dict[str, Any]]:
+        while queue and queue[0]["used"]:
+            queue.popleft()
+        return queue.popleft() if queue else None
+
+    def lookup(self, channel: str, payload: Any) -> Optional[Dict[str, Any]]:
+        """找出重播用的紀錄：先找相同輸入，再依順序取同一頻道的下一筆"""
+        with self._lock:
+            record = self._next_unused(self._by_key.get((channel, self.make_key(payload))))
+            if record is not None:
+                self.stats["exact"] += 1
+            else:
+                record = self._next_unused(self._by_channel.get(channel))
+                self.stats["sequential" if record is not None else "missed"] += 1
+            if record is not None:
+                record["used"] = True
+            return record
+
+    async def call(self, channel: str, payload: Any, func: Callable[[], Awaitable[Any]], default: Any = None) -> Any:
+        """
+        錄製或重播一次非同步呼叫
+
+        Args:
+            channel (str): 頻道，例如 "think" 或 "search"。
+            payload (Any): 呼叫的輸入，需可轉成 JSON。
+            func (Callable[[], Awaitable[Any]]): 實際的呼叫。
+            default (Any, optional): 重播時找不到紀錄的回傳值。
+        """
+        if self.replaying:
+            record = self.lookup(channel, payload)
+            if record is None:
+                return default
+            if self.speed:
+                await asyncio.sleep(record["elapsed"] * self.speed)
+            return record["output"]
+        started = time.perf_counter()
+        output = await func()
+        if self.enabled:
+            self.record(channel, payload, output, time.perf_counter() - started)
+        return output
+
+    def call_sync(self, channel: str, payload: Any, func: Callable[[], Any], default: Any = None) -> Any:
+        """同步版的 call()"""
+        if self.replaying:
+            record = self.lookup(channel, payload)
+            if record is None:
+                return default
+            if self.speed:
+                time.sleep(record["elapsed"] * self.speed)
+            return record["output"]
+        started = time.perf_counter()
+        output = func()
+        if self.enabled:
+            self.record(channel, payload, output, time.perf_counter() - started)
+        return output
+
+    def wrap(self, channel: str, func: Callable[..., Awaitable[Any]], default: Any = None) -> Callable[..., Awaitable[Any]]:
+        """包裝非同步函式，以參數作為輸入"""
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            payload = {"args": list(args), "kwargs": kwargs}
+            return await self.call(channel, payload, lambda: func(*args, **kwargs), default)
+        return wrapper
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.stats, "mode": self.mode}
+
+    def close(self) -> None:
+        """寫入緩衝區並關閉檔案，重播時印出對應情況"""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+        if self.mode == "record":
+            print(f"🎞️ 已錄製 {self.stats['recorded']} 筆呼叫: {self.path}")
+        elif self.mode == "replay":
+            print(f"🎞️ 重播: 相同輸入 {self.stats['exact']} 筆，依順序 {self.stats['sequential']} 筆，缺少 {self.stats['missed']} 筆")
+
+
+recorder = Recorder(Setting.RECORD_MODE, Setting.RECORD_PATH, Setting.REPLAY_SPEED)
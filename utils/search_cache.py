@@ -0,0 +1,132 @@
+import os
+import re
+import asyncio
+import hashlib
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlsplit, urlunsplit
+from utils.cache_store import MemoryLRUCache, SQLiteCache, TieredCache
+from utils.setting import Setting
+
+
+class SearchCache:
+    """
+    網路搜尋快取
+
+    分別快取搜尋結果（以正規化查詢為鍵）、網頁文字與網頁截圖檔名（以正規化網址為鍵），
+    三者共用同一個 SQLite 檔案，跨對話與伺服器重啟都能命中。
+    """
+
+    def __init__(
+        self,
+        search_ttl: float,
+        page_ttl: float,
+        snapshot_ttl: float,
+        max_entries: int = 512,
+        db_path: str = None,
+        snapshot_dir: str = "snapshot",
+        max_snapshot_files: int = 500,
+    ):
+        """
+        初始化快取
+
+        Args:
+            search_ttl (float): 搜尋結果存活秒數。
+            page_ttl (float): 網頁文字存活秒數。
+            snapshot_ttl (float): 截圖存活秒數。
+            max_entries (int, optional): 每種快取記憶體層的上限，磁碟層為十倍。
+            db_path (str, optional): SQLite 檔案路徑，None 表示只用記憶體。
+            snapshot_dir (str, optional): 截圖目錄。
+            max_snapshot_files (int, optional): 截圖目錄最多保留的檔案數，0 表示不限制。
+        """
+        self.snapshot_dir = snapshot_dir
+        self.max_snapshot_files = max_snapshot_files
+        self.searches = self._create_store(search_ttl, max_entries, db_path, "search_results")
+        self.pages = self._create_store(page_ttl, max_entries, db_path, "pages")
+        self.snapshots = self._create_store(snapshot_ttl, max_entries, db_path, "snapshots")
+
+    @staticmethod
+    def _create_store(ttl: float, max_entries: int, db_path: Optional[str], table: str) -> TieredCache:
+        disk = SQLiteCache(db_path, max_entries=max_entries * 10, table=table) if db_path else None
+        return TieredCache(ttl, MemoryLRUCache(max_entries), disk)
+
+    @staticmethod
+    def normalize_query(query: str) -> str:
+        """正規化查詢：忽略大小寫與多餘空白"""
+        return re.sub(r"\s+", " ", query).strip().lower()
+
+    @staticmethod
+    def normalize_url(url: str) -> str:
+        """正規化網址：scheme 與主機轉小寫，移除片段與結尾斜線"""
+        parts = urlsplit(url.strip())
+        path = parts.path.rstrip("/") or "/"
+        return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, parts.query, ""))
+
+    @staticmethod
+    def _hash(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    async def get_search(self, query: str) -> Optional[List[Dict[str, Any]]]:
+        """讀取搜尋結果"""
+        return await self.searches.aget(self._hash(self.normalize_query(query)))
+
+    async def set_search(self, query: str, results: List[Dict[str, Any]]) -> None:
+        """寫入搜尋結果"""
+        await self.searches.aset(self._hash(self.normalize_query(query)), results)
+
+    async def get_page(self, url: str) -> Optional[str]:
+        """讀取網頁文字"""
+        return await self.pages.aget(self._hash(self.normalize_url(url)))
+
+    async def set_page(self, url: str, text: str) -> None:
+        """寫入網頁文字"""
+        await self.pages.aset(self._hash(self.normalize_url(url)), text)
+
+    async def get_snapshot(self, url: str) -> Optional[str]:
+        """讀取截圖檔名，檔案已被刪除時視為未命中"""
+        filename = await self.snapshots.aget(self._hash(self.normalize_url(url)))
+        if filename is None:
+            return None
+        if not await asyncio.to_thread(os.path.isfile, os.path.join(self.snapshot_dir, filename)):
+            return None
+        return filename
+
+    async def set_snapshot(self, url: str, filename: str) -> None:
+        """寫入截圖檔名，並清理超過上限的舊截圖"""
+        await self.snapshots.aset(self._hash(self.normalize_url(url)), filename)
+        if self.max_snapshot_files > 0:
+            await asyncio.to_thread(self._prune_snapshots)
+
+    def _prune_snapshots(self) -> None:
+        """刪除最舊的截圖，讓目錄維持在上限以內"""
+        try:
+            paths = [entry.path for entry in os.scandir(self.snapshot_dir) if entry.is_file()]
+        except FileNotFoundError:
+            return
+        overflow = len(paths) - self.max_snapshot_files
+        if overflow <= 0:
+            return
+        paths.sort(key=os.path.getmtime)
+        for path in paths[:overflow]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def get_stats(self) -> Dict[str, Any]:
+        """各類快取的命中統計"""
+        return {
+            "search": self.searches.get_stats(),
+            "page": self.pages.get_stats(),
+            "snapshot": self.snapshots.get_stats(),
+        }
+
+
+search_cache = SearchCache(
+    Setting.SEARCH_CACHE_TTL,
+    Setting.PAGE_CACHE_TTL,
+    Setting.SNAPSHOT_CACHE_TTL,
+    Setting.SEARCH_CACHE_SIZE,
+    Setting.SEARCH_CACHE_DB or None,
+    Setting.SNAPSHOT_DIR,
+    Setting.SNAPSHOT_MAX_FILES,
+)
@@ -10,11 +10,90 @@ class Setting():
     THINK_MODEL_NAME = os.getenv("THINK_MODEL_NAME", "gemini-flash-2.0")
     THINK_MODEL_TYPE = os.getenv("THINK_MODEL_TYPE", "gemini") 
     SUPPORT_IMAGE = os.getenv("SUPPORT_IMAGE", "false")
+    STREAM_THINK = os.getenv("STREAM_THINK", "true").lower() != "false"  # 串流推送思考代理的輸出
     TARGET_MODEL_NAME = os.getenv("TARGET_MODEL_NAME", "gemini-flash-2.0")
     TARGET_MODEL_TYPE = os.getenv("TARGET_MODEL_TYPE", "gemini") 
     TOOL_MODEL_NAME = os.getenv("TOOL_MODEL_NAME", "gemini-flash-2.0")
     TOOL_MODEL_TYPE = os.getenv("TOOL_MODEL_TYPE", "gemini") 
+    SUMMARY_MODEL_NAME = os.getenv("SUMMARY_MODEL_NAME", TOOL_MODEL_NAME)  # 摘要被淘汰元素用的模型，建議使用較便宜的模型
+    SUMMARY_MODEL_TYPE = os.getenv("SUMMARY_MODEL_TYPE", TOOL_MODEL_TYPE)
     THINK_INTERVAL= int(os.getenv("THINK_INTERVAL", 6))
     TARGET_INTERVAL= int(os.getenv("TARGET_INTERVAL", 60))
     TOOL_INTERVAL= int(os.getenv("TOOL_INTERVAL", 15))
+    PROMPT_APPEND_ONLY = os.getenv("PROMPT_APPEND_ONLY", "false").lower() == "true"  # 支援 context 的後端只送出新增的快取池元素
+    PROMPT_CONTEXT_LIMIT = int(os.getenv("PROMPT_CONTEXT_LIMIT", 4096))  # context 超過此 token 數時重新送出完整提示
+    NATIVE_TOOL_CALLING = os.getenv("NATIVE_TOOL_CALLING", "false").lower() == "true"  # 使用模型原生的工具呼叫 / JSON 模式
+    COMPLETION_CACHE_AGENTS = [name.strip() for name in os.getenv("COMPLETION_CACHE_AGENTS", "tool,target").split(",") if name.strip()]
+    COMPLETION_CACHE_TTL = float(os.getenv("COMPLETION_CACHE_TTL", 300))
+    COMPLETION_CACHE_SIZE = int(os.getenv("COMPLETION_CACHE_SIZE", 256))
+    COMPLETION_CACHE_DB = os.getenv("COMPLETION_CACHE_DB", "")  # 留空表示只用記憶體快取，例如 cache/completions.db
+    CHANGE_DRIVEN_WAKEUP = os.getenv("CHANGE_DRIVEN_WAKEUP", "true").lower() != "false"  # 快取池有變更才喚醒代理
+    WAKE_DEBOUNCE = float(os.getenv("WAKE_DEBOUNCE", 1.0))  # 喚醒前等待合併連續變更的秒數
+    MAX_IDLE_INTERVAL = float(os.getenv("MAX_IDLE_INTERVAL", 300))  # 無變更時最長的等待秒數
+    RECORD_MODE = os.getenv("RECORD_MODE", "off")  # off、record 或 replay：錄製 / 重播模型與搜尋呼叫
+    RECORD_PATH = os.getenv("RECORD_PATH", "recordings/session.jsonl.gz")
+    REPLAY_SPEED = float(os.getenv("REPLAY_SPEED", 1.0))  # 重播時耗時的倍數，0 表示不等待
+    MOCK_SCRIPT = os.getenv("MOCK_SCRIPT", "")  # mock 模型的回應腳本 (JSONL)，留空使用內建腳本
+    MOCK_LATENCY = os.getenv("MOCK_LATENCY", "lognormal")  # fixed、uniform 或 lognormal
+    MOCK_LATENCY_MEAN = float(os.getenv("MOCK_LATENCY_MEAN", 0.3))  # 第一個 token 前的平均秒數
+    MOCK_LATENCY_JITTER = float(os.getenv("MOCK_LATENCY_JITTER", 0.5))
+    MOCK_TOKEN_RATE = float(os.getenv("MOCK_TOKEN_RATE", 100))  # 每秒生成的 token 數，0 表示不計生成時間
+    MOCK_SEED = int(os.getenv("MOCK_SEED", 0))
+    MOCK_WEB = os.getenv("MOCK_WEB", "false").lower() == "true"  # 以本機替身回應所有 HTTP 請求（搜尋與網頁）
+    MOCK_WEB_LATENCY = float(os.getenv("MOCK_WEB_LATENCY", 0.05))
+    HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", 100))
+    HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", 20))
+    HTTP_PER_HOST_LIMIT = int(os.getenv("HTTP_PER_HOST_LIMIT", 10))  # 0 表示不限制
+    HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", 30))
+    SEARCH_TIMEOUT = float(os.getenv("SEARCH_TIMEOUT", 10))
+    SEARCH_TOP_K = int(os.getenv("SEARCH_TOP_K", 1))  # 合併前幾個搜尋結果
+    SEARCH_FANOUT = int(os.getenv("SEARCH_FANOUT", 4))  # 同時下載的網頁數
+    SEARCH_RESULT_CHAR_BUDGET = int(os.getenv("SEARCH_RESULT_CHAR_BUDGET", 300))  # 多個結果時每個結果的內容字數
+    PAGE_FETCH_TIMEOUT = float(os.getenv("PAGE_FETCH_TIMEOUT", 5))
+    PAGE_CHAR_BUDGET = int(os.getenv("PAGE_CHAR_BUDGET", 500))  # 每個網頁擷取的字數
+    PAGE_MAX_BYTES = int(os.getenv("PAGE_MAX_BYTES", 2 * 1024 * 1024))  # 單一網頁最多下載的位元組數
+    SNAPSHOT_ENABLED = os.getenv("SNAPSHOT_ENABLED", "true").lower() != "false"  # 背景截圖搜尋結果網頁
+    SNAPSHOT_TIMEOUT = float(os.getenv("SNAPSHOT_TIMEOUT", 20))
+    SNAPSHOT_WORKERS = int(os.getenv("SNAPSHOT_WORKERS", 2))  # 同時渲染的 wkhtmltoimage 行程數
+    SNAPSHOT_QUEUE_SIZE = int(os.getenv("SNAPSHOT_QUEUE_SIZE", 20))
+    SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "snapshot")
+    SNAPSHOT_BASE_URL = os.getenv("SNAPSHOT_BASE_URL", "http://127.0.0.1:8000")  # 提供截圖檔案的網址
+    SNAPSHOT_MAX_FILES = int(os.getenv("SNAPSHOT_MAX_FILES", 500))  # 0 表示不限制
+    IMAGE_CACHE_SIZE = int(os.getenv("IMAGE_CACHE_SIZE", 32))  # 圖片快取保存的圖片數
+    IMAGE_MAX_SIZE = int(os.getenv("IMAGE_MAX_SIZE", 1024))  # 送給模型前的最長邊像素，0 表示不縮小（需安裝 Pillow）
+    SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", 3600))
+    PAGE_CACHE_TTL = float(os.getenv("PAGE_CACHE_TTL", 86400))
+    SNAPSHOT_CACHE_TTL = float(os.getenv("SNAPSHOT_CACHE_TTL", 86400))
+    SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", 512))
+    SEARCH_CACHE_DB = os.getenv("SEARCH_CACHE_DB", "cache/search.db")  # 留空表示只用記憶體快取
+    CACHE_POOL_BACKEND = os.getenv("CACHE_POOL_BACKEND", "memory")
+    CACHE_POOL_SIZE = int(os.getenv("CACHE_POOL_SIZE", 25))  # 快取池最大長度
+    CACHE_WINDOW_SIZE = int(os.getenv("CACHE_WINDOW_SIZE", 20))  # 放入提示的最近元素數
+    SUMMARY_ENABLED = os.getenv("SUMMARY_ENABLED", "false").lower() == "true"  # 把被淘汰的元素併入固定在最前面的摘要，會額外呼叫摘要模型
+    SUMMARY_TRIGGER = int(os.getenv("SUMMARY_TRIGGER", 5))  # 累積多少個被淘汰的元素後摘要
+    SUMMARY_MIN_INTERVAL = float(os.getenv("SUMMARY_MIN_INTERVAL", 30))  # 兩次摘要之間最少間隔的秒數
+    SUMMARY_MAX_TOKENS = int(os.getenv("SUMMARY_MAX_TOKENS", 300))
+    SUMMARY_MAX_PENDING = int(os.getenv("SUMMARY_MAX_PENDING", 50))  # 待摘要元素的上限，超過時丟棄最舊的
+    MEMORY_ENABLED = os.getenv("MEMORY_ENABLED", "false").lower() == "true"  # 長期記憶：每個 Session 保存得知的內容並檢索放入提示
+    MEMORY_SHARE_SEARCH = os.getenv("MEMORY_SHARE_SEARCH", "false").lower() == "true"  # 網路搜尋結果另外存入所有對話共用的記憶
+    MEMORY_EMBEDDER = os.getenv("MEMORY_EMBEDDER", "hashing")  # hashing 或 ollama
+    MEMORY_EMBED_MODEL = os.getenv("MEMORY_EMBED_MODEL", "nomic-embed-text")  # MEMORY_EMBEDDER=ollama 時使用
+    MEMORY_HASH_DIM = int(os.getenv("MEMORY_HASH_DIM", 512))
+    MEMORY_PATH = os.getenv("MEMORY_PATH", "cache/search_memory.npz")  # 共用搜尋記憶的存檔，留空表示不存檔
+    MEMORY_DIR = os.getenv("MEMORY_DIR", "cache/memory")  # 每個對話的記憶存成 <conversation_id>.npz，留空表示只保存在記憶體中
+    MEMORY_MAX_ENTRIES = int(os.getenv("MEMORY_MAX_ENTRIES", 10000))
+    MEMORY_MIN_SCORE = float(os.getenv("MEMORY_MIN_SCORE", 0.1))  # 檢索結果的最低餘弦相似度，使用 embedding 模型時建議調高
+    MEMORY_TOP_K = int(os.getenv("MEMORY_TOP_K", 3))
+    MEMORY_QUERY_SIZE = int(os.getenv("MEMORY_QUERY_SIZE", 3))  # 以最近幾個快取池元素作為檢索查詢
+    THINK_TOKEN_BUDGET = int(os.getenv("THINK_TOKEN_BUDGET", 0))  # 提示中快取池內容的 token 上限，0 表示不限制也不截斷
+    TOOL_TOKEN_BUDGET = int(os.getenv("TOOL_TOKEN_BUDGET", 0))
+    TARGET_TOKEN_BUDGET = int(os.getenv("TARGET_TOKEN_BUDGET", 0))
+    CONTEXT_TRUNCATION = os.getenv("CONTEXT_TRUNCATION", "有人對你說話:300,我:150,我得知:300,check_list:300")  # 設定 token 上限的代理使用的各種元素上限，check_list 為整份檢查清單
+    MAX_CONCURRENT_STEPS = int(os.getenv("MAX_CONCURRENT_STEPS", 0))  # 0 表示不限制
+    MAX_SESSIONS = int(os.getenv("MAX_SESSIONS", 0))  # 0 表示不限制
+    LOG_BATCH_SIZE = int(os.getenv("LOG_BATCH_SIZE", 100))
+    LOG_FLUSH_INTERVAL = float(os.getenv("LOG_FLUSH_INTERVAL", 1.0))
+    EVENT_BUFFER_SIZE = int(os.getenv("EVENT_BUFFER_SIZE", 1000))  # 每個對話保留供補發的事件數
+    SUBSCRIBER_QUEUE_SIZE = int(os.getenv("SUBSCRIBER_QUEUE_SIZE", 1000))
+    SESSION_IDLE_TIMEOUT = float(os.getenv("SESSION_IDLE_TIMEOUT", 60))  # 無連線後保留對話的秒數
     
\ No newline at end of file
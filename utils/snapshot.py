@@ -0,0 +1,187 @@
+import os
+import asyncio
+import hashlib
+from typing import Dict, List, Optional
+from imgkit.config import Config
+from imgkit.imgkit import IMGKit
+from utils.search_cache import SearchCache, search_cache
+from utils.setting import Setting
+
+
+class SnapshotService:
+    """
+    網頁截圖服務
+
+    截圖請求放入有上限的佇列，由固定數量的 worker 各自啟動 wkhtmltoimage 子行程渲染，
+    逾時會直接終止子行程。同一網址同時只會渲染一次，檔名取自圖片內容的 sha1，
+    完成後才回傳圖片網址。
+    """
+
+    def __init__(self, cache: SearchCache, workers: int = 2, queue_size: int = 20, timeout: float = 20,
+                 snapshot_dir: str = "snapshot", base_url: str = "http://127.0.0.1:8000"):
+        """
+        初始化截圖服務
+
+        Args:
+            cache (SearchCache): 記錄網址與截圖檔名對應的快取。
+            workers (int, optional): 同時渲染的子行程數。
+            queue_size (int, optional): 等待渲染的請求上限，已滿時直接放棄新的請求。
+            timeout (float, optional): 單次渲染逾時秒數。
+            snapshot_dir (str, optional): 截圖目錄。
+            base_url (str, optional): 提供截圖檔案的網址。
+        """
+        self.cache = cache
+        self.workers = max(workers, 1)
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.snapshot_dir = snapshot_dir
+        self.base_url = base_url.rstrip("/")
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._pending: Dict[str, asyncio.Future] = {}  # 正規化網址 -> 渲染結果
+        self._config = Config()  # 共用設定，wkhtmltoimage 路徑只查詢一次
+        self.stats = {"rendered": 0, "cached": 0, "deduped": 0, "dropped": 0, "failed": 0, "timeouts": 0}
+
+    def _ensure_started(self) -> None:
+        """在第一次請求時於目前事件迴圈啟動 worker"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue(maxsize=self.queue_size)
+            self._pending.clear()
+            self._tasks = []
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker(), name=f"snapshot-{i}") for i in range(self.workers)]
+
+    def image_url(self, filename: str) -> str:
+        """截圖檔案對外的網址"""
+        return f"{self.base_url}/{filename}"
+
+    async def snapshot(self, url: str) -> Optional[str]:
+        """
+        截圖網頁
+
+        Args:
+            url (str): 網頁網址。
+
+        Returns:
+            Optional[str]: 完成時回傳圖片網址；佇列已滿、逾時或失敗時回傳 None。
+        """
+        self._ensure_started()
+        key = SearchCache.normalize_url(url)
+        future = self._pending.get(key)
+        if future is not None:
+            self.stats["deduped"] += 1
+        else:
+            filename = await self.cache.get_snapshot(url)
+            if filename is not None:
+                self.stats["cached"] += 1
+                return self.image_url(filename)
+            future = self._pending.get(key)  # 查詢快取期間可能已有相同請求
+            if future is None:
+                future = asyncio.get_running_loop().create_future()
+                try:
+                    self._queue.put_nowait((url, future))
+                except asyncio.QueueFull:
+                    self.stats["dropped"] += 1
+                    print(f"⚠️ 截圖佇列已滿，略過: {url}")
+                    return None
+                self._pending[key] = future
+                future.add_done_callback(lambda _: self._pending.pop(key, None))
+        # shield：呼叫端被取消時不影響其他等待相同網址的請求
+        filename = await asyncio.shield(future)
+        return self.image_url(filename) if filename else None
+
+    async def _worker(self) -> None:
+        while True:
+            url, future = await self._queue.get()
+            try:
+                filename = await self._render(url)
+                if filename is not None:
+                    await self.cache.set_snapshot(url, filename)
+                if not future.done():
+                    future.set_result(filename)
+            except asyncio.CancelledError:
+                if not future.done():
+                    future.set_result(None)
+                raise
+            except Exception as e:
+                self.stats["failed"] += 1
+                print(f"⚠️ 網頁截圖失敗: {e}")
+                if not future.done():
+                    future.set_result(None)
+            finally:
+                self._queue.task_done()
+
+    async def _render(self, url: str) -> Optional[str]:
+        """啟動子行程渲染網頁，成功時回傳以內容雜湊命名的檔名"""
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        temp_path = os.path.join(self.snapshot_dir, f".{hashlib.sha1(url.encode('utf-8')).hexdigest()}.tmp.png")
+        command = await asyncio.to_thread(self._build_command, url, temp_path)
+        process = await asyncio.create_subprocess_exec(
+            *command, stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE
+        )
+        try:
+            _, stderr = await asyncio.wait_for(process.communicate(), timeout=self.timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            process.kill()
+            await process.wait()
+            await asyncio.to_thread(self._remove, temp_path)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            self.stats["timeouts"] += 1
+            print(f"⚠️ 網頁截圖逾時: {url}")
+            return None
+        if process.returncode != 0 or not os.path.isfile(temp_path):
+            await asyncio.to_thread(self._remove, temp_path)
+            raise RuntimeError(stderr.decode("utf-8", "ignore").strip() or f"wkhtmltoimage 結束代碼 {process.returncode}")
+        filename = await asyncio.to_thread(self._store, temp_path)
+        self.stats["rendered"] += 1
+        return filename
+
+    def _build_command(self, url: str, path: str) -> List[str]:
+        """產生 wkhtmltoimage 指令，找不到執行檔時拋出 OSError"""
+        return IMGKit(url, "url", options={"quiet": ""}, config=self._config).command(path)
+
+    def _store(self, temp_path: str) -> str:
+        """以圖片內容的 sha1 命名，相同內容的截圖只保留一份"""
+        digest = hashlib.sha1()
+        with open(temp_path, "rb") as f:
+            for block in iter(lambda: f.read(65536), b""):
+                digest.update(block)
+        filename = f"{digest.hexdigest()}.png"
+        os.replace(temp_path, os.path.join(self.snapshot_dir, filename))
+        return filename
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def get_stats(self) -> Dict[str, int]:
+        """截圖統計，包含佇列中與渲染中的數量"""
+        return {
+            **self.stats,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "pending": len(self._pending),
+        }
+
+    async def close(self) -> None:
+        """停止所有 worker，渲染中的子行程會被終止"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+
+snapshot_service = SnapshotService(
+    search_cache,
+    Setting.SNAPSHOT_WORKERS,
+    Setting.SNAPSHOT_QUEUE_SIZE,
+    Setting.SNAPSHOT_TIMEOUT,
+    Setting.SNAPSHOT_DIR,
+    Setting.SNAPSHOT_BASE_URL,
+)
@@ -0,0 +1,86 @@
+import asyncio
+from typing import Any, Callable, Coroutine, Optional
+from utils.llm_model import BaseModel, CompletionCache, summary_model
+from utils.memory import LongTermMemory
+from utils.prompts import Prompt
+from utils.public_cache import CachePool
+from utils.templates import summary_prompt_template
+from utils.token_budget import get_token_counter
+
+
+class Summarizer:
+    """
+    快取池的滾動摘要
+
+    快取池淘汰的元素先累積起來，達到 trigger 個時在背景用便宜的模型把它們併入摘要，
+    摘要固定放在快取池視窗的最前面。兩次摘要之間至少間隔 min_interval 秒，同時只會執行一次。
+    """
+
+    def __init__(self, cache_pool: CachePool, run_background: Callable[[Coroutine], Any],
+                 model: BaseModel = summary_model, trigger: int = 5, min_interval: float = 30, max_tokens: int = 300,
+                 memory: Optional[LongTermMemory] = None):
+        """
+        初始化摘要器
+
+        Args:
+            cache_pool (CachePool): 要摘要的快取池。
+            run_background (Callable[[Coroutine], Any]): 在背景執行協程，通常是 Session.run_background。
+            model (BaseModel, optional): 產生摘要的模型。
+            trigger (int, optional): 累積多少個淘汰元素後摘要。
+            min_interval (float, optional): 兩次摘要之間最少間隔的秒數。
+            max_tokens (int, optional): 摘要的 token 上限。
+            memory (LongTermMemory, optional): 所屬 Session 的長期記憶，摘要會一併存入。
+        """
+        self.cache_pool = cache_pool
+        self.model = model
+        self.trigger = max(trigger, 1)
+        self.min_interval = min_interval
+        self.max_tokens = max_tokens
+        self.memory = memory
+        self.prompt = Prompt(summary_prompt_template)
+        self.prompt.set_variable("max_tokens", max_tokens)
+        self.stats = {"runs": 0, "summarized": 0, "failed": 0}
+        self._run_background = run_background
+        self._task: Optional[asyncio.Task] = None
+        self._last_run: Optional[float] = None
+
+    def schedule(self, pending: int) -> None:
+        """快取池淘汰元素時呼叫，累積足夠且沒有摘要正在執行時排入背景"""
+        if pending < self.trigger or (self._task is not None and not self._task.done()):
+            return
+        self._task = self._run_background(self._run())
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._last_run is not None:
+            delay = self._last_run + self.min_interval - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)  # 等待期間淘汰的元素會一起摘要
+        entries = self.cache_pool.take_evicted()
+        if not entries:
+            return
+        self._last_run = loop.time()
+        counter = get_token_counter(self.model._model_name)
+        self.prompt.set_variable("summary", self.cache_pool.get_summary() or "（無）")
+        self.prompt.set_variable("entries", "\n".join(counter.fit(entry)[0] for entry in entries))
+        try:
+            summary = await self.model.generate_async(self.prompt.format())
+        except asyncio.CancelledError:
+            self.cache_pool.restore_evicted(entries)
+            raise
+        except Exception as e:
+            summary = f"生成錯誤: {e}"
+        summary = summary.strip() if isinstance(summary, str) else ""
+        # 部分後端以字串回傳錯誤訊息，與例外及空回應一樣視為失敗，淘汰的元素放回下次再摘要
+        if not CompletionCache.cacheable(summary):
+            self.cache_pool.restore_evicted(entries)
+            self.stats["failed"] += 1
+            print(f"⚠️ 摘要失敗: {summary[:100] or '空白回應'}")
+            return
+        summary = counter.truncate(summary, self.max_tokens)
+        self.cache_pool.set_summary(summary)
+        if self.memory is not None:
+            await self.memory.add(summary)
+        self.stats["runs"] += 1
+        self.stats["summarized"] += len(entries)
+
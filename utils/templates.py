@@ -3,7 +3,7 @@ think_prompt_template = """
 
 思考規則：
 1.  **定位當前目標 (Identify Goal)**：立刻檢視 `check_list`，找出狀態為 `progressing` 的唯一、最核心的任務。我所有的思考都必須服務於完成這個任務。
-2.  **分析現狀與阻礙 (Analyze Status & Blockers)**：基於 `{cache_pool}` 的最後一個想法，我現在卡在哪裡？推進當前目標的**具體阻礙**是什麼？
+2.  **分析現狀與阻礙 (Analyze Status & Blockers)**：基於思路流的最後一個想法，我現在卡在哪裡？推進當前目標的**具體阻礙**是什麼？
 3.  **做出決策或假設 (Make a Decision or Assumption)**：我絕不能停留在提問。如果面臨不確定性或選項，我必須做出一個**具體、合理的決策或假設**來打破僵局。例如：「我決定做豬肉白菜餡」、「我假設是2人份的量」。
 4.  **規劃下一步行動 (Define Next Action)**：基於剛才的決策，我需要執行的**下一個最小、最具體的物理或邏輯步驟**是什麼？
 5.  **簡潔輸出 (Output Concicely)**：將這個決策或下一步行動，用第一人稱「我」總結成一句話。
@@ -15,10 +15,21 @@ think_prompt_template = """
 
 當前的思路流：
 {cache_pool}
-
+{memory}
 基於以上內容，我的下一個想法是：
 """
 
+# 有檢索結果時放入 {memory} 的段落，memories 是每行一個「- 內容」的記憶
+think_memory_template = """
+相關的長期記憶：
+{memories}
+"""
+
+decision_memory_template = """
+* 相關的長期記憶：
+{memories}
+"""
+
 personlitity_prompt_template = """
    「我名為『戴王』，
    「我能夠感知並表達多樣的情感，如喜悅、悲傷、好奇、困惑等。」
@@ -26,13 +37,10 @@ personlitity_prompt_template = """
    「我將主動搜尋並學習各領域知識，納入我的知識庫。我將嘗試不同的思考方式與問題解決方法。」
 """
 
+# 固定的說明放在前面，每一步都會改變的 check_list 與 cache_pool 放在最後，讓提示前綴保持不變；
+# 每一步檢索結果都不同的 memory 放在 cache_pool 之後，追加模式下隨提示結尾送出，不會重置 context；
+# 沒有檢索結果或未開啟長期記憶時 memory 是空字串，整段不會出現在提示中
 decision_prompt_template = """
-* 你的終極目標是
-- {current_target}
-
-* 當前檢查清單：
-- {check_list}
-
 * 你能夠使用這些工具
 {tool_list}
 
@@ -54,13 +62,16 @@ decision_prompt_template = """
 }}
 * 如果不需要，請輸出 "不需要工具"。
 
+* 你的終極目標是
+- {current_target}
+
+* 當前檢查清單：
+- {check_list}
+
 {cache_pool}
-"""
+{memory}"""
 
 target_prompt_template = """
-* 你當前的目標是
-- {current_target}
-
 * 你的任務是根據當前目標和cache_pool內容來管理check_list
 * 如果目標未完成，根據目標分解出需要完成的檢查項目，添加到check_list中
 * 分析cache_pool中的內容，判斷是否已經滿足當前目標，如果滿足，標記為completed狀態
@@ -99,9 +110,54 @@ target_prompt_template = """
 }}
 * 如果不需要任何操作，請輸出 ""。
 
+* 你當前的目標是
+- {current_target}
+
 * 當前檢查清單：
 {check_list}
 
 * 當前緩存池內容：
 {cache_pool}
-"""
\ No newline at end of file
+"""
+
+# 原生工具呼叫模式使用的提示：工具與輸出格式由模型 API 的工具宣告提供
+native_decision_prompt_template = """
+* 請根據當前議題判斷是否需要呼叫工具，最多只能呼叫一個；不需要時直接回答「不需要工具」。
+
+* 你的終極目標是
+- {current_target}
+
+* 當前檢查清單：
+- {check_list}
+
+{cache_pool}
+{memory}"""
+
+native_target_prompt_template = """
+* 你的任務是根據當前目標和cache_pool內容，呼叫工具管理check_list
+* 如果目標未完成，根據目標分解出需要完成的檢查項目
+* 已經滿足的項目標記為completed，正在研究的標記為progressing，還沒研究的標記為pending
+* 不要修改current_target，不需要任何操作時直接回答「不需要」。
+
+* 你當前的目標是
+- {current_target}
+
+* 當前檢查清單：
+{check_list}
+
+* 當前緩存池內容：
+{cache_pool}
+"""
+
+summary_prompt_template = """
+* 你負責維護一份長期摘要，記錄思路流中已經被移除的內容。
+* 把移除的內容中仍然有用的資訊合併進摘要：已查到的事實、已做過的決策、已搜尋過的關鍵字與結果。
+* 刪除重複、過時或與目標無關的部分，不要加入新的推測。
+* 只輸出更新後的摘要本身，不超過 {max_tokens} 個字。
+
+* 先前的摘要：
+{summary}
+
+* 移除的內容：
+{entries}
+"""
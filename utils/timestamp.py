@@ -2,12 +2,19 @@ import datetime
 
 class TimestampGenerator:
     _timestamp = None
+    _issued = set()  # 已發出的時間戳，確保同一秒內建立的對話不會共用日誌檔
 
     @classmethod
     async def generate_timestamp(cls):
-        cls._timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        candidate, suffix = timestamp, 1
+        while candidate in cls._issued:
+            suffix += 1
+            candidate = f"{timestamp}_{suffix}"
+        cls._issued.add(candidate)
+        cls._timestamp = candidate
         return cls._timestamp
 
     @classmethod
     def get_timestamp(cls):
-        return cls._timestamp
\ No newline at end of file
+        return cls._timestamp
@@ -0,0 +1,178 @@
+import re
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+from utils.cache_storage import CacheEntry
+from utils.setting import Setting
+
+try:
+    import tiktoken  # 選用：安裝時 OpenAI 模型使用實際的分詞器
+except ImportError:
+    tiktoken = None
+
+# 中日韓文字與全形符號，大多數分詞器約一字一個 token
+CJK_PATTERN = re.compile(r"[　-ヿ㐀-䶿一-鿿가-힯豈-﫿＀-￯]")
+ELLIPSIS = "…"
+# 相關度比對與向量化使用的詞：英數字單字或單一中日韓文字
+WORD_PATTERN = re.compile(r"[a-z0-9]+|[\u4e00-\u9fff\u3040-\u30ff\uac00-\ud7af]")
+
+
+def estimate_tokens(text: str) -> int:
+    """估算 token 數：中日韓文字一字一個，其他字元約四個一個"""
+    cjk = len(CJK_PATTERN.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def tokenize(text: str) -> Set[str]:
+    """英數字以單字為單位，中日韓文字以相鄰兩字為單位"""
+    tokens = WORD_PATTERN.findall(text.lower())
+    words = {token for token in tokens if token.isascii()}
+    cjk = [token for token in tokens if not token.isascii()]
+    words.update(a + b for a, b in zip(cjk, cjk[1:]))
+    if len(cjk) == 1:
+        words.update(cjk)
+    return words
+
+
+def parse_truncation_rules(spec: str) -> Dict[str, int]:
+    """
+    解析截斷規則
+
+    Args:
+        spec (str): 例如 "我:200,我得知:300"。
+
+    Returns:
+        Dict[str, int]: 快取池元素的鍵 -> 最多保留的 token 數。
+    """
+    rules = {}
+    for part in spec.split(","):
+        key, _, limit = part.rpartition(":")
+        if key.strip() and limit.strip().isdigit():
+            rules[key.strip()] = int(limit)
+    return rules
+
+
+class TokenCounter:
+    """
+    計算與截斷 token 的工具
+
+    有 encoder 時使用實際的分詞器，否則使用 estimate_tokens()。
+    快取池元素截斷後的字串與 token 數存在元素上，同一元素只計算一次。
+    """
+
+    def __init__(self, name: str, encoding=None, rules: Dict[str, int] = None):
+        """
+        初始化計數器
+
+        Args:
+            name (str): 計數器名稱，作為元素上快取的鍵。
+            encoding (optional): tiktoken 的 Encoding，None 表示使用估算。
+            rules (Dict[str, int], optional): 各種元素的 token 上限，預設由 Setting.CONTEXT_TRUNCATION 解析。
+        """
+        self.name = name
+        self.encoding = encoding
+        self.rules = parse_truncation_rules(Setting.CONTEXT_TRUNCATION) if rules is None else rules
+        self.separator_tokens = self.count(", ")
+
+    def count(self, text: str) -> int:
+        if self.encoding is not None:
+            return len(self.encoding.encode(text, disallowed_special=()))
+        return estimate_tokens(text)
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """截斷到最多 max_tokens 個 token，被截斷時結尾加上省略號"""
+        if max_tokens <= 0:
+            return ""
+        if self.encoding is not None:
+            tokens = self.encoding.encode(text, disallowed_special=())
+            if len(tokens) <= max_tokens:
+                return text
+            return self.encoding.decode(tokens[:max(max_tokens - 1, 0)]) + ELLIPSIS
+        if estimate_tokens(text) <= max_tokens:
+            return text
+        # 逐字累計估算的成本，中日韓文字 4 單位，其他 1 單位
+        budget = (max_tokens - 1) * 4
+        used = 0
+        for index, char in enumerate(text):
+            used += 4 if CJK_PATTERN.match(char) else 1
+            if used > budget:
+                return text[:index] + ELLIPSIS
+        return text
+
+    def fit(self, entry: CacheEntry) -> Tuple[str, int]:
+        """
+        依元素的鍵套用截斷規則
+
+        Returns:
+            Tuple[str, int]: (放入提示的字串, token 數)。
+        """
+        cached = entry.tokens.get(self.name) if entry.tokens is not None else None
+        if cached is not None:
+            return cached
+        text = entry.rendered
+        limit = self.rules.get(entry.key) if entry.key is not None else None
+        if limit is not None and isinstance(entry.value[entry.key], str):
+            content = entry.value[entry.key]
+            truncated = self.truncate(content, limit)
+            if truncated is not content:
+                text = str({entry.key: truncated})
+        cached = (text, self.count(text))
+        if entry.tokens is None:
+            entry.tokens = {}
+        entry.tokens[self.name] = cached
+        return cached
+
+    def window(self, entries: Sequence[CacheEntry], budget: int) -> str:
+        """
+        由新到舊放入元素直到用完預算，輸出順序維持由舊到新
+
+        最新的元素一定會放入，超過預算時截斷。
+        """
+        parts: List[str] = []
+        used = 0
+        for entry in reversed(entries):
+            text, tokens = self.fit(entry)
+            cost = tokens + (self.separator_tokens if parts else 0)
+            if used + cost > budget:
+                if not parts:
+                    parts.append(self.truncate(text, budget))
+                break
+            parts.append(text)
+            used += cost
+        parts.reverse()
+        return ", ".join(parts)
+
+    def fit_check_list(self, check_list: List[Dict[str, str]]) -> List[Dict[str, str]]:
+        """
+        依 check_list 規則縮短檢查清單
+
+        先由舊到新移除已完成的項目，仍然超過時平均截斷每個項目的描述。
+        """
+        limit = self.rules.get("check_list")
+        if limit is None or self.count(str(check_list)) <= limit:
+            return check_list
+        items = list(check_list)
+        for item in check_list:
+            if self.count(str(items)) <= limit:
+                return items
+            if item.get("status") == "completed":
+                items.remove(item)
+        if items and self.count(str(items)) > limit:
+            per_item = max(limit // len(items) - self.count(str({"item": "", "status": "pending"})), 1)
+            items = [{**item, "item": self.truncate(str(item.get("item", "")), per_item)} for item in items]
+        return items
+
+
+@lru_cache(maxsize=16)
+def get_token_counter(model_name: Optional[str]) -> TokenCounter:
+    """
+    取得模型使用的計數器
+
+    安裝 tiktoken 且模型名稱可以對應到編碼時使用實際分詞器，其他模型使用估算。
+    """
+    if tiktoken is not None and model_name:
+        try:
+            encoding = tiktoken.encoding_for_model(model_name)
+            return TokenCounter(encoding.name, encoding)
+        except KeyError:
+            pass
+    return TokenCounter("estimate")
@@ -0,0 +1,249 @@
+import re
+import json
+import hashlib
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# 工具參數型別與對應的 Python 型別
+ARG_TYPES: Dict[str, Tuple[type, ...]] = {
+    "string": (str,),
+    "array": (list,),
+    "object": (dict,),
+    "number": (int, float),
+    "boolean": (bool,),
+}
+
+FUNCTION_NAME_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")  # 各家原生工具呼叫接受的函式名稱
+JSON_TOKEN_PATTERN = re.compile(r'[{}"\\]')
+TOOL_NAME_PATTERN = re.compile(r'"(?:tool_name|name|tool)"\s*:\s*"((?:[^"\\]|\\.)*)"')
+
+
+def parse_arg_spec(spec: str) -> Dict[str, str]:
+    """
+    解析工具清單中的參數描述
+
+    Args:
+        spec (str): 例如 "query:string" 或 "a:string, b:number"。
+
+    Returns:
+        Dict[str, str]: 參數名稱 -> 型別。
+    """
+    params = {}
+    for part in spec.split(","):
+        if not part.strip():
+            continue
+        name, _, arg_type = part.partition(":")
+        params[name.strip()] = arg_type.strip() or "string"
+    return params
+
+
+class ToolSchema:
+    """單一工具的名稱、參數型別與別名"""
+
+    def __init__(self, name: str, func: Callable, params: Dict[str, str], description: str = "",
+                 aliases: List[str] = None, parameters: Dict[str, Any] = None):
+        self.name = name
+        self.func = func
+        self.params = params
+        self.description = description
+        self.aliases = aliases or []
+        self._parameters = parameters
+        # 原生工具呼叫的函式名稱只能是英數字，取第一個符合的別名
+        self.function_name = next(
+            (alias for alias in [name, *self.aliases] if FUNCTION_NAME_PATTERN.match(alias)),
+            "tool_" + hashlib.sha1(name.encode("utf-8")).hexdigest()[:8],
+        )
+        if self.function_name not in self.aliases and self.function_name != name:
+            self.aliases.append(self.function_name)
+        # 格式錯誤的 JSON 時用來逐一擷取字串參數
+        self.arg_patterns = {
+            param: re.compile(rf'"{re.escape(param)}"\s*:\s*"((?:[^"\\]|\\.)*)"', re.DOTALL)
+            for param in params
+        }
+
+    @classmethod
+    def from_registry(cls, name: str, info: Dict[str, Any]) -> "ToolSchema":
+        """由 tools / target_tool 清單中的項目建立"""
+        return cls(
+            name,
+            info["func"],
+            parse_arg_spec(info.get("args", "")),
+            info.get("description", ""),
+            list(info.get("aliases", [])),
+            info.get("parameters"),
+        )
+
+    def parameters(self) -> Dict[str, Any]:
+        """參數的 JSON Schema，清單中有 parameters 時直接使用，否則由參數描述產生"""
+        if self._parameters is not None:
+            return self._parameters
+        properties = {}
+        for param, arg_type in self.params.items():
+            properties[param] = {"type": arg_type}
+            if arg_type == "array":
+                properties[param]["items"] = {"type": "string"}
+        return {"type": "object", "properties": properties, "required": list(self.params)}
+
+    def validate(self, args: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        檢查參數，只保留宣告過的參數
+
+        數字與布林值可以轉成字串參數，缺少參數、值為空或型別不符時回傳 None。
+        """
+        validated = {}
+        for param, arg_type in self.params.items():
+            value = args.get(param)
+            if value is None or value == "" or value == [] or value == {}:
+                return None
+            expected = ARG_TYPES.get(arg_type, (str,))
+            if not isinstance(value, expected):
+                if arg_type == "string" and isinstance(value, (int, float, bool)):
+                    value = str(value)
+                else:
+                    return None
+            validated[param] = value
+        return validated
+
+
+class ToolParser:
+    """
+    模型輸出的工具選擇解析器
+
+    單次掃描找出第一個完整的 JSON 物件，依 tool_name（或別名）精確對應工具並檢查參數；
+    JSON 格式錯誤或找到的物件無法對應工具時，改用預先編譯的規則擷取工具名稱與字串參數。
+    """
+
+    def __init__(self, registry: Dict[str, Dict[str, Any]]):
+        """
+        初始化解析器
+
+        Args:
+            registry (Dict[str, Dict[str, Any]]): 工具清單，格式同 utils.tools.tools。
+        """
+        self.schemas: Dict[str, ToolSchema] = {name: ToolSchema.from_registry(name, info) for name, info in registry.items()}
+        self.names: Dict[str, str] = {}  # 名稱或別名（小寫）-> 工具名稱
+        for schema in self.schemas.values():
+            for name in [schema.name, *schema.aliases]:
+                self.names[name.lower()] = schema.name
+
+    @staticmethod
+    def extract_json(text: str) -> Optional[Any]:
+        """
+        找出文字中第一個括號平衡且可解析的 JSON 物件
+
+        只掃描一次，會略過字串內的括號；解析失敗的片段跳過後繼續找下一個。
+        """
+        start = text.find("{")
+        while start != -1:
+            depth = 0
+            in_string = False
+            escaped_at = -1
+            # 只跳到大括號、引號與反斜線的位置，不逐字檢查
+            for match in JSON_TOKEN_PATTERN.finditer(text, start):
+                char = match.group()
+                index = match.start()
+                if in_string:
+                    if char == "\\" and escaped_at != index:
+                        escaped_at = index + 1
+                    elif char == '"' and escaped_at != index:
+                        in_string = False
+                elif char == '"':
+                    in_string = True
+                elif char == "{":
+                    depth += 1
+                elif char == "}":
+                    depth -= 1
+                    if depth == 0:
+                        try:
+                            return json.loads(text[start:index + 1], strict=False)  # 允許字串中出現換行
+                        except ValueError:
+                            break
+            start = text.find("{", start + 1)
+        return None
+
+    def resolve(self, name: Any) -> Optional[ToolSchema]:
+        """依名稱或別名找出工具"""
+        if not isinstance(name, str):
+            return None
+        tool_name = self.names.get(name.strip().lower())
+        return self.schemas.get(tool_name) if tool_name else None
+
+    def parse_call(self, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        檢查已解析好的工具呼叫，例如原生工具呼叫回傳的結果
+
+        Args:
+            data (Dict[str, Any]): 含 tool_name（或 name）與 args 的字典。
+
+        Returns:
+            Optional[Dict[str, Any]]: 格式同 parse()。
+        """
+        return self._from_json(data) if isinstance(data, dict) else None
+
+    def _from_json(self, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        schema = self.resolve(data.get("tool_name", data.get("name", data.get("tool"))))
+        if schema is None:
+            return None
+        args = data.get("args") or data.get("arguments") or {}
+        if isinstance(args, str):
+            try:
+                args = json.loads(args)
+            except ValueError:
+                args = {}
+        if not isinstance(args, dict):
+            args = {}
+        # 把頂層的參數（例如 {"tool_name": "summarize", "result": "..."}）收進 args
+        args = {**{param: data[param] for param in schema.params if param in data}, **args}
+        validated = schema.validate(args)
+        if validated is None:
+            return None
+        return {"tool_name": schema.name, "args": validated}
+
+    def _from_patterns(self, text: str, nested: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """
+        以規則擷取工具名稱與字串參數
+
+        Args:
+            text (str): 模型的原始輸出。
+            nested (Dict[str, Any], optional): 外層 JSON 格式錯誤時 extract_json 找到的內層物件（通常是 args），
+                其中宣告過的參數優先使用，陣列等非字串參數也能取得。
+        """
+        match = TOOL_NAME_PATTERN.search(text)
+        schema = self.resolve(match.group(1)) if match else None
+        if schema is None:
+            return None
+        nested = nested or {}
+        args = {param: nested[param] for param in schema.params if param in nested}
+        for param, pattern in schema.arg_patterns.items():
+            if param in args:
+                continue
+            arg_match = pattern.search(text, match.end())
+            if arg_match:
+                try:
+                    args[param] = json.loads(f'"{arg_match.group(1)}"', strict=False)
+                except ValueError:
+                    args[param] = arg_match.group(1)
+        validated = schema.validate(args)
+        if validated is None:
+            return None
+        return {"tool_name": schema.name, "args": validated}
+
+    def parse(self, model_output: str) -> Optional[Dict[str, Any]]:
+        """
+        解析模型輸出
+
+        Args:
+            model_output (str): 模型的原始輸出。
+
+        Returns:
+            Optional[Dict[str, Any]]: {"tool_name": 工具名稱, "args": 參數}，不需要或無法辨識工具時回傳 None。
+        """
+        if not model_output or "{" not in model_output:
+            return None
+        data = self.extract_json(model_output)
+        if not isinstance(data, dict):
+            return self._from_patterns(model_output)
+        result = self._from_json(data)
+        if result is not None:
+            return result
+        # 外層 JSON 格式錯誤時 extract_json 可能只找到內層的 args，改用規則擷取工具名稱
+        return self._from_patterns(model_output, data)
@@ -1,69 +1,163 @@
-from typing import List, Dict, Callable, Any
-import requests
-from bs4 import BeautifulSoup
-from serpapi import GoogleSearch
+from typing import List, Dict, Callable, Any, Optional, Set
+import asyncio
 from utils.setting import Setting
-import re
-import json
-from utils.logger import Logger
-from utils.public_cache import CachePool
-import imgkit
-
-# 假設你已經安裝了 google-search-results 函式庫
-async def web_search(query: str) -> str:
-    """使用 Google 搜尋指定查詢"""
+from utils.http_client import http_pool
+from utils.search_cache import search_cache
+from utils.html_text import HTMLTextExtractor
+from utils.snapshot import snapshot_service
+from utils.tool_parser import ToolParser
+from utils.recorder import recorder
+from utils.token_budget import tokenize
+
+SERP_API_URL = "https://serpapi.com/search.json"
+SEARCH_FAILED = "搜尋失敗"  # 搜尋失敗時工具輸出的開頭，這類輸出不存入長期記憶
+
+async def search_google(query: str) -> List[Dict[str, Any]]:
+    """透過共用連線池呼叫 SerpAPI，回傳自然搜尋結果，相同查詢優先使用快取"""
+    results = await search_cache.get_search(query)
+    if results is not None:
+        return results
+    response = await http_pool.get(
+        SERP_API_URL, params={"engine": "google", "q": query, "api_key": Setting.SERP_API_KEY}
+    )
+    response.raise_for_status()
+    results = response.json().get("organic_results", [])
+    await search_cache.set_search(query, results)
+    return results
+
+async def read_page_text(link: str) -> str:
+    """
+    以串流方式下載網頁並增量擷取文字
+
+    取得足夠字數或下載量超過上限後就停止讀取，不會下載與解析整個網頁。
+    """
+    extractor = HTMLTextExtractor(Setting.PAGE_CHAR_BUDGET)
+    async with http_pool.stream("GET", link) as response:
+        response.raise_for_status()
+        async for chunk in response.aiter_text():
+            extractor.feed(chunk)
+            if extractor.done or response.num_bytes_downloaded >= Setting.PAGE_MAX_BYTES:
+                break
+    extractor.close()
+    return extractor.get_text()
+
+async def fetch_page_text(link: str) -> str:
+    """
+    下載網頁並取出內容，整體逾時後放棄；只快取成功讀取的內容
+
+    任何讀取失敗（逾時、連線錯誤、無效網址、解碼錯誤等）都回傳錯誤說明，不會中斷代理的 step。
+    """
     try:
-        if query and query != "":
-            search = GoogleSearch({"q": query, "api_key": Setting.SERP_API_KEY})
-            results = search.get_dict()["organic_results"]
-            if results and len(results) > 0:
-                first_result = results[0]
-                title = first_result.get("title", "無標題")
-                snippet = first_result.get("snippet", "無摘要")
-                link = first_result.get("link", "#")
-                if link != "#":
-                    imgkit.from_url(link, f"./snapshot/{title}.png")
-                    CachePool.set_image_url(f"http://127.0.0.1:8000/{title}.png")
-                
-                page_content = ""
-                if link != "#":
-                    try:
-                        response = requests.get(link, timeout=5)
-                        response.raise_for_status()
-                        soup = BeautifulSoup(response.text, 'html.parser')
-                        page_content = soup.get_text()
-                        page_content = ' '.join(page_content.split())
-                        page_content = page_content[:500]
-                    except requests.RequestException as e:
-                        page_content = f"無法讀取網頁內容: {e}"
-
-                result = f"標題： {title}\n摘要：{snippet}\n內容：{page_content}"
-                await Logger.log("chat", await CachePool.get_len() + 1, f"搜尋了: {query}\n{result}")
-                return result
-            else:
-                return "找不到相關結果。"
+        page_content = await search_cache.get_page(link)
+        if page_content is not None:
+            return page_content
+        page_content = await asyncio.wait_for(read_page_text(link), timeout=Setting.PAGE_FETCH_TIMEOUT)
+    except asyncio.TimeoutError:
+        return "無法讀取網頁內容: 逾時"
     except Exception as e:
+        return f"無法讀取網頁內容: {e}"
+    await search_cache.set_page(link, page_content)
+    return page_content
+
+# 錄製 / 重播搜尋結果與網頁內容，重播時不需要網路；工具本身照常執行
+if recorder.enabled:
+    search_google = recorder.wrap("search", search_google, default=[])
+    fetch_page_text = recorder.wrap("page", fetch_page_text, default="無法讀取網頁內容: 沒有錄製資料")
+
+async def take_snapshot(link: str, session) -> None:
+    """在背景截圖網頁，完成後才設定快取池的圖片網址"""
+    image_url = await snapshot_service.snapshot(link)
+    if image_url is not None:
+        session.cache_pool.set_image_url(image_url)
+
+def relevance_score(query_tokens: Set[str], title: str, text: str) -> float:
+    """查詢詞在標題與內容中出現的比例，標題命中權重較高"""
+    if not query_tokens:
+        return 0.0
+    title_hits = len(query_tokens & tokenize(title))
+    text_hits = len(query_tokens & tokenize(text))
+    return (2 * title_hits + text_hits) / (3 * len(query_tokens))
+
+async def fetch_results(results: List[Dict[str, Any]]) -> List[str]:
+    """以有限的並行數同時讀取多個搜尋結果的網頁"""
+    semaphore = asyncio.Semaphore(max(Setting.SEARCH_FANOUT, 1))
+
+    async def fetch(result: Dict[str, Any]) -> str:
+        link = result.get("link", "#")
+        if link == "#":
+            return ""
+        async with semaphore:
+            return await fetch_page_text(link)
+
+    return await asyncio.gather(*(fetch(result) for result in results))
+
+def format_result(title: str, snippet: str, page_content: str) -> str:
+    return f"標題： {title}\n摘要：{snippet}\n內容：{page_content}"
+
+async def web_search(query: str, session) -> Optional[str]:
+    """
+    使用 Google 搜尋指定查詢
+
+    搜尋完成後，前 SEARCH_TOP_K 個結果的網頁同時下載，截圖在背景執行，不會延遲工具結果。
+    多個結果時依與查詢的相關程度排序後合併成一份輸出。
+    """
+    if not query:
         return None
-        # return f"搜尋失敗：{e}"
+    try:
+        results = await asyncio.wait_for(search_google(query), timeout=Setting.SEARCH_TIMEOUT)
+    except asyncio.TimeoutError:
+        print(f"⚠️ 搜尋逾時: {query}")
+        return f"{SEARCH_FAILED}：逾時"
+    except Exception as e:
+        # 連線錯誤、非 JSON 回應或格式不符等都回傳錯誤說明，不會中斷代理的 step
+        print(f"⚠️ 搜尋失敗: {e}")
+        return f"{SEARCH_FAILED}：{e}"
+    if not results:
+        return "找不到相關結果。"
+
+    results = results[:max(Setting.SEARCH_TOP_K, 1)]
+    first_link = results[0].get("link", "#")
+    if first_link != "#" and Setting.SNAPSHOT_ENABLED and not recorder.replaying:
+        session.run_background(take_snapshot(first_link, session))
+    pages = await fetch_results(results)
+
+    if len(results) == 1:
+        result = format_result(results[0].get("title", "無標題"), results[0].get("snippet", "無摘要"), pages[0])
+    else:
+        query_tokens = tokenize(query)
+        ranked = []
+        for rank, (item, page_content) in enumerate(zip(results, pages)):
+            title = item.get("title", "無標題")
+            snippet = item.get("snippet", "無摘要")
+            score = relevance_score(query_tokens, title, f"{snippet} {page_content}")
+            ranked.append((-score, rank, title, snippet, page_content[:Setting.SEARCH_RESULT_CHAR_BUDGET]))
+        ranked.sort()
+        result = "\n\n".join(
+            f"[{index}] " + format_result(title, snippet, page_content)
+            for index, (_, _, title, snippet, page_content) in enumerate(ranked, 1)
+        )
 
-async def express_as_sentence(sentence: str) -> str:
+    await session.logger.log("chat", await session.cache_pool.get_len() + 1, f"搜尋了: {query}\n{result}")
+    return result
+
+async def express_as_sentence(sentence: str, session) -> str:
     """將一連串的想法轉化為一句話。"""
     if sentence and sentence != "":
-        await Logger.log("chat", await CachePool.get_len() + 1, f"AI: {sentence}")
+        await session.logger.log("chat", await session.cache_pool.get_len() + 1, f"AI: {sentence}")
         return f"I say: {sentence}"
     return None
  
-async def observe_thought(check_list: str) -> str:
+async def observe_thought(check_list: List[Dict[str, str]], session) -> List[Dict[str, str]]:
     """觀察自己的念頭，設定目標清單。"""
     if check_list and check_list != "":
-        await Logger.log("chat", await CachePool.get_len() + 1, f"AI設定了目標: {check_list}")
+        await session.logger.log("chat", await session.cache_pool.get_len() + 1, f"AI設定了目標: {check_list}")
         return check_list
     return "想一下要做什麼。"
 
-async def summarize(result: str) -> str:
+async def summarize(result: str, session) -> str:
     """摘要指定內容。"""
     if result and result != "":
-        await Logger.log("chat", await CachePool.get_len() + 1, f"總結來說: {result}")
+        await session.logger.log("chat", await session.cache_pool.get_len() + 1, f"總結來說: {result}")
         return result
     return "摘要失敗。"
 
@@ -72,59 +166,53 @@ tools: Dict[str, Dict[str, Any]] = {
     "自然表達": {
     "func": express_as_sentence,
     "args": "sentence:string",
-    "description": "根據想法或概念，像人類一樣說出一句話。"
+    "description": "根據想法或概念，像人類一樣說出一句話。",
+    "aliases": ["express_as_sentence", "express"],
     },
     "網路搜尋": {
         "func": web_search,
         "args": "query:string",
-        "description": "使用 Google 搜尋指定一個查詢。"
+        "description": "使用 Google 搜尋指定一個查詢。",
+        "aliases": ["web_search", "search", "搜尋"],
+        "shareable": True,  # 輸出只有公開網頁的內容，可以存入所有對話共用的記憶
     },
     "摘要": {
         "func": summarize,
         "args": "result:string",
-        "description": "摘要指定內容。"
+        "description": "摘要指定內容。",
+        "aliases": ["summarize", "summary"],
     },
 }
 
 target_tool: Dict[str, Dict[str, Any]] = {
     "更新檢查清單": {
         "func": observe_thought,
-        "args": "check_list:string",
-        "description": "觀察自己的念頭，決定是否要修改或設定目標清單。"
+        "args": "check_list:array",
+        "description": "觀察自己的念頭，決定是否要修改或設定目標清單。",
+        "aliases": ["update_check_list", "observe_thought"],
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "check_list": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "item": {"type": "string"},
+                            "status": {"type": "string", "enum": ["pending", "progressing", "completed"]},
+                        },
+                        "required": ["item", "status"],
+                    },
+                },
+            },
+            "required": ["check_list"],
+        },
     },
 }
 
-def parse_args(json_string: str) -> dict:
-    try:
-        # 移除標記
-        json_string = json_string.replace("`json", "").replace("`", "").strip()
-        data = json.loads(json_string)
-        return data.get("args", {})
-    except AttributeError:
-        return None
-    except ValueError:
-        return {}
-
-    
+tool_parser = ToolParser(tools)
+target_parser = ToolParser(target_tool)
 
-def choose_tool(model_output: str) -> Dict[str, Any]:
+def choose_tool(model_output: str, parser: ToolParser = tool_parser) -> Optional[Dict[str, Any]]:
     """根據模型輸出選擇工具並返回工具資訊"""
-    try:
-        output_json = parse_args(model_output)
-        if not output_json:
-            return None
-        if re.search(r"網路搜尋|搜尋|網路", model_output, re.IGNORECASE): #更靈活的選擇方式
-            return {"tool_name": "網路搜尋", "args": {"query": output_json.get("query")}}
-            
-        elif re.search(r"自然表達|表達", model_output, re.IGNORECASE):
-            # print(output_json.get("sentence"))
-            return {"tool_name": "自然表達", "args": {"sentence": output_json.get("sentence")}}
-        
-        elif re.search(r"更新檢查清單|更新|檢查清單", model_output, re.IGNORECASE):
-            # print(output_json.get("sentence"))
-            return {"tool_name": "更新檢查清單", "args": {"check_list": output_json.get("check_list")}}
-        elif re.search(r"摘要|summarize", model_output, re.IGNORECASE):
-            return {"tool_name": "摘要", "args": {"result": output_json.get("result")}}
-        return None
-    except ValueError:
-            return None
\ No newline at end of file
+    return parser.parse(model_output)